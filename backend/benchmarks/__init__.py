@@ -0,0 +1,4 @@
+"""
+Benchmarks package for Face Matching API
+Contains offline performance benchmarks, run from the backend directory with python -m
+"""
@@ -0,0 +1,132 @@
+"""
+ANN recall benchmark for Face Matching API
+Measures recall and latency of the approximate gallery indexes against exact search
+
+Usage (from the backend directory):
+    python -m benchmarks.ann_recall --size 100000 --dimensions 512 --k 10
+"""
+
+import argparse
+import json
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+from services.embedding_index import create_index, hnswlib
+from services.gallery_service import l2_normalize_rows
+
+def make_embeddings(size: int, dimensions: int, identities: int, noise: float, seed: int = 0) -> np.ndarray:
+    """
+    Generate clustered unit vectors that mimic several photos per identity
+
+    Args:
+        size: Number of embeddings
+        dimensions: Embedding dimensions
+        identities: Number of identity clusters
+        noise: Standard deviation of the per-photo noise around each identity
+        seed: Random seed
+
+    Returns:
+        L2-normalized float32 matrix of shape (size, dimensions)
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((identities, dimensions)).astype(np.float32)
+    centers = l2_normalize_rows(centers)
+    owners = rng.integers(0, identities, size)
+    samples = centers[owners] + noise * rng.standard_normal((size, dimensions)).astype(np.float32) / np.sqrt(dimensions)
+    return l2_normalize_rows(samples)
+
+def run_benchmark(
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    k: int,
+    index_type: str,
+    params: Dict[str, Any]
+) -> Dict[str, Any]:
+    """
+    Build one index and compare its results with exact search
+
+    Args:
+        vectors: Gallery vectors
+        queries: Query vectors
+        k: Neighbours per query
+        index_type: Index type passed to create_index
+        params: Index tuning parameters
+
+    Returns:
+        Dictionary with build time, mean query latency and recall@k
+    """
+    ids = np.arange(len(vectors), dtype=np.int64)
+
+    exact = create_index("exact", vectors.shape[1])
+    exact.add(ids, vectors)
+    expected, _ = exact.search(queries, k)
+
+    start = time.perf_counter()
+    index = create_index(index_type, vectors.shape[1], **params)
+    index.add(ids, vectors)
+    index.wait_until_trained()
+    build_time = time.perf_counter() - start
+
+    latencies = []
+    found = []
+    for query in queries:
+        start = time.perf_counter()
+        result, _ = index.search(query[None, :], k)
+        latencies.append(time.perf_counter() - start)
+        found.append(result[0])
+
+    hits = sum(len(np.intersect1d(e, f)) for e, f in zip(expected, found))
+    return {
+        "index": index_type,
+        "params": params,
+        "build_time_s": round(build_time, 3),
+        "mean_latency_ms": round(1000 * float(np.mean(latencies)), 3),
+        "p99_latency_ms": round(1000 * float(np.percentile(latencies, 99)), 3),
+        f"recall_at_{k}": round(hits / (k * len(queries)), 4)
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Recall vs exact search benchmark for gallery indexes")
+    parser.add_argument("--size", type=int, default=100000, help="Number of gallery embeddings")
+    parser.add_argument("--dimensions", type=int, default=512, help="Embedding dimensions (128 Facenet, 512 ArcFace)")
+    parser.add_argument("--identities", type=int, default=20000, help="Number of identity clusters")
+    parser.add_argument("--noise", type=float, default=0.6, help="Per-photo noise around each identity")
+    parser.add_argument("--queries", type=int, default=200, help="Number of queries")
+    parser.add_argument("--k", type=int, default=10, help="Neighbours per query")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 16, 64], help="IVF nprobe values to sweep")
+    parser.add_argument("--ef", type=int, nargs="+", default=[16, 64, 256], help="HNSW ef_search values to sweep")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    vectors = make_embeddings(args.size, args.dimensions, args.identities, args.noise, seed=0)
+    # Queries are fresh photos of enrolled identities
+    rng = np.random.default_rng(1)
+    queries = l2_normalize_rows(
+        vectors[rng.integers(0, args.size, args.queries)]
+        + args.noise * rng.standard_normal((args.queries, args.dimensions)).astype(np.float32) / np.sqrt(args.dimensions)
+    )
+
+    runs: List[Dict[str, Any]] = [run_benchmark(vectors, queries, args.k, "exact", {})]
+    for nprobe in args.nprobe:
+        runs.append(run_benchmark(vectors, queries, args.k, "ivf", {"nprobe": nprobe, "min_train_size": 0}))
+    if hnswlib is not None:
+        for ef in args.ef:
+            runs.append(run_benchmark(vectors, queries, args.k, "hnsw", {"ef_search": ef}))
+
+    if args.json:
+        print(json.dumps(runs, indent=2))
+        return
+
+    print(f"{args.size} x {args.dimensions}-d embeddings, {args.queries} queries, k={args.k}")
+    for run in runs:
+        params = ", ".join(f"{key}={value}" for key, value in run["params"].items()) or "-"
+        print(
+            f"{run['index']:<6} {params:<28} build {run['build_time_s']:>8.3f}s  "
+            f"mean {run['mean_latency_ms']:>8.3f}ms  p99 {run['p99_latency_ms']:>8.3f}ms  "
+            f"recall@{args.k} {run[f'recall_at_{args.k}']:.4f}"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,351 @@
+"""
+Load test for Face Matching API
+Drives the inference endpoints with synthetic images at several concurrency levels
+
+Starts the API in a subprocess (stub DeepFace by default, --real for cached
+weights), sends multipart requests from keep-alive client threads and reports
+throughput, latency percentiles and the server's peak RSS for each endpoint
+and concurrency level.
+
+Usage (from the backend directory):
+    python -m benchmarks.load_test --concurrency 1 4 16 --requests 200
+    python -m benchmarks.load_test --endpoints compare-faces identify --latency detect=8,embed=3 --json
+    python -m benchmarks.load_test --real --endpoints extract-embeddings --concurrency 1 4
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import socket
+import argparse
+import threading
+import subprocess
+import http.client
+from typing import Any, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+import psutil
+
+# Endpoint name: (path, form fields, upload field, (min images, max images))
+ENDPOINTS = {
+    "compare-faces": ("/compare-faces", {"model": "Facenet"}, "files", (2, 4)),
+    "extract-embeddings": ("/extract-embeddings", {"model": "Facenet"}, "files", (2, 4)),
+    "analyze-attributes": ("/analyze-attributes", {"actions": "age,gender,emotion,race"}, "files", (1, 10)),
+    "anti-spoofing": ("/anti-spoofing", {}, "files", (1, 10)),
+    "identify": ("/identify", {"model": "Facenet"}, "file", (1, 1))
+}
+GALLERY_IDENTITY_PREFIX = "loadtest-"
+
+def make_image(seed: int, width: int, height: int) -> bytes:
+    """
+    Generate a deterministic synthetic photo as JPEG bytes
+
+    Args:
+        seed: Random seed, so every seed gives a distinct image
+        width: Image width in pixels
+        height: Image height in pixels
+
+    Returns:
+        JPEG-encoded image
+    """
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    image = np.empty((height, width, 3), dtype=np.float32)
+    for channel in range(3):
+        fx, fy, phase = rng.uniform(0.5, 4, 2).tolist() + [rng.uniform(0, 6.3)]
+        image[:, :, channel] = 127 + 100 * np.sin(fx * x / width * 6.3 + fy * y / height * 6.3 + phase)
+    # Texture so JPEG sizes resemble photos rather than flat gradients
+    image += rng.normal(0, 12, image.shape)
+    ok, encoded = cv2.imencode(".jpg", np.clip(image, 0, 255).astype(np.uint8), [cv2.IMWRITE_JPEG_QUALITY, 90])
+    if not ok:
+        raise RuntimeError("Could not encode a synthetic image")
+    return encoded.tobytes()
+
+def encode_multipart(fields: Dict[str, str], upload_field: str, images: List[bytes]) -> Tuple[bytes, str]:
+    """Encode form fields and JPEG uploads as a multipart/form-data body"""
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+        )
+    for k, image in enumerate(images):
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{upload_field}"; filename="image{k}.jpg"\r\n'
+            f'Content-Type: image/jpeg\r\n\r\n'.encode() + image + b"\r\n"
+        )
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+def percentiles(latencies: List[float]) -> Dict[str, float]:
+    """Latency summary in milliseconds"""
+    if not latencies:
+        return {"mean": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    values = np.asarray(latencies) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "mean": round(float(values.mean()), 2),
+        "p50": round(float(p50), 2),
+        "p95": round(float(p95), 2),
+        "p99": round(float(p99), 2),
+        "max": round(float(values.max()), 2)
+    }
+
+class RSSMonitor:
+    """Samples the resident memory of the server process (and its workers) in the background"""
+
+    def __init__(self, pid: Optional[int], interval: float = 0.02):
+        self.process = psutil.Process(pid) if pid else None
+        self.interval = interval
+        self.peak = 0
+        self.overall_peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _sample(self) -> int:
+        children = self.process.children(recursive=True)
+        if not children:
+            return self.process.memory_info().rss
+        # Pre-fork workers share the imported modules; proportional set sizes count them once
+        total = 0
+        for process in [self.process] + children:
+            try:
+                total += process.memory_full_info().pss
+            except psutil.NoSuchProcess:
+                pass
+        return total
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                rss = self._sample()
+            except psutil.Error:
+                return
+            self.peak = max(self.peak, rss)
+            self.overall_peak = max(self.overall_peak, rss)
+            self._stop.wait(self.interval)
+
+    def start(self) -> None:
+        if self.process is not None:
+            self._thread.start()
+
+    def reset(self) -> None:
+        """Start a new peak measurement for the next run"""
+        self.peak = 0
+
+    def stop(self) -> None:
+        self._stop.set()
+
+def post(connection: http.client.HTTPConnection, path: str, body: bytes, content_type: str) -> int:
+    """Send one request on a keep-alive connection and read the whole response"""
+    connection.request("POST", path, body, {"Content-Type": content_type})
+    response = connection.getresponse()
+    response.read()
+    return response.status
+
+def run_load(
+    host: str, port: int, path: str, bodies: List[Tuple[bytes, str]],
+    requests: int, concurrency: int
+) -> Tuple[List[float], Dict[str, int], float]:
+    """
+    Send requests from concurrent client threads
+
+    Args:
+        host: Server host
+        port: Server port
+        path: Endpoint path
+        bodies: Pre-encoded request bodies, used round robin
+        requests: Number of requests to send
+        concurrency: Number of client threads, each with one keep-alive connection
+
+    Returns:
+        Tuple of (latencies of successful requests in seconds, count per status code, wall time in seconds)
+    """
+    lock = threading.Lock()
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    next_request = [0]
+
+    def worker() -> None:
+        connection = http.client.HTTPConnection(host, port, timeout=600)
+        while True:
+            with lock:
+                k = next_request[0]
+                if k >= requests:
+                    break
+                next_request[0] += 1
+            body, content_type = bodies[k % len(bodies)]
+            start = time.perf_counter()
+            try:
+                status = post(connection, path, body, content_type)
+            except (OSError, http.client.HTTPException):
+                # Connection dropped: count it and reconnect
+                status = 0
+                connection.close()
+                connection = http.client.HTTPConnection(host, port, timeout=600)
+            elapsed = time.perf_counter() - start
+            with lock:
+                statuses[str(status)] = statuses.get(str(status), 0) + 1
+                if status == 200:
+                    latencies.append(elapsed)
+        connection.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, statuses, time.perf_counter() - start
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def start_server(args: argparse.Namespace, port: int) -> subprocess.Popen:
+    """Start benchmarks.serve in a subprocess and wait until models are ready"""
+    env = dict(os.environ)
+    if not args.cache:
+        # Repeated synthetic images would otherwise be served from the result cache
+        env["RESULT_CACHE_MAX_MB"] = "0"
+    for item in args.env:
+        key, _, value = item.partition("=")
+        env[key] = value
+
+    command = [sys.executable, "-m", "benchmarks.serve", "--port", str(port), "--faces", str(args.faces)]
+    command += ["--real"] if args.real else ["--latency", args.latency]
+    server = subprocess.Popen(command, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), env=env)
+
+    deadline = time.monotonic() + args.startup_timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Server exited with code {server.returncode}")
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            connection.request("GET", "/ready")
+            if connection.getresponse().status == 200:
+                return server
+        except OSError:
+            pass
+        time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError(f"Server not ready after {args.startup_timeout:g}s")
+
+def enroll_gallery(host: str, port: int, images: List[bytes], size: int) -> None:
+    """Enroll one identity per synthetic image so /identify searches a gallery"""
+    connection = http.client.HTTPConnection(host, port, timeout=600)
+    for k in range(size):
+        body, content_type = encode_multipart(
+            {"identity": f"{GALLERY_IDENTITY_PREFIX}{k}", "model": "Facenet"}, "files", [images[k % len(images)]]
+        )
+        status = post(connection, "/gallery/enroll", body, content_type)
+        if status != 200:
+            raise RuntimeError(f"Gallery enrollment failed with status {status}")
+    connection.close()
+
+def remove_gallery(host: str, port: int, size: int) -> None:
+    connection = http.client.HTTPConnection(host, port, timeout=60)
+    for k in range(size):
+        connection.request("DELETE", f"/gallery/{GALLERY_IDENTITY_PREFIX}{k}?model=Facenet")
+        connection.getresponse().read()
+    connection.close()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test the inference endpoints")
+    parser.add_argument("--endpoints", nargs="+", choices=list(ENDPOINTS), default=list(ENDPOINTS))
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16], help="Concurrent clients per run")
+    parser.add_argument("--requests", type=int, default=100, help="Requests per endpoint and concurrency level")
+    parser.add_argument("--warmup", type=int, default=5, help="Unmeasured requests before each endpoint")
+    parser.add_argument("--images", type=int, default=2, help="Images per request (clamped to each endpoint's limits)")
+    parser.add_argument("--image-size", default="640x480", help="Synthetic image size, WIDTHxHEIGHT")
+    parser.add_argument("--image-pool", type=int, default=32, help="Distinct synthetic images")
+    parser.add_argument("--gallery-size", type=int, default=100, help="Identities enrolled for /identify")
+    parser.add_argument("--real", action="store_true", help="Use the real deepface package with cached weights")
+    parser.add_argument("--latency", default="", help='Stub model time in ms, e.g. "detect=8,embed=3,attribute=12,spoof=10"')
+    parser.add_argument("--faces", type=int, default=1, help="Faces the stub detects in every image")
+    parser.add_argument("--cache", action="store_true", help="Keep the result cache enabled")
+    parser.add_argument("--env", nargs="*", default=[], help="Extra server settings, e.g. INFERENCE_WORKERS=8")
+    parser.add_argument("--url", help="Test a running server (host:port) instead of starting one; no RSS figures")
+    parser.add_argument("--startup-timeout", type=float, default=300, help="Seconds to wait for model preloading")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    width, height = (int(value) for value in args.image_size.lower().split("x"))
+    images = [make_image(seed, width, height) for seed in range(args.image_pool)]
+
+    server = None
+    if args.url:
+        host, _, port_text = args.url.replace("http://", "").rstrip("/").partition(":")
+        port = int(port_text or 80)
+    else:
+        host, port = "127.0.0.1", free_port()
+        server = start_server(args, port)
+
+    monitor = RSSMonitor(server.pid if server else None)
+    monitor.start()
+    runs: List[Dict[str, Any]] = []
+    try:
+        if "identify" in args.endpoints:
+            enroll_gallery(host, port, images, args.gallery_size)
+
+        for endpoint in args.endpoints:
+            path, fields, upload_field, (min_images, max_images) = ENDPOINTS[endpoint]
+            count = min(max(args.images, min_images), max_images)
+            bodies = [
+                encode_multipart(fields, upload_field, [images[(k + j) % len(images)] for j in range(count)])
+                for k in range(len(images))
+            ]
+            run_load(host, port, path, bodies, args.warmup, 1)
+
+            for concurrency in args.concurrency:
+                monitor.reset()
+                latencies, statuses, wall_time = run_load(host, port, path, bodies, args.requests, concurrency)
+                runs.append({
+                    "endpoint": endpoint,
+                    "concurrency": concurrency,
+                    "images_per_request": count,
+                    "requests": args.requests,
+                    "statuses": statuses,
+                    "duration_s": round(wall_time, 3),
+                    "throughput_rps": round(len(latencies) / wall_time, 2),
+                    "images_per_s": round(len(latencies) * count / wall_time, 2),
+                    "latency_ms": percentiles(latencies),
+                    "peak_rss_mb": round(monitor.peak / (1024 * 1024), 1) if server else None
+                })
+                if not args.json:
+                    run = runs[-1]
+                    errors = sum(n for status, n in statuses.items() if status != "200")
+                    latency = run["latency_ms"]
+                    rss = f"{run['peak_rss_mb']:>8.1f}" if server else f"{'-':>8}"
+                    print(
+                        f"{endpoint:<20} c={concurrency:<4} {run['throughput_rps']:>8.2f} req/s "
+                        f"{run['images_per_s']:>8.2f} img/s  p50 {latency['p50']:>8.2f}  p95 {latency['p95']:>8.2f}  "
+                        f"p99 {latency['p99']:>8.2f} ms  errors {errors:<4} peak RSS {rss} MB",
+                        flush=True
+                    )
+
+        if "identify" in args.endpoints and args.url:
+            remove_gallery(host, port, args.gallery_size)
+    finally:
+        monitor.stop()
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    if args.json:
+        print(json.dumps({
+            "mode": "real" if args.real else "stub",
+            "latency": args.latency,
+            "image_size": args.image_size,
+            "peak_rss_mb": round(monitor.overall_peak / (1024 * 1024), 1) if server else None,
+            "runs": runs
+        }, indent=2))
+    elif server:
+        print(f"Overall peak RSS {monitor.overall_peak / (1024 * 1024):.1f} MB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+"""
+Microbenchmarks for Face Matching API
+Times the non-model helpers of the pipeline and flags regressions against saved baselines
+
+Usage (from the backend directory):
+    python -m benchmarks.microbench run --save baseline.json
+    python -m benchmarks.microbench run --filter distance
+    python -m benchmarks.microbench compare baseline.json                # runs now, then compares
+    python -m benchmarks.microbench compare baseline.json current.json --threshold 0.15
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import platform
+import tempfile
+import argparse
+import statistics
+import subprocess
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from benchmarks import stub_deepface
+
+# The helpers never call a model; the stub avoids importing TensorFlow and its noise
+if "deepface" not in sys.modules:
+    stub_deepface.install()
+
+from utils import validate_image, decode_image, save_temp_image, cleanup_temp_files, generate_temp_filename
+from services.face_service import FaceService
+from benchmarks.load_test import make_image
+
+# Benchmark name: factory doing the setup and returning the callable to time
+BENCHMARKS: Dict[str, Callable[[], Callable[[], Any]]] = {}
+
+def benchmark(name: str) -> Callable:
+    """Register a benchmark setup function under a name"""
+    def register(setup: Callable[[], Callable[[], Any]]) -> Callable[[], Callable[[], Any]]:
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+IMAGE_SIZES = {"vga": (640, 480), "1080p": (1920, 1080)}
+DISTANCE_DIMENSIONS = (128, 512)
+DISTANCE_COUNTS = (4, 64, 1024)
+SUMMARY_SIZES = (1000, 100000)
+
+def _embeddings(count: int, dimensions: int) -> List[List[float]]:
+    rng = np.random.default_rng(0)
+    return rng.standard_normal((count, dimensions)).astype(np.float32).tolist()
+
+def _image_results(count: int, key: str, face: Callable[[int], Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Per-image results with 0-3 faces each; images without faces carry an error"""
+    rng = np.random.default_rng(0)
+    results = []
+    for i, faces in enumerate(rng.integers(0, 4, count).tolist()):
+        if faces == 0:
+            results.append({"image_index": i, "filename": f"{i}.jpg", "faces_detected": 0, "error": "No face detected"})
+        else:
+            results.append({
+                "image_index": i, "filename": f"{i}.jpg", "faces_detected": faces,
+                key: [face(j) for j in range(faces)]
+            })
+    return results
+
+def _comparison_results(count: int) -> List[Dict[str, Any]]:
+    rng = np.random.default_rng(0)
+    results = []
+    for distance in rng.uniform(0, 1, count).tolist():
+        if distance > 0.95:
+            results.append({"image1": "a.jpg", "image2": "b.jpg", "error": "No face detected"})
+        else:
+            results.append({"image1": "a.jpg", "image2": "b.jpg", "verified": distance <= 0.4, "distance": distance})
+    return results
+
+def _register_image_benchmarks(label: str, width: int, height: int) -> None:
+    @benchmark(f"validate_image[jpeg_{label}]")
+    def validate() -> Callable[[], Any]:
+        content = make_image(0, width, height)
+        return lambda: validate_image(content)
+
+    @benchmark(f"decode_image[jpeg_{label}]")
+    def decode() -> Callable[[], Any]:
+        content = make_image(0, width, height)
+        return lambda: decode_image(content)
+
+    @benchmark(f"save_temp_image[jpeg_{label}]")
+    def save() -> Callable[[], Any]:
+        content = make_image(0, width, height)
+        filename = generate_temp_filename("microbench", 0, "image.jpg")
+        return lambda: save_temp_image(content, filename)
+
+    @benchmark(f"save_and_cleanup_temp_files[4x_jpeg_{label}]")
+    def save_and_cleanup() -> Callable[[], Any]:
+        content = make_image(0, width, height)
+        filenames = [generate_temp_filename("microbench", i, "image.jpg") for i in range(4)]
+        return lambda: cleanup_temp_files([save_temp_image(content, filename) for filename in filenames])
+
+def _register_distance_benchmarks(dimensions: int) -> None:
+    @benchmark(f"calculate_embedding_distance[cosine_{dimensions}d]")
+    def pair_distance() -> Callable[[], Any]:
+        first, second = _embeddings(2, dimensions)
+        return lambda: FaceService.calculate_embedding_distance(first, second, "cosine")
+
+    for count in DISTANCE_COUNTS:
+        @benchmark(f"calculate_distance_matrices[{count}x{dimensions}d]")
+        def matrices(count: int = count) -> Callable[[], Any]:
+            embeddings = _embeddings(count, dimensions)
+            return lambda: FaceService.calculate_distance_matrices(embeddings)
+
+def _register_summary_benchmarks(size: int) -> None:
+    @benchmark(f"calculate_comparison_summary[{size}]")
+    def comparison_summary() -> Callable[[], Any]:
+        results = _comparison_results(size)
+        return lambda: FaceService.calculate_comparison_summary(results)
+
+    @benchmark(f"calculate_analysis_summary[{size}]")
+    def analysis_summary() -> Callable[[], Any]:
+        results = _image_results(size, "faces", lambda j: {"face_index": j, "age": 30})
+        return lambda: FaceService.calculate_analysis_summary(results)
+
+    @benchmark(f"calculate_spoofing_summary[{size}]")
+    def spoofing_summary() -> Callable[[], Any]:
+        results = _image_results(size, "faces", lambda j: {"face_index": j, "is_real": j % 3 != 0})
+        return lambda: FaceService.calculate_spoofing_summary(results)
+
+    @benchmark(f"calculate_embeddings_summary[{size}]")
+    def embeddings_summary() -> Callable[[], Any]:
+        vector = _embeddings(1, 128)[0]
+        results = _image_results(size, "embeddings", lambda j: {"face_index": j, "embedding": vector})
+        return lambda: FaceService.calculate_embeddings_summary(results)
+
+for _label, (_width, _height) in IMAGE_SIZES.items():
+    _register_image_benchmarks(_label, _width, _height)
+
+@benchmark("cleanup_temp_files[4x_missing]")
+def _cleanup_missing() -> Callable[[], Any]:
+    # Files already gone, as after a request that failed before writing them
+    paths = [os.path.join(tempfile.gettempdir(), generate_temp_filename("microbench", i, "missing.jpg")) for i in range(4)]
+    return lambda: cleanup_temp_files(paths)
+
+for _dimensions in DISTANCE_DIMENSIONS:
+    _register_distance_benchmarks(_dimensions)
+
+for _size in SUMMARY_SIZES:
+    _register_summary_benchmarks(_size)
+
+def measure(func: Callable[[], Any], repeat: int, min_time: float) -> Dict[str, Any]:
+    """
+    Time a callable the way timeit does: calibrate loops, then take several repeats
+
+    Args:
+        func: Callable to time
+        repeat: Number of timed repeats
+        min_time: Minimum duration of one repeat in seconds
+
+    Returns:
+        Dictionary with loops per repeat and min, median and max seconds per call
+    """
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        loops *= 10 if elapsed < min_time / 10 else 2
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        timings.append((time.perf_counter() - start) / loops)
+
+    return {
+        "loops": loops,
+        "min_s": min(timings),
+        "median_s": statistics.median(timings),
+        "max_s": max(timings)
+    }
+
+def environment() -> Dict[str, Any]:
+    """Describe the machine and code a run was made on"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count()
+    }
+
+def run(pattern: Optional[str], repeat: int, min_time: float, quiet: bool = False) -> Dict[str, Any]:
+    """
+    Run the registered benchmarks matching a pattern
+
+    Args:
+        pattern: Regular expression selecting benchmark names (None runs all)
+        repeat: Timed repeats per benchmark
+        min_time: Minimum duration of one repeat in seconds
+        quiet: Do not print progress
+
+    Returns:
+        Run document with environment and per-benchmark timings
+    """
+    results = {}
+    for name, setup in BENCHMARKS.items():
+        if pattern and not re.search(pattern, name):
+            continue
+        results[name] = measure(setup(), repeat, min_time)
+        if not quiet:
+            print(f"{name:<52} {format_time(results[name]['median_s']):>12}  ({results[name]['loops']} loops)", file=sys.stderr)
+    return {"environment": environment(), "repeat": repeat, "benchmarks": results}
+
+def format_time(seconds: float) -> str:
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f} {unit}"
+    return f"{seconds / 1e-9:.0f} ns"
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float, metric: str) -> bool:
+    """
+    Print the change of every benchmark against a baseline
+
+    Args:
+        baseline: Baseline run document
+        current: Current run document
+        threshold: Relative slowdown counted as a regression (0.1 = 10%)
+        metric: Timing compared ("min_s" or "median_s")
+
+    Returns:
+        True if any benchmark regressed beyond the threshold
+    """
+    if baseline["environment"].get("platform") != current["environment"].get("platform") or \
+            baseline["environment"].get("cpu_count") != current["environment"].get("cpu_count"):
+        print("Warning: baseline was recorded on a different machine", file=sys.stderr)
+
+    regressed = False
+    for name in sorted(set(baseline["benchmarks"]) | set(current["benchmarks"])):
+        before = baseline["benchmarks"].get(name)
+        after = current["benchmarks"].get(name)
+        if before is None or after is None:
+            print(f"{name:<52} {'only in ' + ('current' if before is None else 'baseline'):>40}")
+            continue
+        change = after[metric] / before[metric] - 1
+        if change > threshold:
+            status = "REGRESSION"
+            regressed = True
+        elif change < -threshold:
+            status = "faster"
+        else:
+            status = "ok"
+        print(
+            f"{name:<52} {format_time(before[metric]):>12} -> {format_time(after[metric]):>12} "
+            f"{change * 100:>+7.1f}%  {status}"
+        )
+    return regressed
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Microbenchmarks of the non-model pipeline helpers")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    def add_run_options(subparser: argparse.ArgumentParser) -> None:
+        subparser.add_argument("--filter", help="Regular expression selecting benchmarks")
+        subparser.add_argument("--repeat", type=int, default=7, help="Timed repeats per benchmark")
+        subparser.add_argument("--min-time", type=float, default=0.05, help="Minimum seconds per repeat")
+
+    run_parser = subparsers.add_parser("run", help="Run benchmarks and print or save the results")
+    add_run_options(run_parser)
+    run_parser.add_argument("--save", help="Write the results as a JSON baseline to this path")
+
+    compare_parser = subparsers.add_parser("compare", help="Compare results against a baseline")
+    compare_parser.add_argument("baseline", help="Baseline JSON file")
+    compare_parser.add_argument("current", nargs="?", help="Results JSON file (default: run the benchmarks now)")
+    compare_parser.add_argument("--threshold", type=float, default=0.10, help="Slowdown flagged as a regression")
+    compare_parser.add_argument(
+        "--metric", choices=["min_s", "median_s"], default="min_s",
+        help="Timing compared (the minimum is the least sensitive to background load)"
+    )
+    compare_parser.add_argument("--save", help="Also write the fresh results to this path")
+    add_run_options(compare_parser)
+
+    args = parser.parse_args()
+
+    if args.command == "run":
+        results = run(args.filter, args.repeat, args.min_time)
+        if args.save:
+            with open(args.save, "w") as f:
+                json.dump(results, f, indent=2)
+            print(f"Saved {len(results['benchmarks'])} benchmarks to {args.save}", file=sys.stderr)
+        else:
+            print(json.dumps(results, indent=2))
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if args.current:
+        with open(args.current) as f:
+            current = json.load(f)
+    else:
+        # Only rerun what the baseline covers, unless a filter says otherwise
+        pattern = args.filter or "^(" + "|".join(re.escape(name) for name in baseline["benchmarks"]) + ")$"
+        current = run(pattern, args.repeat, args.min_time)
+        if args.filter:
+            baseline["benchmarks"] = {
+                name: timing for name, timing in baseline["benchmarks"].items() if name in current["benchmarks"]
+            }
+        if args.save:
+            with open(args.save, "w") as f:
+                json.dump(current, f, indent=2)
+
+    if compare(baseline, current, args.threshold, args.metric):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
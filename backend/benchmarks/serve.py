@@ -0,0 +1,70 @@
+"""
+Benchmark server for Face Matching API
+Runs the API with the stub DeepFace backend (or the real one when its weights are cached)
+
+Usage (from the backend directory):
+    python -m benchmarks.serve --port 8001 --latency detect=8,embed=3,attribute=12,spoof=10
+    python -m benchmarks.serve --port 8001 --real
+    python -m benchmarks.serve --port 8001 --workers 4
+"""
+
+import os
+import logging
+import argparse
+import tempfile
+from typing import Dict
+
+def deepface_weights_dir() -> str:
+    """Directory where DeepFace keeps downloaded model weights"""
+    return os.path.join(os.getenv("DEEPFACE_HOME", os.path.expanduser("~")), ".deepface", "weights")
+
+def parse_latency(value: str) -> Dict[str, float]:
+    """Parse "stage=ms,..." simulated model times"""
+    latency = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        stage, _, ms = item.partition("=")
+        latency[stage.strip()] = float(ms)
+    return latency
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the API for load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--real", action="store_true", help="Use the installed deepface package and cached weights")
+    parser.add_argument(
+        "--latency", default="",
+        help='Stub model time in ms: "detect" and "spoof" per call, "embed" and "attribute" per face'
+    )
+    parser.add_argument("--faces", type=int, default=1, help="Faces the stub detects in every image")
+    parser.add_argument("--workers", type=int, help="Pre-fork worker processes (default: SERVER_WORKERS)")
+    parser.add_argument("--log-level", default="warning", help="API log level (per-request INFO logs skew results)")
+    args = parser.parse_args()
+
+    if args.workers:
+        os.environ["SERVER_WORKERS"] = str(args.workers)
+    if int(os.getenv("SERVER_WORKERS", "1")) > 1 and not os.getenv("EMBEDDING_STORE_DIR"):
+        # Pre-fork workers share galleries through the store
+        os.environ["EMBEDDING_STORE_DIR"] = tempfile.mkdtemp(prefix="face-api-store-")
+
+    if args.real:
+        weights = deepface_weights_dir()
+        if not os.path.isdir(weights) or not os.listdir(weights):
+            parser.error(f"No cached DeepFace weights in {weights}; download them before benchmarking real models")
+    else:
+        from benchmarks import stub_deepface
+        stub_deepface.install(parse_latency(args.latency), args.faces)
+
+    # Imported after the stub is installed so every service binds to it
+    import uvicorn
+    from main import app
+    from config import SERVER_WORKERS
+    from services.prefork_server import PreforkServer
+
+    logging.getLogger().setLevel(args.log_level.upper())
+    if SERVER_WORKERS > 1:
+        PreforkServer.run(app, args.host, args.port, SERVER_WORKERS, log_level=args.log_level)
+    else:
+        uvicorn.run(app, host=args.host, port=args.port, log_level=args.log_level)
+
+if __name__ == "__main__":
+    main()
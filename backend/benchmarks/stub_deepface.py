@@ -0,0 +1,297 @@
+"""
+Deterministic DeepFace stand-in for Face Matching API benchmarks
+Implements the deepface calls the API makes, without TensorFlow or model weights
+
+Outputs depend only on the input pixels, so repeated runs return the same
+faces, embeddings and predictions. Model time can be simulated with a sleep
+per call (which, like TensorFlow kernels, releases the GIL) so that load tests
+exercise queueing and batching realistically.
+"""
+
+import sys
+import time
+import types
+import zlib
+from typing import Any, Dict, List, Optional, Union
+
+import cv2
+import numpy as np
+
+# Simulated model time in milliseconds; "embed" and "attribute" are per face
+LATENCY_MS: Dict[str, float] = {"detect": 0.0, "embed": 0.0, "attribute": 0.0, "spoof": 0.0}
+
+# Faces "detected" in every image (images are split into this many vertical strips)
+FACES_PER_IMAGE = 1
+
+# Built models by task and name, shared with deepface.modules.modeling like DeepFace's cache
+cached_models: Dict[str, Dict[str, Any]] = {}
+
+EMBEDDING_DIMENSIONS = {
+    "VGG-Face": 4096, "Facenet": 128, "Facenet512": 512, "OpenFace": 128,
+    "DeepFace": 4096, "DeepID": 160, "ArcFace": 512, "Dlib": 128, "SFace": 128
+}
+INPUT_SHAPES = {
+    "VGG-Face": (224, 224), "Facenet": (160, 160), "Facenet512": (160, 160), "OpenFace": (96, 96),
+    "DeepFace": (152, 152), "DeepID": (47, 55), "ArcFace": (112, 112), "Dlib": (150, 150), "SFace": (112, 112)
+}
+ATTRIBUTE_LABELS = {
+    "Gender": ["Woman", "Man"],
+    "Emotion": ["angry", "disgust", "fear", "happy", "sad", "surprise", "neutral"],
+    "Race": ["asian", "indian", "black", "white", "middle eastern", "latino hispanic"]
+}
+# Pre-tuned DeepFace thresholds; verification results depend on them
+THRESHOLDS = {
+    "VGG-Face": {"cosine": 0.68, "euclidean": 1.17, "euclidean_l2": 1.17},
+    "Facenet": {"cosine": 0.40, "euclidean": 10, "euclidean_l2": 0.80},
+    "Facenet512": {"cosine": 0.30, "euclidean": 23.56, "euclidean_l2": 1.04},
+    "ArcFace": {"cosine": 0.68, "euclidean": 4.15, "euclidean_l2": 1.13},
+    "Dlib": {"cosine": 0.07, "euclidean": 0.6, "euclidean_l2": 0.4},
+    "SFace": {"cosine": 0.593, "euclidean": 10.734, "euclidean_l2": 1.055},
+    "OpenFace": {"cosine": 0.10, "euclidean": 0.55, "euclidean_l2": 0.55},
+    "DeepFace": {"cosine": 0.23, "euclidean": 64, "euclidean_l2": 0.64},
+    "DeepID": {"cosine": 0.015, "euclidean": 45, "euclidean_l2": 0.17}
+}
+
+def _simulate(stage: str, count: int = 1) -> None:
+    delay = LATENCY_MS.get(stage, 0.0) * count / 1000
+    if delay > 0:
+        time.sleep(delay)
+
+def _seed(array: np.ndarray) -> int:
+    return zlib.crc32(np.ascontiguousarray(array).tobytes())
+
+def _load_image(img_path: Union[str, np.ndarray]) -> np.ndarray:
+    if isinstance(img_path, np.ndarray):
+        return img_path
+    image = cv2.imread(img_path)
+    if image is None:
+        raise ValueError(f"Cannot read image {img_path}")
+    return image
+
+class _Tensor:
+    """What Keras models return from a call: an object with numpy()"""
+
+    def __init__(self, array: np.ndarray):
+        self._array = array
+
+    def numpy(self) -> np.ndarray:
+        return self._array
+
+class _RecognitionNetwork:
+    """Callable like a Keras model; one pseudo-random embedding per crop"""
+
+    def __init__(self, dimensions: int):
+        self.dimensions = dimensions
+
+    def __call__(self, crops: np.ndarray, training: bool = False) -> _Tensor:
+        crops = np.asarray(crops, dtype=np.float32)
+        _simulate("embed", len(crops))
+        rows = [
+            np.random.default_rng(_seed(crop)).standard_normal(self.dimensions).astype(np.float32)
+            for crop in crops
+        ]
+        return _Tensor(np.stack(rows) if rows else np.empty((0, self.dimensions), dtype=np.float32))
+
+class FacialRecognition:
+    """Mirror of deepface.models.FacialRecognition.FacialRecognition"""
+
+    model: Any
+    model_name: str
+    input_shape: tuple
+    output_shape: int
+
+    def forward(self, img: np.ndarray) -> List[float]:
+        return self.model(img, training=False).numpy()[0].tolist()
+
+class _StubRecognitionModel(FacialRecognition):
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self.input_shape = INPUT_SHAPES.get(model_name, (160, 160))
+        self.output_shape = EMBEDDING_DIMENSIONS.get(model_name, 128)
+        self.model = _RecognitionNetwork(self.output_shape)
+
+class _StubVggFaceModel(_StubRecognitionModel):
+    """VGG-Face overrides forward to L2-normalize the embedding"""
+
+    def forward(self, img: np.ndarray) -> List[float]:
+        embedding = self.model(img, training=False).numpy()[0]
+        norm = np.linalg.norm(embedding)
+        return (embedding if norm == 0 else embedding / norm).tolist()
+
+class _StubModel:
+    """Detector, attribute or anti-spoofing model placeholder"""
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+
+def build_model_for_task(task: str, model_name: str) -> Any:
+    """deepface.modules.modeling.build_model; models stay in cached_models like DeepFace's"""
+    models = cached_models.setdefault(task, {})
+    if model_name not in models:
+        if task == "facial_recognition":
+            model_class = _StubVggFaceModel if model_name == "VGG-Face" else _StubRecognitionModel
+            models[model_name] = model_class(model_name)
+        else:
+            models[model_name] = _StubModel(model_name)
+    return models[model_name]
+
+def extract_faces(
+    img_path: Union[str, np.ndarray],
+    detector_backend: str = "opencv",
+    enforce_detection: bool = True,
+    align: bool = True,
+    expand_percentage: int = 0,
+    grayscale: bool = False,
+    color_face: str = "rgb",
+    normalize_face: bool = True,
+    anti_spoofing: bool = False
+) -> List[Dict[str, Any]]:
+    """deepface.modules.detection.extract_faces and DeepFace.extract_faces"""
+    image = _load_image(img_path)
+    height, width = image.shape[:2]
+    faces = 1 if detector_backend == "skip" else FACES_PER_IMAGE
+    if detector_backend != "skip":
+        build_model_for_task("face_detector", detector_backend)
+        _simulate("detect")
+
+    if detector_backend != "skip" and np.ptp(image) == 0:
+        # A blank image has no face: DeepFace raises, or returns the whole image with confidence 0
+        if enforce_detection:
+            raise ValueError("Face could not be detected. Please confirm that the picture is a face photo.")
+        faces = 0
+        face_objs = [{
+            "face": image[:, :, ::-1].astype(np.float32) / 255,
+            "facial_area": {"x": 0, "y": 0, "w": width, "h": height, "left_eye": None, "right_eye": None},
+            "confidence": 0
+        }]
+    else:
+        face_objs = []
+    for k in range(faces):
+        x, w = k * width // faces, width // faces
+        face_obj = {
+            # RGB crop scaled to [0, 1], like DeepFace
+            "face": image[:, x:x + w, ::-1].astype(np.float32) / 255,
+            "facial_area": {"x": x, "y": 0, "w": w, "h": height, "left_eye": None, "right_eye": None},
+            "confidence": 0.99
+        }
+        if anti_spoofing:
+            build_model_for_task("spoofing", "Fasnet")
+            _simulate("spoof")
+            score = (_seed(image[:, x:x + w:7]) % 1000) / 1000
+            face_obj["is_real"] = score >= 0.2
+            face_obj["antispoofing_score"] = score
+        face_objs.append(face_obj)
+    return face_objs
+
+def resize_image(img: np.ndarray, target_size: tuple) -> np.ndarray:
+    """deepface.modules.preprocessing.resize_image: (1, height, width, 3) float32 in [0, 1]"""
+    resized = cv2.resize(np.asarray(img, dtype=np.float32), (target_size[1], target_size[0]))
+    if resized.max() > 1:
+        resized = resized / 255
+    return resized[None, ...].astype(np.float32)
+
+def normalize_input(img: np.ndarray, normalization: str = "base") -> np.ndarray:
+    """deepface.modules.preprocessing.normalize_input (only "base" is used by the API)"""
+    return img
+
+def find_threshold(model_name: str, distance_metric: str) -> float:
+    """deepface.modules.verification.find_threshold"""
+    base = {"cosine": 0.40, "euclidean": 0.55, "euclidean_l2": 0.75}
+    return THRESHOLDS.get(model_name, base).get(distance_metric, 0.4)
+
+def build_model(model_name: str, task: str = "facial_recognition") -> Any:
+    """DeepFace.build_model"""
+    return build_model_for_task(task, model_name)
+
+def represent(
+    img_path: Union[str, np.ndarray],
+    model_name: str = "VGG-Face",
+    enforce_detection: bool = True,
+    detector_backend: str = "opencv",
+    align: bool = True,
+    expand_percentage: int = 0,
+    normalization: str = "base",
+    anti_spoofing: bool = False,
+    max_faces: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """DeepFace.represent"""
+    model = build_model(model_name)
+    results = []
+    for face_obj in extract_faces(img_path, detector_backend=detector_backend):
+        crop = resize_image(face_obj["face"][:, :, ::-1], (model.input_shape[1], model.input_shape[0]))
+        results.append({
+            "embedding": model.forward(crop),
+            "facial_area": face_obj["facial_area"],
+            "face_confidence": face_obj["confidence"]
+        })
+    return results
+
+def analyze(
+    img_path: Union[str, np.ndarray],
+    actions: Any = ("emotion", "age", "gender", "race"),
+    enforce_detection: bool = True,
+    detector_backend: str = "opencv",
+    align: bool = True,
+    expand_percentage: int = 0,
+    silent: bool = False,
+    anti_spoofing: bool = False
+) -> List[Dict[str, Any]]:
+    """DeepFace.analyze"""
+    actions = [actions] if isinstance(actions, str) else list(actions)
+    results = []
+    for face_obj in extract_faces(img_path, detector_backend=detector_backend):
+        rng = np.random.default_rng(_seed(face_obj["face"][::4, ::4]))
+        result: Dict[str, Any] = {}
+        for action in actions:
+            model_name = action.capitalize()
+            build_model(model_name, task="facial_attribute")
+            _simulate("attribute")
+            if action == "age":
+                result["age"] = int(rng.integers(18, 70))
+                continue
+            scores = rng.dirichlet(np.ones(len(ATTRIBUTE_LABELS[model_name]))) * 100
+            result[action] = {label: float(score) for label, score in zip(ATTRIBUTE_LABELS[model_name], scores)}
+            result[f"dominant_{action}"] = ATTRIBUTE_LABELS[model_name][int(np.argmax(scores))]
+        result["region"] = face_obj["facial_area"]
+        result["face_confidence"] = face_obj["confidence"]
+        results.append(result)
+    return results
+
+def _module(name: str, **attributes: Any) -> types.ModuleType:
+    module = types.ModuleType(name)
+    module.__dict__.update(attributes)
+    sys.modules[name] = module
+    return module
+
+def install(latency_ms: Optional[Dict[str, float]] = None, faces_per_image: int = 1) -> None:
+    """
+    Register the stub as the deepface package; call before importing the API
+
+    Args:
+        latency_ms: Simulated model time per call ("detect", "spoof") or per face ("embed", "attribute")
+        faces_per_image: Faces detected in every image
+    """
+    global FACES_PER_IMAGE
+    if "deepface" in sys.modules and not getattr(sys.modules["deepface"], "STUB", False):
+        raise RuntimeError("The real deepface package is already imported")
+
+    LATENCY_MS.update(latency_ms or {})
+    FACES_PER_IMAGE = max(1, faces_per_image)
+
+    detection = _module("deepface.modules.detection", extract_faces=extract_faces)
+    preprocessing = _module(
+        "deepface.modules.preprocessing", resize_image=resize_image, normalize_input=normalize_input
+    )
+    verification = _module("deepface.modules.verification", find_threshold=find_threshold)
+    modeling = _module("deepface.modules.modeling", build_model=build_model_for_task, cached_models=cached_models)
+    modules = _module(
+        "deepface.modules",
+        detection=detection, preprocessing=preprocessing, verification=verification, modeling=modeling
+    )
+    recognition = _module("deepface.models.FacialRecognition", FacialRecognition=FacialRecognition)
+    models = _module("deepface.models", FacialRecognition=recognition)
+    deepface_api = _module(
+        "deepface.DeepFace",
+        build_model=build_model, represent=represent, analyze=analyze, extract_faces=extract_faces
+    )
+    _module("deepface", STUB=True, DeepFace=deepface_api, modules=modules, models=models)
@@ -34,6 +34,12 @@ APP_VERSION = "1.0.0"
 SERVER_HOST = "0.0.0.0"
 SERVER_PORT = 8000
 
+# Pre-fork server: with more than one worker, models are loaded and warmed in a parent
+# process that forks the workers, so they share the weights copy-on-write
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", "1"))
+SERVER_SHUTDOWN_TIMEOUT_SECONDS = float(os.getenv("SERVER_SHUTDOWN_TIMEOUT_SECONDS", "30"))
+WORKER_RESTART_DELAY_SECONDS = 1.0
+
 # File upload settings
 MAX_COMPARISON_FILES = 4
 MIN_COMPARISON_FILES = 2
@@ -41,6 +47,47 @@ MAX_ANALYSIS_FILES = 10
 MIN_ANALYSIS_FILES = 1
 MAX_SPOOFING_FILES = 10
 MIN_SPOOFING_FILES = 1
+MAX_ENROLLMENT_FILES = 10
+MIN_ENROLLMENT_FILES = 1
+
+# Streaming responses (opt-in per request with the "stream" form field)
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Identification settings
+DEFAULT_IDENTIFY_TOP_K = 5
+MAX_IDENTIFY_TOP_K = 100
+
+# Gallery index settings: "exact" (brute force), "ivf" (NumPy inverted file) or "hnsw" (needs hnswlib)
+GALLERY_INDEX = os.getenv("GALLERY_INDEX", "exact")
+ANN_MIN_TRAIN_SIZE = int(os.getenv("ANN_MIN_TRAIN_SIZE", "20000"))  # IVF searches exhaustively below this size
+ANN_IVF_NLIST = int(os.getenv("ANN_IVF_NLIST", "0"))  # 0 picks 4 * sqrt(size) lists at training time
+ANN_IVF_NPROBE = int(os.getenv("ANN_IVF_NPROBE", "16"))  # more lists probed = higher recall, slower search
+ANN_HNSW_M = int(os.getenv("ANN_HNSW_M", "16"))
+ANN_HNSW_EF_CONSTRUCTION = int(os.getenv("ANN_HNSW_EF_CONSTRUCTION", "200"))
+ANN_HNSW_EF_SEARCH = int(os.getenv("ANN_HNSW_EF_SEARCH", "64"))  # higher = higher recall, slower search
+
+# Persistent embedding store (empty disables persistence; galleries are then memory-only)
+EMBEDDING_STORE_DIR = os.getenv("EMBEDDING_STORE_DIR", "")
+EMBEDDING_STORE_DTYPE = os.getenv("EMBEDDING_STORE_DTYPE", "float32")  # float32 or float16
+
+# Bulk jobs: ZIP archives or server-side directories processed by local worker
+# processes in chunks; a chunk is the unit of progress, output and crash resume
+JOBS_DIR = os.getenv("JOBS_DIR", "data/jobs")
+JOB_TASKS = ["embeddings", "attributes", "spoofing"]
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "1"))  # each worker process loads its own models
+JOB_WORKER_NICE = int(os.getenv("JOB_WORKER_NICE", "10"))  # keep interactive requests ahead of jobs
+JOB_CHUNK_SIZE = int(os.getenv("JOB_CHUNK_SIZE", "64"))
+JOB_MAX_IMAGES = int(os.getenv("JOB_MAX_IMAGES", "200000"))
+JOB_MAX_IMAGE_MB = float(os.getenv("JOB_MAX_IMAGE_MB", "20"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "2"))  # per chunk, for worker crashes
+JOB_EMBEDDING_DTYPE = os.getenv("JOB_EMBEDDING_DTYPE", "float32")  # float32 or float16 embedding outputs
+# Server directories that directory jobs may read (comma-separated, empty disables directory jobs)
+JOB_INPUT_DIRS = [path.strip() for path in os.getenv("JOB_INPUT_DIRS", "").split(",") if path.strip()]
+DEFAULT_JOB_RESULTS_LIMIT = 100
+MAX_JOB_RESULTS_LIMIT = 1000
+
+# Image pipeline settings (decode uploads in memory; temp files are only a fallback)
+IN_MEMORY_IMAGES = os.getenv("IN_MEMORY_IMAGES", "true").lower() == "true"
 
 # Supported image formats
 SUPPORTED_IMAGE_TYPES = ['.png', '.jpg', '.jpeg', '.gif', '.bmp', '.webp']
@@ -49,6 +96,127 @@ SUPPORTED_CONTENT_TYPE = 'image/'
 # Valid facial attribute actions
 VALID_ACTIONS = ['age', 'gender', 'emotion', 'race']
 
+# DeepFace attribute model names for each valid action
+ATTRIBUTE_MODELS = {
+    'age': 'Age',
+    'gender': 'Gender',
+    'emotion': 'Emotion',
+    'race': 'Race'
+}
+
+# Approximate resident size of each model ("task/name"), used until a loaded
+# model's parameters can be counted and for models without Keras weights
+MODEL_SIZES_MB = {
+    "facial_recognition/VGG-Face": 580,
+    "facial_recognition/Facenet": 90,
+    "facial_recognition/Facenet512": 95,
+    "facial_recognition/OpenFace": 15,
+    "facial_recognition/DeepFace": 550,
+    "facial_recognition/DeepID": 2,
+    "facial_recognition/ArcFace": 135,
+    "facial_recognition/Dlib": 22,
+    "facial_recognition/SFace": 37,
+    "facial_attribute/Age": 540,
+    "facial_attribute/Gender": 540,
+    "facial_attribute/Emotion": 6,
+    "facial_attribute/Race": 540,
+    "face_detector/opencv": 1,
+    "spoofing/Fasnet": 4
+}
+DEFAULT_MODEL_SIZE_MB = 100
+
+# Memory budget for resident models; least recently used idle models are evicted
+# to stay within it and requests wait while busy models hold the memory
+MODEL_MEMORY_BUDGET_MB = float(os.getenv("MODEL_MEMORY_BUDGET_MB", "2400"))
+
+# Face detector and anti-spoofing models used by DeepFace
+DEFAULT_DETECTOR_BACKEND = "opencv"
+ANTI_SPOOFING_MODEL = "Fasnet"
+
+# Startup imports: "background" serves the control-plane endpoints immediately while
+# DeepFace and TensorFlow are imported on the preload thread; "eager" imports them
+# before the server accepts requests
+STARTUP_IMPORTS = os.getenv("STARTUP_IMPORTS", "background")
+
+# Model preloading settings (comma-separated lists, "all" selects every model)
+def _parse_list_env(name: str, default: str, choices: list) -> list:
+    """Parse a comma-separated environment variable restricted to known choices"""
+    raw = os.getenv(name, default).strip()
+    if raw.lower() == "all":
+        return list(choices)
+    values = [value.strip() for value in raw.split(',') if value.strip()]
+    return [value for value in values if value in choices]
+
+PRELOAD_MODELS = _parse_list_env("PRELOAD_MODELS", "Facenet", AVAILABLE_MODELS)
+PRELOAD_ATTRIBUTE_ACTIONS = _parse_list_env("PRELOAD_ATTRIBUTE_ACTIONS", "", VALID_ACTIONS)
+PRELOAD_DETECTOR = os.getenv("PRELOAD_DETECTOR", "true").lower() == "true"
+PRELOAD_ANTI_SPOOFING = os.getenv("PRELOAD_ANTI_SPOOFING", "false").lower() == "true"
+WARMUP_IMAGE_SIZE = 224
+
+# Result cache settings (content-addressed detection/embedding results, 0 MB disables)
+RESULT_CACHE_MAX_MB = float(os.getenv("RESULT_CACHE_MAX_MB", "64"))
+RESULT_CACHE_TTL_SECONDS = int(os.getenv("RESULT_CACHE_TTL_SECONDS", "3600"))
+
+# Inference executor settings
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", str(min(4, os.cpu_count() or 1))))
+MODEL_CONCURRENCY = int(os.getenv("MODEL_CONCURRENCY", "1"))  # concurrent calls allowed per model
+
+# Admission control: total cost of running inference requests, wait queue bounds
+# and per-image cost of each endpoint (requests beyond the queue get a fast 503)
+ADMISSION_CAPACITY = float(os.getenv("ADMISSION_CAPACITY", str(4 * INFERENCE_WORKERS)))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "32"))
+ADMISSION_QUEUE_TIMEOUT_SECONDS = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", "30"))
+ADMISSION_ENDPOINT_WEIGHTS = {
+    "compare-faces": 1.0,
+    "extract-embeddings": 1.0,
+    "analyze-attributes": 2.0,
+    "anti-spoofing": 1.0,
+    "gallery-enroll": 1.0,
+    "identify": 1.0
+}
+# Requests are admitted before their body is read, so their image count is
+# estimated from Content-Length, capped at each endpoint's file limit
+ADMISSION_BYTES_PER_IMAGE = int(os.getenv("ADMISSION_BYTES_PER_IMAGE", str(512 * 1024)))
+ADMISSION_ENDPOINT_MAX_IMAGES = {
+    "compare-faces": MAX_COMPARISON_FILES,
+    "extract-embeddings": MAX_COMPARISON_FILES,
+    "analyze-attributes": MAX_ANALYSIS_FILES,
+    "anti-spoofing": MAX_SPOOFING_FILES,
+    "gallery-enroll": MAX_ENROLLMENT_FILES,
+    "identify": 1
+}
+
+# Request deadlines: per-endpoint defaults in seconds, overridable per request with
+# the header below (capped at MAX_REQUEST_TIMEOUT_SECONDS)
+REQUEST_TIMEOUT_HEADER = "X-Request-Timeout"
+DEFAULT_REQUEST_TIMEOUT_SECONDS = float(os.getenv("DEFAULT_REQUEST_TIMEOUT_SECONDS", "60"))
+MAX_REQUEST_TIMEOUT_SECONDS = float(os.getenv("MAX_REQUEST_TIMEOUT_SECONDS", "300"))
+REQUEST_TIMEOUTS = {
+    "compare-faces": DEFAULT_REQUEST_TIMEOUT_SECONDS,
+    "extract-embeddings": DEFAULT_REQUEST_TIMEOUT_SECONDS,
+    "analyze-attributes": 2 * DEFAULT_REQUEST_TIMEOUT_SECONDS,
+    "anti-spoofing": 2 * DEFAULT_REQUEST_TIMEOUT_SECONDS,
+    "gallery-enroll": DEFAULT_REQUEST_TIMEOUT_SECONDS,
+    "identify": DEFAULT_REQUEST_TIMEOUT_SECONDS
+}
+
+# Prometheus metrics served at /metrics (latency histogram bucket bounds in seconds)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+METRICS_LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Per-request stage timings, added to responses of requests sending this header
+TIMINGS_HEADER = "X-Include-Timings"
+
+# Admin endpoints (sampling profiler); an empty token disables them
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+ADMIN_TOKEN_HEADER = "X-Admin-Token"
+PROFILER_MAX_SECONDS = float(os.getenv("PROFILER_MAX_SECONDS", "60"))
+PROFILER_DEFAULT_INTERVAL_MS = 10
+
+# Embedding micro-batching (face crops of concurrent requests share one forward pass)
+EMBEDDING_BATCH_MAX_SIZE = int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "32"))
+EMBEDDING_BATCH_MAX_WAIT_MS = float(os.getenv("EMBEDDING_BATCH_MAX_WAIT_MS", "5"))
+
 # Logging configuration
 def setup_logging():
     """Configure logging for the application"""
@@ -8,11 +8,17 @@ from .face_comparison import router as face_comparison_router
 from .face_analysis import router as face_analysis_router
 from .anti_spoofing import router as anti_spoofing_router
 from .face_embeddings import router as face_embeddings_router
+from .identification import router as identification_router
+from .jobs import router as jobs_router
+from .admin import router as admin_router
 
 __all__ = [
     "basic_router",
     "face_comparison_router", 
     "face_analysis_router",
     "anti_spoofing_router",
-    "face_embeddings_router"
+    "face_embeddings_router",
+    "identification_router",
+    "jobs_router",
+    "admin_router"
 ]
\ No newline at end of file
@@ -0,0 +1,38 @@
+"""
+Admin endpoints for Face Matching API
+Contains the on-demand sampling profiler
+"""
+
+import secrets
+import logging
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+from config import ADMIN_TOKEN, ADMIN_TOKEN_HEADER, PROFILER_MAX_SECONDS, PROFILER_DEFAULT_INTERVAL_MS
+from services.profiler_service import SamplingProfiler
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+def require_admin(token: str = Header("", alias=ADMIN_TOKEN_HEADER)) -> None:
+    """Reject requests without the admin token (admin endpoints are off without one)"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Admin endpoints are disabled")
+    if not secrets.compare_digest(token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+@router.post(
+    "/admin/profile",
+    response_class=PlainTextResponse,
+    dependencies=[Depends(require_admin)],
+    include_in_schema=False
+)
+async def profile(
+    seconds: float = Query(10, gt=0, le=PROFILER_MAX_SECONDS),
+    interval_ms: float = Query(PROFILER_DEFAULT_INTERVAL_MS, ge=1, le=1000),
+    idle: bool = Query(False)
+):
+    """Sample live traffic for a number of seconds and return folded stacks for a flame graph"""
+    folded, samples = await SamplingProfiler.profile(seconds, interval_ms, include_idle=idle)
+    logger.info(f"Profile finished: {samples} samples, {len(folded.splitlines())} distinct stacks")
+    return PlainTextResponse(folded, headers={"X-Profile-Samples": str(samples)})
@@ -3,29 +3,120 @@ Anti-spoofing endpoints for Face Matching API
 Contains face spoofing detection logic
 """
 
-from typing import List
+from typing import Any, AsyncIterator, Dict, List, Union
 import logging
-from fastapi import APIRouter, File, UploadFile, HTTPException
+import numpy as np
+from fastapi import APIRouter, Depends, File, UploadFile, Form, HTTPException
 from fastapi.responses import JSONResponse
-from deepface import DeepFace
 
 from config import (
-    MAX_SPOOFING_FILES, MIN_SPOOFING_FILES,
-    SUPPORTED_CONTENT_TYPE
-)
-from utils import (
-    validate_image, save_temp_image, cleanup_temp_files,
-    validate_file_count, validate_content_type, generate_temp_filename,
-    calculate_confidence_level
+    MAX_SPOOFING_FILES, MIN_SPOOFING_FILES
 )
+from utils import validate_file_count, calculate_confidence_level
 from schemas import AntiSpoofingResponse
+from services.face_service import FaceService
+from services.file_service import FileService
+from services.model_service import ModelService
+from services.admission_service import AdmissionController
+from services.deadline_service import RequestDeadline
+from services.metrics_service import MetricsService
+from services.timing_service import RequestTimings
+from services.streaming_service import NDJSONStream
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-@router.post("/anti-spoofing", response_model=AntiSpoofingResponse)
+def _build_image_result(
+    image_index: int,
+    filename: str,
+    face_objs: Union[List[Dict[str, Any]], Exception]
+) -> Dict[str, Any]:
+    """Format the spoof detection outcome of one image"""
+    try:
+        if isinstance(face_objs, Exception):
+            raise face_objs
+        
+        # Process each detected face
+        processed_faces = []
+        for face_idx, face_obj in enumerate(face_objs):
+            is_real = face_obj.get("is_real", None)
+            antispoofing_score = face_obj.get("antispoofing_score", None)
+            region = face_obj.get("region", {})
+            
+            # Determine confidence level based on score
+            confidence = calculate_confidence_level(antispoofing_score)
+            
+            face_result = {
+                "face_index": face_idx,
+                "is_real": is_real,
+                "antispoofing_score": antispoofing_score,
+                "confidence": confidence,
+                "region": region,
+                "status": "real" if is_real else "spoofed" if is_real is not None else "unknown"
+            }
+            
+            processed_faces.append(face_result)
+        
+        return {
+            "image_index": image_index,
+            "filename": filename,
+            "faces_detected": len(processed_faces),
+            "faces": processed_faces
+        }
+    
+    except ValueError as e:
+        # Handle DeepFace ValueError for spoof detection
+        if "Spoof detected" in str(e):
+            return {
+                "image_index": image_index,
+                "filename": filename,
+                "faces_detected": 0,
+                "spoof_detected": True,
+                "error": str(e)
+            }
+        raise e
+    
+    except Exception as e:
+        logger.error(f"Error analyzing {filename}: {e}")
+        return {
+            "image_index": image_index,
+            "filename": filename,
+            "faces_detected": 0,
+            "error": str(e)
+        }
+
+async def _stream_results(
+    files: List[UploadFile],
+    images: List[Union[np.ndarray, str]]
+) -> AsyncIterator[Dict[str, Any]]:
+    """Check images concurrently and yield each result as soon as it is ready"""
+    results = []
+    
+    async for i, face_objs in NDJSONStream.as_completed([FaceService.detect_spoofing(image) for image in images]):
+        with RequestTimings.stage("postprocess", i):
+            result = _build_image_result(i, files[i].filename, face_objs)
+        results.append(result)
+        yield {"type": "result", **result}
+    
+    yield RequestTimings.attach({
+        "type": "summary",
+        "total_images": len(files),
+        "summary": FaceService.calculate_spoofing_summary(results)
+    })
+
+@router.post(
+    "/anti-spoofing",
+    response_model=AntiSpoofingResponse,
+    dependencies=[
+        Depends(RequestTimings.track),
+        Depends(RequestDeadline.track("anti-spoofing")),
+        Depends(AdmissionController.limit("anti-spoofing")),
+        Depends(ModelService.require_inference_stack)
+    ]
+)
 async def detect_spoofing(
-    files: List[UploadFile] = File(...)
+    files: List[UploadFile] = File(...),
+    stream: bool = Form(False)
 ):
     """Detect face spoofing/liveness in uploaded images"""
     
@@ -36,122 +127,52 @@ async def detect_spoofing(
     if file_count_error:
         raise HTTPException(status_code=400, detail=file_count_error)
     
-    temp_files = []
+    images = []
     results = []
     
     try:
-        # Save uploaded files temporarily
-        for i, file in enumerate(files):
-            if not validate_content_type(file.content_type, SUPPORTED_CONTENT_TYPE):
-                raise HTTPException(
-                    status_code=400, 
-                    detail=f"File {file.filename} is not an image"
-                )
-            
-            content = await file.read()
-            
-            if not validate_image(content):
-                raise HTTPException(
-                    status_code=400, 
-                    detail=f"File {file.filename} is not a valid image"
-                )
-            
-            temp_path = save_temp_image(
-                content, 
-                generate_temp_filename("temp_spoof", i, file.filename)
-            )
-            temp_files.append(temp_path)
+        # Decode uploaded files in memory
+        images = await FileService.process_uploaded_files(files, "temp_spoof")
+        
+        if stream:
+            # One NDJSON line per image as it completes; the stream releases the images
+            response = NDJSONStream.response(_stream_results(files, images), images)
+            images = []
+            return response
         
         # Perform spoof detection on each image
-        for i, temp_path in enumerate(temp_files):
+        for i, image in enumerate(images):
+            # Skip the remaining images once the deadline passed or the client left
+            await RequestDeadline.check(f"image {i}")
+            
             try:
-                # Use DeepFace extract_faces with anti_spoofing enabled
-                face_objs = DeepFace.extract_faces(
-                    img_path=temp_path,
-                    anti_spoofing=True
-                )
-                
-                # Process each detected face
-                processed_faces = []
-                for face_idx, face_obj in enumerate(face_objs):
-                    is_real = face_obj.get("is_real", None)
-                    antispoofing_score = face_obj.get("antispoofing_score", None)
-                    region = face_obj.get("region", {})
-                    
-                    # Determine confidence level based on score
-                    confidence = calculate_confidence_level(antispoofing_score)
-                    
-                    face_result = {
-                        "face_index": face_idx,
-                        "is_real": is_real,
-                        "antispoofing_score": antispoofing_score,
-                        "confidence": confidence,
-                        "region": region,
-                        "status": "real" if is_real else "spoofed" if is_real is not None else "unknown"
-                    }
-                    
-                    processed_faces.append(face_result)
-                
-                results.append({
-                    "image_index": i,
-                    "filename": files[i].filename,
-                    "faces_detected": len(processed_faces),
-                    "faces": processed_faces
-                })
-                
-            except ValueError as e:
-                # Handle DeepFace ValueError for spoof detection
-                if "Spoof detected" in str(e):
-                    results.append({
-                        "image_index": i,
-                        "filename": files[i].filename,
-                        "faces_detected": 0,
-                        "spoof_detected": True,
-                        "error": str(e)
-                    })
-                else:
-                    raise e
-                    
+                # Use FaceService to run extract_faces with anti_spoofing enabled
+                face_objs = await RequestTimings.for_image(i, FaceService.detect_spoofing(image))
             except Exception as e:
-                logger.error(f"Error analyzing {files[i].filename}: {e}")
-                results.append({
-                    "image_index": i,
-                    "filename": files[i].filename,
-                    "faces_detected": 0,
-                    "error": str(e)
-                })
-        
-        # Calculate summary statistics
-        total_faces = sum(r.get("faces_detected", 0) for r in results)
-        real_faces = sum(
-            len([f for f in r.get("faces", []) if f.get("is_real") is True])
-            for r in results
-        )
-        spoofed_faces = sum(
-            len([f for f in r.get("faces", []) if f.get("is_real") is False])
-            for r in results
-        )
+                face_objs = e
+            
+            with RequestTimings.stage("postprocess", i):
+                results.append(_build_image_result(i, files[i].filename, face_objs))
         
         # Prepare response
         response = {
             "total_images": len(files),
             "results": results,
-            "summary": {
-                "total_faces": total_faces,
-                "real_faces": real_faces,
-                "spoofed_faces": spoofed_faces,
-                "detection_rate": f"{((real_faces + spoofed_faces) / max(total_faces, 1) * 100):.1f}%" if total_faces > 0 else "0%",
-                "successful_analyses": len([r for r in results if "error" not in r]),
-                "failed_analyses": len([r for r in results if "error" in r])
-            }
+            "summary": FaceService.calculate_spoofing_summary(results)
         }
+        RequestTimings.attach(response)
         
-        return JSONResponse(content=response)
-        
+        with MetricsService.time_stage("serialization"):
+            return JSONResponse(content=response)
+    
+    except HTTPException:
+        # Deadline, disconnect and upload validation errors keep their status
+        raise
+    
     except Exception as e:
         logger.error(f"Unexpected error in anti_spoofing: {e}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
     
     finally:
-        # Clean up temporary files
-        cleanup_temp_files(temp_files)
\ No newline at end of file
+        # Release images and any fallback temporary files
+        FileService.cleanup_images(images)
\ No newline at end of file
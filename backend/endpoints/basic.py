@@ -1,14 +1,24 @@
 """
 Basic endpoints for Face Matching API
-Contains root, health check, and models endpoints
+Contains root, health check, readiness, and models endpoints
 """
 
 import psutil
 import os
-from fastapi import APIRouter
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Query
+from fastapi.responses import JSONResponse, Response
 from config import AVAILABLE_MODELS
-from schemas import BasicResponse, HealthResponse, ModelsResponse
+from lazy_imports import ImportProfiler
+from schemas import BasicResponse, HealthResponse, ReadyResponse, ModelsResponse, StartupResponse
+from services.model_service import ModelService
+from services.cache_service import CacheService
+from services.batching_service import EmbeddingBatcher
+from services.admission_service import AdmissionController
+from services.deadline_service import RequestDeadline
+from services.job_service import JobService
+from services.inference_executor import InferenceExecutor
+from services.metrics_service import MetricsService, METRICS_CONTENT_TYPE
+from services.prefork_server import PreforkServer
 
 router = APIRouter()
 
@@ -50,10 +60,120 @@ async def health_check():
             "available_mb": round(available_memory_mb, 2),
             "usage_percent": round(memory_usage_percent, 2),
             "process_memory_mb": round(process_memory_mb, 2)
-        }
+        },
+        "cache": CacheService.get_stats(),
+        "batching": EmbeddingBatcher.get_stats(),
+        "model_memory": ModelService.get_registry_stats(),
+        "admission": AdmissionController.get_stats(),
+        "deadlines": RequestDeadline.get_stats(),
+        "jobs": JobService.get_stats(),
+        "workers": PreforkServer.get_stats()
+    }
+
+@router.get("/ready", response_model=ReadyResponse)
+async def readiness_check():
+    """Readiness endpoint reporting resident models and their warm-up times"""
+    readiness = ModelService.get_readiness()
+    status_code = 200 if readiness["ready"] else 503
+    return JSONResponse(content=readiness, status_code=status_code)
+
+@router.get("/startup", response_model=StartupResponse)
+async def startup_report(limit: int = Query(20, ge=1, le=500)):
+    """Startup phases relative to server start and import cost by package and module"""
+    # Pre-fork workers report against the parent, which imported the app before forking
+    process_started_at = psutil.Process(PreforkServer.server_pid()).create_time()
+    return {
+        "process_started_at": process_started_at,
+        "imports": ModelService.get_readiness()["imports"],
+        **ImportProfiler.report(limit=limit, origin=process_started_at)
     }
 
 @router.get("/models", response_model=ModelsResponse)
 async def get_available_models():
     """Get list of available face recognition models"""
-    return {"models": AVAILABLE_MODELS}
\ No newline at end of file
+    return {"models": AVAILABLE_MODELS}
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics: recorded latencies and counters plus current queue and cache state"""
+    cache = CacheService.get_stats()
+    admission = AdmissionController.get_stats()
+    model_memory = ModelService.get_registry_stats()
+    deadlines = RequestDeadline.get_stats()
+    jobs = JobService.get_stats()
+    
+    lines = []
+    lines += MetricsService.format_metric(
+        "face_api_cache_hits_total", "counter", "Result cache hits", [({}, cache["hits"])]
+    )
+    lines += MetricsService.format_metric(
+        "face_api_cache_misses_total", "counter", "Result cache misses", [({}, cache["misses"])]
+    )
+    lines += MetricsService.format_metric(
+        "face_api_cache_size_bytes", "gauge", "Result cache size", [({}, round(cache["size_mb"] * 1024 * 1024))]
+    )
+    lines += MetricsService.format_metric(
+        "face_api_queue_depth", "gauge", "Work waiting in each queue",
+        [
+            ({"queue": "admission"}, admission["queue_depth"]),
+            ({"queue": "executor"}, InferenceExecutor.get_queue_depth()),
+            ({"queue": "embedding_batch"}, EmbeddingBatcher.get_stats()["queued_faces"])
+        ]
+    )
+    lines += MetricsService.format_metric(
+        "face_api_admission_in_use", "gauge", "Admission capacity units held by running requests",
+        [({}, admission["in_use"])]
+    )
+    lines += MetricsService.format_metric(
+        "face_api_admission_rejected_total", "counter", "Requests rejected by admission control",
+        [({}, admission["rejected"])]
+    )
+    lines += MetricsService.format_metric(
+        "face_api_requests_abandoned_total", "counter", "Requests abandoned at a deadline or disconnect",
+        [({"reason": "deadline"}, deadlines["deadline_exceeded"]), ({"reason": "disconnect"}, deadlines["disconnected"])]
+    )
+    lines += MetricsService.format_metric(
+        "face_api_resident_models_bytes", "gauge", "Estimated memory of resident models",
+        [({}, round(model_memory["resident_mb"] * 1024 * 1024))]
+    )
+    lines += MetricsService.format_metric(
+        "face_api_model_evictions_total", "counter", "Models evicted to stay within the memory budget",
+        [({}, model_memory["evictions"])]
+    )
+    lines += MetricsService.format_metric(
+        "face_api_jobs", "gauge", "Bulk jobs by status",
+        [({"status": status}, count) for status, count in jobs["jobs"].items()]
+    )
+    lines += MetricsService.format_metric(
+        "process_resident_memory_bytes", "gauge", "Resident memory of the API process",
+        [({}, psutil.Process(os.getpid()).memory_info().rss)]
+    )
+    
+    # Pre-fork workers: the other metrics describe the worker serving this scrape
+    workers = PreforkServer.get_stats()
+    if workers is not None:
+        alive = [worker for worker in workers["workers"] if worker["alive"]]
+        lines += MetricsService.format_metric(
+            "face_api_worker_requests_total", "counter", "Requests handled by each pre-fork worker since it started",
+            [({"worker": str(worker["index"])}, worker["requests"]) for worker in alive]
+        )
+        lines += MetricsService.format_metric(
+            "face_api_worker_active_requests", "gauge", "Requests in progress in each pre-fork worker",
+            [({"worker": str(worker["index"])}, worker["active_requests"]) for worker in alive]
+        )
+        lines += MetricsService.format_metric(
+            "face_api_worker_restarts_total", "counter", "Times each pre-fork worker was restarted",
+            [({"worker": str(worker["index"])}, worker["restarts"]) for worker in workers["workers"]]
+        )
+        lines += MetricsService.format_metric(
+            "face_api_worker_memory_bytes", "gauge",
+            "Memory of the pre-fork parent and workers (pss splits the shared model pages between them)",
+            [
+                ({"worker": label, "type": kind}, round(process[f"{kind}_mb"] * 1024 * 1024))
+                for label, process in [("parent", workers["parent"])] + [(str(worker["index"]), worker) for worker in alive]
+                for kind in ("rss", "uss", "pss")
+                if process.get(f"{kind}_mb") is not None
+            ]
+        )
+    
+    return Response(content=MetricsService.render(lines), media_type=METRICS_CONTENT_TYPE)
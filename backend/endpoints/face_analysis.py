@@ -3,29 +3,149 @@ Face analysis endpoints for Face Matching API
 Contains facial attributes analysis logic
 """
 
-from typing import List
+from typing import Any, AsyncIterator, Dict, List, Union
+import asyncio
 import logging
-from fastapi import APIRouter, File, UploadFile, Form, HTTPException
+import numpy as np
+from fastapi import APIRouter, Depends, File, UploadFile, Form, HTTPException
 from fastapi.responses import JSONResponse
-from deepface import DeepFace
 
 from config import (
-    MAX_ANALYSIS_FILES, MIN_ANALYSIS_FILES,
-    SUPPORTED_CONTENT_TYPE, VALID_ACTIONS
-)
-from utils import (
-    validate_image, save_temp_image, cleanup_temp_files,
-    validate_file_count, validate_content_type, generate_temp_filename
+    MAX_ANALYSIS_FILES, MIN_ANALYSIS_FILES, VALID_ACTIONS
 )
+from utils import validate_file_count
 from schemas import FacialAttributesResponse
+from services.face_service import FaceService
+from services.file_service import FileService
+from services.model_service import ModelService
+from services.admission_service import AdmissionController
+from services.deadline_service import RequestDeadline
+from services.metrics_service import MetricsService
+from services.timing_service import RequestTimings
+from services.streaming_service import NDJSONStream
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-@router.post("/analyze-attributes", response_model=FacialAttributesResponse)
+def _build_image_result(
+    image_index: int,
+    filename: str,
+    face_results: Union[List[Dict[str, Any]], Exception],
+    action_list: List[str]
+) -> Dict[str, Any]:
+    """Format the attribute analysis outcome of one image"""
+    try:
+        if isinstance(face_results, Exception):
+            raise face_results
+        
+        # Process each detected face
+        processed_faces = []
+        for face_idx, face_data in enumerate(face_results):
+            face_result = {
+                "face_index": face_idx,
+                "filename": filename,
+                "region": face_data.get("region", {}),
+            }
+            
+            # Add requested attributes
+            if 'age' in action_list:
+                face_result["age"] = face_data.get("age", None)
+            
+            if 'gender' in action_list:
+                gender_data = face_data.get("gender", {})
+                face_result["gender"] = {
+                    "prediction": max(gender_data.items(), key=lambda x: x[1])[0] if gender_data else None,
+                    "confidence": gender_data
+                }
+            
+            if 'emotion' in action_list:
+                emotion_data = face_data.get("emotion", {})
+                face_result["emotion"] = {
+                    "prediction": max(emotion_data.items(), key=lambda x: x[1])[0] if emotion_data else None,
+                    "confidence": emotion_data
+                }
+            
+            if 'race' in action_list:
+                race_data = face_data.get("race", {})
+                face_result["race"] = {
+                    "prediction": max(race_data.items(), key=lambda x: x[1])[0] if race_data else None,
+                    "confidence": race_data
+                }
+            
+            processed_faces.append(face_result)
+        
+        return {
+            "image_index": image_index,
+            "filename": filename,
+            "faces_detected": len(processed_faces),
+            "faces": processed_faces
+        }
+    
+    except Exception as e:
+        logger.error(f"Error analyzing {filename}: {e}")
+        return {
+            "image_index": image_index,
+            "filename": filename,
+            "error": str(e)
+        }
+
+async def _stream_results(
+    files: List[UploadFile],
+    images: List[Union[np.ndarray, str]],
+    action_list: List[str]
+) -> AsyncIterator[Dict[str, Any]]:
+    """Analyze images in one batched pass and yield each result as soon as it is final"""
+    results = []
+    ready: asyncio.Queue = asyncio.Queue()
+    analysis = asyncio.ensure_future(FaceService.analyze_face_attributes_batch(
+        images, action_list, on_result=lambda i, face_results: ready.put_nowait((i, face_results))
+    ))
+    # Wakes the loop below if the pass ends without reporting every image
+    analysis.add_done_callback(lambda _: ready.put_nowait(None))
+    
+    try:
+        for _ in images:
+            reported = await ready.get()
+            if reported is None:
+                # Deadline and disconnect errors end the whole stream
+                await analysis
+            i, face_results = reported
+            with RequestTimings.stage("postprocess", i):
+                result = _build_image_result(i, files[i].filename, face_results, action_list)
+            results.append({key: value for key, value in result.items() if key != "faces"})
+            yield {"type": "result", **result}
+        _, attribute_timings = await analysis
+    finally:
+        # Stop the pass when the client goes away or an error ends the stream
+        analysis.cancel()
+    
+    summary = FaceService.calculate_analysis_summary(results)
+    yield RequestTimings.attach({
+        "type": "summary",
+        "actions_performed": action_list,
+        "total_images": len(files),
+        "total_faces_detected": summary["total_faces_detected"],
+        "attribute_timings_ms": attribute_timings,
+        "summary": {
+            "successful_analyses": summary["successful_analyses"],
+            "failed_analyses": summary["failed_analyses"]
+        }
+    })
+
+@router.post(
+    "/analyze-attributes",
+    response_model=FacialAttributesResponse,
+    dependencies=[
+        Depends(RequestTimings.track),
+        Depends(RequestDeadline.track("analyze-attributes")),
+        Depends(AdmissionController.limit("analyze-attributes")),
+        Depends(ModelService.require_inference_stack)
+    ]
+)
 async def analyze_attributes(
     files: List[UploadFile] = File(...),
-    actions: str = Form("age,gender,emotion,race")
+    actions: str = Form("age,gender,emotion,race"),
+    stream: bool = Form(False)
 ):
     """Analyze facial attributes in uploaded images"""
     
@@ -36,134 +156,63 @@ async def analyze_attributes(
     if file_count_error:
         raise HTTPException(status_code=400, detail=file_count_error)
     
-    # Parse actions - support single action to reduce memory usage
-    action_list = [action.strip() for action in actions.split(',')]
-    
-    # Enforce single action limit for memory optimization
-    if len(action_list) > 1:
-        raise HTTPException(
-            status_code=400,
-            detail="Only one attribute can be analyzed per request to reduce memory usage. Please select a single attribute."
-        )
+    # Parse actions - faces are detected once and every requested attribute model
+    # runs on them in turn, within MODEL_MEMORY_BUDGET_MB
+    action_list = list(dict.fromkeys(action.strip() for action in actions.split(',')))
     
     for action in action_list:
         if action not in VALID_ACTIONS:
             raise HTTPException(
-                status_code=400, 
+                status_code=400,
                 detail=f"Invalid action: {action}. Valid actions: {VALID_ACTIONS}"
             )
     
-    temp_files = []
-    results = []
+    images = []
     
     try:
-        # Save uploaded files temporarily
-        for i, file in enumerate(files):
-            if not validate_content_type(file.content_type, SUPPORTED_CONTENT_TYPE):
-                raise HTTPException(
-                    status_code=400, 
-                    detail=f"File {file.filename} is not an image"
-                )
-            
-            content = await file.read()
-            
-            if not validate_image(content):
-                raise HTTPException(
-                    status_code=400, 
-                    detail=f"File {file.filename} is not a valid image"
-                )
-            
-            temp_path = save_temp_image(
-                content, 
-                generate_temp_filename("temp_analyze", i, file.filename)
-            )
-            temp_files.append(temp_path)
+        # Decode uploaded files in memory
+        images = await FileService.process_uploaded_files(files, "temp_analyze")
+        
+        if stream:
+            # One NDJSON line per image as it completes; the stream releases the images
+            response = NDJSONStream.response(_stream_results(files, images, action_list), images)
+            images = []
+            return response
         
-        # Analyze each image
-        for i, temp_path in enumerate(temp_files):
-            try:
-                # Use DeepFace to analyze facial attributes
-                analysis = DeepFace.analyze(
-                    img_path=temp_path,
-                    actions=action_list,
-                    enforce_detection=False  # Allow analysis even if face detection fails
-                )
-                
-                # Handle both single face and multiple faces results
-                if isinstance(analysis, list):
-                    face_results = analysis
-                else:
-                    face_results = [analysis]
-                
-                # Process each detected face
-                processed_faces = []
-                for face_idx, face_data in enumerate(face_results):
-                    face_result = {
-                        "face_index": face_idx,
-                        "filename": files[i].filename,
-                        "region": face_data.get("region", {}),
-                    }
-                    
-                    # Add requested attributes
-                    if 'age' in action_list:
-                        face_result["age"] = face_data.get("age", None)
-                    
-                    if 'gender' in action_list:
-                        gender_data = face_data.get("gender", {})
-                        face_result["gender"] = {
-                            "prediction": max(gender_data.items(), key=lambda x: x[1])[0] if gender_data else None,
-                            "confidence": gender_data
-                        }
-                    
-                    if 'emotion' in action_list:
-                        emotion_data = face_data.get("emotion", {})
-                        face_result["emotion"] = {
-                            "prediction": max(emotion_data.items(), key=lambda x: x[1])[0] if emotion_data else None,
-                            "confidence": emotion_data
-                        }
-                    
-                    if 'race' in action_list:
-                        race_data = face_data.get("race", {})
-                        face_result["race"] = {
-                            "prediction": max(race_data.items(), key=lambda x: x[1])[0] if race_data else None,
-                            "confidence": race_data
-                        }
-                    
-                    processed_faces.append(face_result)
-                
-                results.append({
-                    "image_index": i,
-                    "filename": files[i].filename,
-                    "faces_detected": len(processed_faces),
-                    "faces": processed_faces
-                })
-                
-            except Exception as e:
-                logger.error(f"Error analyzing {files[i].filename}: {e}")
-                results.append({
-                    "image_index": i,
-                    "filename": files[i].filename,
-                    "error": str(e)
-                })
+        # Detect faces in every image once, then run each attribute model over all of them
+        outcomes, attribute_timings = await FaceService.analyze_face_attributes_batch(images, action_list)
+        
+        results = []
+        for i, face_results in enumerate(outcomes):
+            with RequestTimings.stage("postprocess", i):
+                results.append(_build_image_result(i, files[i].filename, face_results, action_list))
+        summary = FaceService.calculate_analysis_summary(results)
         
         # Prepare response
         response = {
             "actions_performed": action_list,
             "total_images": len(files),
-            "total_faces_detected": sum(r.get("faces_detected", 0) for r in results),
+            "total_faces_detected": summary["total_faces_detected"],
             "results": results,
+            "attribute_timings_ms": attribute_timings,
             "summary": {
-                "successful_analyses": len([r for r in results if "error" not in r]),
-                "failed_analyses": len([r for r in results if "error" in r])
+                "successful_analyses": summary["successful_analyses"],
+                "failed_analyses": summary["failed_analyses"]
             }
         }
+        RequestTimings.attach(response)
         
-        return JSONResponse(content=response)
-        
+        with MetricsService.time_stage("serialization"):
+            return JSONResponse(content=response)
+    
+    except HTTPException:
+        # Deadline, disconnect and upload validation errors keep their status
+        raise
+    
     except Exception as e:
         logger.error(f"Unexpected error in analyze_attributes: {e}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
     
     finally:
-        # Clean up temporary files
-        cleanup_temp_files(temp_files)
\ No newline at end of file
+        # Release images and any fallback temporary files
+        FileService.cleanup_images(images)
\ No newline at end of file
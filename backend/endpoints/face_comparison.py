@@ -5,24 +5,35 @@ Contains face verification and comparison logic
 
 from typing import List
 import logging
-from fastapi import APIRouter, File, UploadFile, Form, HTTPException
+from fastapi import APIRouter, Depends, File, UploadFile, Form, HTTPException
 from fastapi.responses import JSONResponse
-from deepface import DeepFace
 
 from config import (
-    MAX_COMPARISON_FILES, MIN_COMPARISON_FILES, 
-    SUPPORTED_CONTENT_TYPE, AVAILABLE_MODELS
-)
-from utils import (
-    validate_image, save_temp_image, cleanup_temp_files,
-    validate_file_count, validate_content_type, generate_temp_filename
+    MAX_COMPARISON_FILES, MIN_COMPARISON_FILES, AVAILABLE_MODELS
 )
+from utils import validate_file_count
 from schemas import FaceComparisonResponse
+from services.face_service import FaceService
+from services.file_service import FileService
+from services.model_service import ModelService
+from services.admission_service import AdmissionController
+from services.deadline_service import RequestDeadline
+from services.metrics_service import MetricsService
+from services.timing_service import RequestTimings
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-@router.post("/compare-faces", response_model=FaceComparisonResponse)
+@router.post(
+    "/compare-faces",
+    response_model=FaceComparisonResponse,
+    dependencies=[
+        Depends(RequestTimings.track),
+        Depends(RequestDeadline.track("compare-faces")),
+        Depends(AdmissionController.limit("compare-faces")),
+        Depends(ModelService.require_inference_stack)
+    ]
+)
 async def compare_faces(
     files: List[UploadFile] = File(...),
     model: str = Form("Facenet")
@@ -43,69 +54,24 @@ async def compare_faces(
             detail=f"Model {model} not supported. Available models: {AVAILABLE_MODELS}"
         )
     
-    temp_files = []
+    images = []
     results = []
     
     try:
-        # Save uploaded files temporarily
-        for i, file in enumerate(files):
-            if not validate_content_type(file.content_type, SUPPORTED_CONTENT_TYPE):
-                raise HTTPException(
-                    status_code=400, 
-                    detail=f"File {file.filename} is not an image"
-                )
-            
-            content = await file.read()
-            
-            if not validate_image(content):
-                raise HTTPException(
-                    status_code=400, 
-                    detail=f"File {file.filename} is not a valid image"
-                )
-            
-            temp_path = save_temp_image(
-                content, 
-                generate_temp_filename("temp_image", i, file.filename)
-            )
-            temp_files.append(temp_path)
+        # Decode uploaded files in memory
+        images = await FileService.process_uploaded_files(files, "temp_image")
         
-        # Perform face comparisons
+        # Embed each image once and compare all pairs from one distance matrix
         comparisons = []
         
-        for i in range(len(temp_files)):
-            for j in range(i + 1, len(temp_files)):
-                try:
-                    # Use DeepFace to compare faces
-                    result = DeepFace.verify(
-                        img1_path=temp_files[i],
-                        img2_path=temp_files[j],
-                        model_name=model,
-                        enforce_detection=False  # Allow comparison even if face detection fails
-                    )
-                    
-                    comparison = {
-                        "image1": files[i].filename,
-                        "image2": files[j].filename,
-                        "verified": result["verified"],
-                        "distance": result["distance"],
-                        "threshold": result["threshold"],
-                        "model": result.get("model", model),
-                        "similarity_metric": result.get("similarity_metric", "cosine"),
-                        "detector_backend": result.get("detector_backend", "opencv"),
-                        "facial_areas": result.get("facial_areas", {}),
-                        "time": result.get("time", 0)
-                    }
-                    
-                    comparisons.append(comparison)
-                    
-                except Exception as e:
-                    logger.error(f"Error comparing {files[i].filename} and {files[j].filename}: {e}")
-                    comparisons.append({
-                        "image1": files[i].filename,
-                        "image2": files[j].filename,
-                        "error": str(e),
-                        "model": model
-                    })
+        for result in await FaceService.compare_images(images, model):
+            filename1 = files[result.pop("index1")].filename
+            filename2 = files[result.pop("index2")].filename
+            
+            if "error" in result:
+                logger.error(f"Error comparing {filename1} and {filename2}: {result['error']}")
+            
+            comparisons.append({"image1": filename1, "image2": filename2, **result})
         
         # Prepare response
         response = {
@@ -113,19 +79,21 @@ async def compare_faces(
             "total_images": len(files),
             "total_comparisons": len(comparisons),
             "comparisons": comparisons,
-            "summary": {
-                "matches": len([c for c in comparisons if c.get("verified", False)]),
-                "no_matches": len([c for c in comparisons if c.get("verified", False) == False and "error" not in c]),
-                "errors": len([c for c in comparisons if "error" in c])
-            }
+            "summary": FaceService.calculate_comparison_summary(comparisons)
         }
+        RequestTimings.attach(response)
+        
+        with MetricsService.time_stage("serialization"):
+            return JSONResponse(content=response)
         
-        return JSONResponse(content=response)
+    except HTTPException:
+        # Deadline, disconnect and upload validation errors keep their status
+        raise
         
     except Exception as e:
         logger.error(f"Unexpected error: {e}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
     
     finally:
-        # Clean up temporary files
-        cleanup_temp_files(temp_files)
\ No newline at end of file
+        # Release images and any fallback temporary files
+        FileService.cleanup_images(images)
\ No newline at end of file
@@ -3,32 +3,183 @@ Face embeddings endpoints for Face Matching API
 Contains face embeddings extraction and comparison logic
 """
 
-from typing import List
+from typing import Any, AsyncIterator, Dict, List, Optional, Union
 import logging
-from fastapi import APIRouter, File, UploadFile, Form, HTTPException
-from fastapi.responses import JSONResponse
+import numpy as np
+from fastapi import APIRouter, Depends, File, UploadFile, Form, Header, HTTPException
 
 from config import (
-    MAX_COMPARISON_FILES, MIN_COMPARISON_FILES, 
-    SUPPORTED_CONTENT_TYPE, AVAILABLE_MODELS
-)
-from utils import (
-    validate_image, save_temp_image, cleanup_temp_files,
-    validate_file_count, validate_content_type, generate_temp_filename
+    MAX_COMPARISON_FILES, MIN_COMPARISON_FILES, AVAILABLE_MODELS
 )
+from utils import validate_file_count
 from schemas import FaceEmbeddingsResponse
 from services.face_service import FaceService
+from services.file_service import FileService
+from services.model_service import ModelService
+from services.admission_service import AdmissionController
+from services.deadline_service import RequestDeadline
+from services.metrics_service import MetricsService
+from services.timing_service import RequestTimings
+from services.streaming_service import NDJSONStream
+from services.embedding_codec import EmbeddingCodec, EmbeddingFormat
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-@router.post("/extract-embeddings", response_model=FaceEmbeddingsResponse)
+def _build_image_result(
+    image_index: int,
+    filename: str,
+    embedding_data: Union[List[Dict[str, Any]], Exception]
+) -> Dict[str, Any]:
+    """Format the embedding extraction outcome of one image"""
+    try:
+        if isinstance(embedding_data, Exception):
+            raise embedding_data
+        
+        # Process embeddings for this image
+        embeddings = []
+        for j, embedding_obj in enumerate(embedding_data):
+            embedding_vector = embedding_obj.get("embedding", [])
+            facial_area = embedding_obj.get("facial_area", {})
+            
+            embedding_result = {
+                "face_index": j,
+                "embedding": embedding_vector,
+                "embedding_dimensions": len(embedding_vector),
+                "region": {
+                    "x": facial_area.get("x", 0),
+                    "y": facial_area.get("y", 0),
+                    "w": facial_area.get("w", 0),
+                    "h": facial_area.get("h", 0)
+                } if facial_area else None
+            }
+            embeddings.append(embedding_result)
+        
+        return {
+            "image_index": image_index,
+            "filename": filename,
+            "faces_detected": len(embedding_data),
+            "embeddings": embeddings
+        }
+    
+    except Exception as e:
+        logger.error(f"Error extracting embeddings from {filename}: {e}")
+        return {
+            "image_index": image_index,
+            "filename": filename,
+            "faces_detected": 0,
+            "embeddings": None,
+            "error": str(e)
+        }
+
+def _compare_embeddings(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Calculate pairwise comparisons between every extracted face"""
+    all_embeddings = [
+        {
+            "image_index": result["image_index"],
+            "face_index": embedding["face_index"],
+            "embedding": embedding["embedding"],
+            "filename": result["filename"]
+        }
+        for result in sorted(results, key=lambda r: r["image_index"])
+        for embedding in result.get("embeddings") or []
+    ]
+    
+    comparisons = []
+    if len(all_embeddings) > 1:
+        try:
+            # Every distance for every face pair in one batched pass
+            with MetricsService.time_stage("distance"):
+                distances = FaceService.calculate_distance_matrices(
+                    [emb["embedding"] for emb in all_embeddings]
+                )
+            rows, cols = np.triu_indices(len(all_embeddings), k=1)
+            cosine_dists = distances["cosine"][rows, cols].tolist()
+            euclidean_dists = distances["euclidean"][rows, cols].tolist()
+            
+            for i, j, cosine_dist, euclidean_dist in zip(rows.tolist(), cols.tolist(), cosine_dists, euclidean_dists):
+                emb1 = all_embeddings[i]
+                emb2 = all_embeddings[j]
+                
+                # Calculate similarity percentage (1 - cosine distance)
+                similarity_percentage = max(0, (1 - cosine_dist) * 100)
+                
+                comparison = {
+                    "image1": emb1["filename"],
+                    "image2": emb2["filename"],
+                    "face1_index": emb1["face_index"],
+                    "face2_index": emb2["face_index"],
+                    "cosine_distance": cosine_dist,
+                    "euclidean_distance": euclidean_dist,
+                    "similarity_percentage": similarity_percentage
+                }
+                
+                comparisons.append(comparison)
+        
+        except Exception as e:
+            logger.error(f"Error calculating embedding comparisons: {e}")
+    
+    return comparisons
+
+async def _stream_results(
+    files: List[UploadFile],
+    images: List[Union[np.ndarray, str]],
+    model: str,
+    fmt: EmbeddingFormat
+) -> AsyncIterator[Dict[str, Any]]:
+    """Embed images concurrently and yield each result as soon as it is ready"""
+    results = []
+    
+    # Concurrent images still share forward passes through the embedding batcher
+    extractions = [FaceService.extract_face_embeddings(image, model, as_arrays=True) for image in images]
+    async for i, embedding_data in NDJSONStream.as_completed(extractions):
+        with RequestTimings.stage("postprocess", i):
+            result = _build_image_result(i, files[i].filename, embedding_data)
+        results.append(result)
+        yield {"type": "result", **EmbeddingCodec.encode_result(result, fmt)}
+    
+    # Comparisons need every embedding, so they arrive with the summary
+    with RequestTimings.stage("postprocess"):
+        comparisons = _compare_embeddings(results)
+    summary = FaceService.calculate_embeddings_summary(results)
+    response = {
+        "type": "summary",
+        "model_used": model,
+        "total_images": len(files),
+        "total_embeddings": summary["total_embeddings"],
+        "comparisons": comparisons if comparisons else None,
+        "summary": summary
+    }
+    if fmt.encoding != "list":
+        response["embedding_format"] = fmt.describe()
+    yield RequestTimings.attach(response)
+
+@router.post(
+    "/extract-embeddings",
+    response_model=FaceEmbeddingsResponse,
+    dependencies=[
+        Depends(RequestTimings.track),
+        Depends(RequestDeadline.track("extract-embeddings")),
+        Depends(AdmissionController.limit("extract-embeddings")),
+        Depends(ModelService.require_inference_stack)
+    ]
+)
 async def extract_embeddings(
     files: List[UploadFile] = File(...),
-    model: str = Form("Facenet")
+    model: str = Form("Facenet"),
+    stream: bool = Form(False),
+    accept: Optional[str] = Header(None)
 ):
     """Extract face embeddings from uploaded images using specified model"""
     
+    # JSON float lists unless the client accepts a packed representation
+    fmt = EmbeddingCodec.negotiate(accept)
+    if stream and fmt.container != "json":
+        raise HTTPException(
+            status_code=406,
+            detail="Streamed embeddings are NDJSON; accept application/json (optionally with encoding=base64)"
+        )
+    
     # Validate number of files
     file_count_error = validate_file_count(
         len(files), MIN_COMPARISON_FILES, MAX_COMPARISON_FILES, "embedding extraction"
@@ -39,121 +190,33 @@ async def extract_embeddings(
     # Validate model
     if model not in AVAILABLE_MODELS:
         raise HTTPException(
-            status_code=400, 
+            status_code=400,
             detail=f"Model {model} not supported. Available models: {AVAILABLE_MODELS}"
         )
     
-    temp_files = []
-    results = []
-    all_embeddings = []
+    images = []
     
     try:
-        # Save uploaded files temporarily
-        for i, file in enumerate(files):
-            if not validate_content_type(file.content_type, SUPPORTED_CONTENT_TYPE):
-                raise HTTPException(
-                    status_code=400, 
-                    detail=f"File {file.filename} is not an image"
-                )
-            
-            content = await file.read()
-            
-            if not validate_image(content):
-                raise HTTPException(
-                    status_code=400, 
-                    detail=f"File {file.filename} is not a valid image"
-                )
-            
-            temp_path = save_temp_image(
-                content, 
-                generate_temp_filename("temp_embedding", i, file.filename)
-            )
-            temp_files.append(temp_path)
+        # Decode uploaded files in memory
+        images = await FileService.process_uploaded_files(files, "temp_embedding")
         
-        # Extract embeddings for each image
-        for i, temp_path in enumerate(temp_files):
-            try:
-                # Use FaceService to extract embeddings
-                embedding_data = FaceService.extract_face_embeddings(temp_path, model)
-                
-                # Process embeddings for this image
-                embeddings = []
-                for j, embedding_obj in enumerate(embedding_data):
-                    embedding_vector = embedding_obj.get("embedding", [])
-                    facial_area = embedding_obj.get("facial_area", {})
-                    
-                    embedding_result = {
-                        "face_index": j,
-                        "embedding": embedding_vector,
-                        "embedding_dimensions": len(embedding_vector),
-                        "region": {
-                            "x": facial_area.get("x", 0),
-                            "y": facial_area.get("y", 0),
-                            "w": facial_area.get("w", 0),
-                            "h": facial_area.get("h", 0)
-                        } if facial_area else None
-                    }
-                    embeddings.append(embedding_result)
-                    all_embeddings.append({
-                        "image_index": i,
-                        "face_index": j,
-                        "embedding": embedding_vector,
-                        "filename": files[i].filename
-                    })
-                
-                image_result = {
-                    "image_index": i,
-                    "filename": files[i].filename,
-                    "faces_detected": len(embedding_data),
-                    "embeddings": embeddings
-                }
-                
-                results.append(image_result)
-                
-            except Exception as e:
-                logger.error(f"Error extracting embeddings from {files[i].filename}: {e}")
-                results.append({
-                    "image_index": i,
-                    "filename": files[i].filename,
-                    "faces_detected": 0,
-                    "embeddings": None,
-                    "error": str(e)
-                })
+        if stream:
+            # One NDJSON line per image as it completes; the stream releases the images
+            response = NDJSONStream.response(_stream_results(files, images, model, fmt), images)
+            images = []
+            return response
+        
+        # Detect faces in every image, then embed all of them in one batched pass
+        outcomes = await FaceService.extract_face_embeddings_batch(images, model, as_arrays=True)
+        
+        results = []
+        for i, embedding_data in enumerate(outcomes):
+            with RequestTimings.stage("postprocess", i):
+                results.append(_build_image_result(i, files[i].filename, embedding_data))
         
         # Calculate pairwise comparisons if multiple embeddings exist
-        comparisons = []
-        if len(all_embeddings) > 1:
-            try:
-                for i in range(len(all_embeddings)):
-                    for j in range(i + 1, len(all_embeddings)):
-                        emb1 = all_embeddings[i]
-                        emb2 = all_embeddings[j]
-                        
-                        # Calculate distances
-                        cosine_dist = FaceService.calculate_embedding_distance(
-                            emb1["embedding"], emb2["embedding"], "cosine"
-                        )
-                        euclidean_dist = FaceService.calculate_embedding_distance(
-                            emb1["embedding"], emb2["embedding"], "euclidean"
-                        )
-                        
-                        # Calculate similarity percentage (1 - cosine distance)
-                        similarity_percentage = max(0, (1 - cosine_dist) * 100)
-                        
-                        comparison = {
-                            "image1": emb1["filename"],
-                            "image2": emb2["filename"],
-                            "face1_index": emb1["face_index"],
-                            "face2_index": emb2["face_index"],
-                            "cosine_distance": cosine_dist,
-                            "euclidean_distance": euclidean_dist,
-                            "similarity_percentage": similarity_percentage
-                        }
-                        
-                        comparisons.append(comparison)
-                        
-            except Exception as e:
-                logger.error(f"Error calculating embedding comparisons: {e}")
+        with RequestTimings.stage("postprocess"):
+            comparisons = _compare_embeddings(results)
         
         # Calculate summary
         summary = FaceService.calculate_embeddings_summary(results)
@@ -167,13 +230,19 @@ async def extract_embeddings(
             "comparisons": comparisons if comparisons else None,
             "summary": summary
         }
+        RequestTimings.attach(response)
         
-        return JSONResponse(content=response)
-        
+        with MetricsService.time_stage("serialization"):
+            return EmbeddingCodec.render(response, fmt)
+    
+    except HTTPException:
+        # Deadline, disconnect and upload validation errors keep their status
+        raise
+    
     except Exception as e:
         logger.error(f"Unexpected error: {e}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
     
     finally:
-        # Clean up temporary files
-        cleanup_temp_files(temp_files)
\ No newline at end of file
+        # Release images and any fallback temporary files
+        FileService.cleanup_images(images)
\ No newline at end of file
@@ -0,0 +1,270 @@
+"""
+Identification endpoints for Face Matching API
+Contains gallery enrollment and 1:N identification logic
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+import time
+import logging
+from fastapi import APIRouter, Depends, File, UploadFile, Form, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+
+from config import (
+    MAX_ENROLLMENT_FILES, MIN_ENROLLMENT_FILES, AVAILABLE_MODELS,
+    DEFAULT_IDENTIFY_TOP_K, MAX_IDENTIFY_TOP_K
+)
+from utils import validate_file_count
+from schemas import (
+    EnrollmentResponse, IdentificationResponse,
+    GalleryResponse, GalleryRemovalResponse
+)
+from services.face_service import FaceService, verification
+from services.file_service import FileService
+from services.model_service import ModelService
+from services.admission_service import AdmissionController
+from services.deadline_service import RequestDeadline
+from services.metrics_service import MetricsService
+from services.timing_service import RequestTimings
+from services.gallery_service import GalleryService
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+def _validate_model(model: str) -> None:
+    """Raise a 400 error for unsupported models"""
+    if model not in AVAILABLE_MODELS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Model {model} not supported. Available models: {AVAILABLE_MODELS}"
+        )
+
+def _format_region(facial_area: dict) -> Optional[dict]:
+    """Reduce a DeepFace facial area to the FacialArea schema"""
+    if not facial_area:
+        return None
+    return {
+        "x": facial_area.get("x", 0),
+        "y": facial_area.get("y", 0),
+        "w": facial_area.get("w", 0),
+        "h": facial_area.get("h", 0)
+    }
+
+def _detected_faces(embedding_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Drop the whole-image region DeepFace returns with confidence 0 when no face is found"""
+    return [face for face in embedding_data if face.get("face_confidence", 0) > 0]
+
+def _search_gallery(model: str, embeddings: List[Any], top_k: int) -> Tuple[List[List[Dict[str, Any]]], float]:
+    """Identify embeddings in the gallery, returning the matches and the search time in seconds"""
+    start = time.perf_counter()
+    face_matches = GalleryService.identify(model, embeddings, top_k)
+    return face_matches, time.perf_counter() - start
+
+@router.post(
+    "/gallery/enroll",
+    response_model=EnrollmentResponse,
+    dependencies=[
+        Depends(RequestTimings.track),
+        Depends(RequestDeadline.track("gallery-enroll")),
+        Depends(AdmissionController.limit("gallery-enroll")),
+        Depends(ModelService.require_inference_stack)
+    ]
+)
+async def enroll_identity(
+    files: List[UploadFile] = File(...),
+    identity: str = Form(...),
+    model: str = Form("Facenet")
+):
+    """Enroll reference images of an identity into the model's gallery"""
+
+    # Validate number of files
+    file_count_error = validate_file_count(
+        len(files), MIN_ENROLLMENT_FILES, MAX_ENROLLMENT_FILES, "enrollment"
+    )
+    if file_count_error:
+        raise HTTPException(status_code=400, detail=file_count_error)
+
+    identity = identity.strip()
+    if not identity:
+        raise HTTPException(status_code=400, detail="Identity must not be empty")
+
+    _validate_model(model)
+
+    images = []
+    results = []
+    embeddings = []
+    filenames = []
+
+    try:
+        # Decode uploaded files in memory
+        images = await FileService.process_uploaded_files(files, "temp_enroll")
+
+        # All reference photos share one batched forward pass
+        outcomes = await FaceService.extract_face_embeddings_batch(images, model)
+
+        for i, embedding_data in enumerate(outcomes):
+            try:
+                if isinstance(embedding_data, Exception):
+                    raise embedding_data
+
+                detected = _detected_faces(embedding_data)
+                if not detected:
+                    raise ValueError("No face detected")
+
+                # Reference photos should show one person; keep the largest face
+                face = max(
+                    detected,
+                    key=lambda f: f.get("facial_area", {}).get("w", 0) * f.get("facial_area", {}).get("h", 0)
+                )
+                embeddings.append(face["embedding"])
+                filenames.append(files[i].filename)
+
+                results.append({
+                    "image_index": i,
+                    "filename": files[i].filename,
+                    "faces_detected": len(detected),
+                    "enrolled": True,
+                    "region": _format_region(face.get("facial_area", {}))
+                })
+
+            except Exception as e:
+                logger.error(f"Error enrolling {files[i].filename}: {e}")
+                results.append({
+                    "image_index": i,
+                    "filename": files[i].filename,
+                    "faces_detected": 0,
+                    "enrolled": False,
+                    "error": str(e)
+                })
+
+        identity_embeddings = 0
+        if embeddings:
+            with RequestTimings.stage("postprocess"):
+                identity_embeddings = await run_in_threadpool(
+                    GalleryService.enroll, model, identity, embeddings, filenames
+                )
+
+        response = {
+            "identity": identity,
+            "model_used": model,
+            "total_images": len(files),
+            "enrolled_embeddings": len(embeddings),
+            "identity_embeddings": identity_embeddings,
+            "results": results
+        }
+        RequestTimings.attach(response)
+
+        with MetricsService.time_stage("serialization"):
+            return JSONResponse(content=response)
+
+    except HTTPException:
+        # Deadline, disconnect and upload validation errors keep their status
+        raise
+
+    except Exception as e:
+        logger.error(f"Unexpected error in enroll_identity: {e}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+    finally:
+        # Release images and any fallback temporary files
+        FileService.cleanup_images(images)
+
+@router.post(
+    "/identify",
+    response_model=IdentificationResponse,
+    dependencies=[
+        Depends(RequestTimings.track),
+        Depends(RequestDeadline.track("identify")),
+        Depends(AdmissionController.limit("identify")),
+        Depends(ModelService.require_inference_stack)
+    ]
+)
+async def identify_faces(
+    file: UploadFile = File(...),
+    model: str = Form("Facenet"),
+    top_k: int = Form(DEFAULT_IDENTIFY_TOP_K)
+):
+    """Identify every face in an image against the model's enrolled gallery"""
+
+    _validate_model(model)
+
+    if top_k < 1 or top_k > MAX_IDENTIFY_TOP_K:
+        raise HTTPException(
+            status_code=400,
+            detail=f"top_k must be between 1 and {MAX_IDENTIFY_TOP_K}"
+        )
+
+    images = []
+
+    try:
+        # Decode uploaded file in memory
+        images = await FileService.process_uploaded_files([file], "temp_identify")
+        embedding_data = _detected_faces(
+            await FaceService.extract_face_embeddings(images[0], model)
+        )
+
+        # Score all query faces against the gallery in one matrix product, off the event loop
+        face_matches, search_time = [], 0.0
+        if embedding_data:
+            face_matches, search_time = await run_in_threadpool(
+                _search_gallery, model, [face["embedding"] for face in embedding_data], top_k
+            )
+        search_time_ms = search_time * 1000
+        MetricsService.observe_stage("search", search_time_ms / 1000, model)
+        RequestTimings.record("postprocess", search_time_ms / 1000, 0)
+
+        threshold = verification.find_threshold(model, "cosine")
+        faces = []
+        for face_idx, (face, matches) in enumerate(zip(embedding_data, face_matches)):
+            faces.append({
+                "face_index": face_idx,
+                "region": _format_region(face.get("facial_area", {})),
+                "matches": [
+                    {**match, "verified": match["distance"] <= threshold}
+                    for match in matches
+                ]
+            })
+
+        response = {
+            "model_used": model,
+            "filename": file.filename,
+            "threshold": threshold,
+            "top_k": top_k,
+            "faces": faces,
+            "search_time_ms": round(search_time_ms, 3)
+        }
+        if not faces:
+            response["error"] = "No face detected"
+        RequestTimings.attach(response)
+
+        with MetricsService.time_stage("serialization"):
+            return JSONResponse(content=response)
+
+    except HTTPException:
+        # Deadline, disconnect and upload validation errors keep their status
+        raise
+
+    except Exception as e:
+        logger.error(f"Unexpected error in identify_faces: {e}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+    finally:
+        # Release images and any fallback temporary files
+        FileService.cleanup_images(images)
+
+@router.get("/gallery", response_model=GalleryResponse)
+async def get_galleries():
+    """Get the size of every model gallery"""
+    return {"galleries": await run_in_threadpool(GalleryService.get_stats)}
+
+@router.delete("/gallery/{identity}", response_model=GalleryRemovalResponse)
+async def remove_identity(identity: str, model: Optional[str] = None):
+    """Remove an identity from one model gallery, or from all galleries"""
+    if model is not None:
+        _validate_model(model)
+
+    removed = await run_in_threadpool(GalleryService.remove_identity, identity, model)
+    if removed == 0:
+        raise HTTPException(status_code=404, detail=f"Identity {identity} is not enrolled")
+
+    return {"identity": identity, "removed_embeddings": removed}
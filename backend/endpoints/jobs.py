@@ -0,0 +1,108 @@
+"""
+Bulk job endpoints for Face Matching API
+Contains job submission, progress, partial results and output download logic
+"""
+
+from typing import Optional
+import logging
+from fastapi import APIRouter, File, UploadFile, Form, HTTPException, Query
+from fastapi.responses import FileResponse, JSONResponse
+
+from config import (
+    AVAILABLE_MODELS, VALID_ACTIONS, JOB_TASKS,
+    DEFAULT_JOB_RESULTS_LIMIT, MAX_JOB_RESULTS_LIMIT
+)
+from schemas import JobStatus, JobListResponse, JobResultsResponse, BasicResponse
+from services.job_service import JobService
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+def _parse_list(value: str, choices: list, name: str) -> list:
+    """Parse a comma-separated form field restricted to known choices"""
+    values = list(dict.fromkeys(item.strip() for item in value.split(',') if item.strip()))
+    for item in values:
+        if item not in choices:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid {name}: {item}. Valid values: {choices}"
+            )
+    if not values:
+        raise HTTPException(status_code=400, detail=f"At least one {name} is required")
+    return values
+
+@router.post("/jobs", response_model=JobStatus, status_code=202)
+async def create_job(
+    archive: Optional[UploadFile] = File(None),
+    directory: Optional[str] = Form(None),
+    manifest: Optional[UploadFile] = File(None),
+    tasks: str = Form("embeddings"),
+    model: str = Form("Facenet"),
+    actions: str = Form("age,gender,emotion,race")
+):
+    """Queue a bulk job over a ZIP archive or a server directory (optionally limited by a manifest)"""
+
+    if (archive is None) == (directory is None):
+        raise HTTPException(status_code=400, detail="Provide either an archive or a directory")
+    if manifest is not None and directory is None:
+        raise HTTPException(status_code=400, detail="A manifest lists paths within a directory")
+
+    task_list = _parse_list(tasks, JOB_TASKS, "task")
+    action_list = _parse_list(actions, VALID_ACTIONS, "action") if "attributes" in task_list else []
+
+    if model not in AVAILABLE_MODELS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Model {model} not supported. Available models: {AVAILABLE_MODELS}"
+        )
+
+    manifest_lines = None
+    if manifest is not None:
+        try:
+            manifest_lines = (await manifest.read()).decode("utf-8").splitlines()
+        except UnicodeDecodeError:
+            raise HTTPException(status_code=400, detail="Manifest must be UTF-8 text, one path per line")
+
+    try:
+        job = await JobService.create_job(
+            task_list, model, action_list,
+            archive=archive, directory=directory, manifest=manifest_lines
+        )
+        return JSONResponse(content=job, status_code=202)
+
+    except HTTPException:
+        raise
+
+    except Exception as e:
+        logger.error(f"Unexpected error in create_job: {e}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@router.get("/jobs", response_model=JobListResponse)
+async def list_jobs():
+    """List bulk jobs with their progress"""
+    return {"jobs": JobService.list_jobs()}
+
+@router.get("/jobs/{job_id}", response_model=JobStatus)
+async def get_job(job_id: str):
+    """Get the status and progress of a bulk job"""
+    return JobService.get_job(job_id)
+
+@router.get("/jobs/{job_id}/results", response_model=JobResultsResponse)
+async def get_job_results(
+    job_id: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(DEFAULT_JOB_RESULTS_LIMIT, ge=1, le=MAX_JOB_RESULTS_LIMIT)
+):
+    """Get per-image results of the finished chunks of a job, while it runs or after"""
+    return JobService.get_results(job_id, offset, limit)
+
+@router.get("/jobs/{job_id}/outputs/{filename}")
+async def download_job_output(job_id: str, filename: str):
+    """Download a finished chunk output: NNNNN.jsonl records or NNNNN.npz embeddings"""
+    return FileResponse(JobService.get_output_path(job_id, filename), filename=filename)
+
+@router.delete("/jobs/{job_id}", response_model=BasicResponse)
+async def delete_job(job_id: str):
+    """Cancel a bulk job and remove its files"""
+    await JobService.delete_job(job_id)
+    return {"message": f"Job {job_id} deleted"}
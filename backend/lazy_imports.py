@@ -0,0 +1,217 @@
+"""
+Lazy imports module for Face Matching API
+Deferred imports of the inference stack and per-module import cost profiling
+"""
+
+import sys
+import time
+import logging
+import importlib
+import threading
+import importlib.abc
+import importlib.machinery
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Loaders created per module, whose exec_module can be timed without affecting other modules
+_TIMED_LOADERS = (
+    importlib.machinery.SourceFileLoader,
+    importlib.machinery.SourcelessFileLoader,
+    importlib.machinery.ExtensionFileLoader
+)
+
+class LazyModule:
+    """
+    Stand-in for a module that is only imported on first attribute access
+
+    Module-level "from deepface import DeepFace" would pull in TensorFlow as
+    soon as the API is imported; `DeepFace = LazyModule("deepface.DeepFace")`
+    keeps call sites unchanged and defers that cost to the first use, or to
+    LazyModule.load_all on a background thread.
+    """
+
+    _instances: List["LazyModule"] = []
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+        LazyModule._instances.append(self)
+
+    @property
+    def loaded(self) -> bool:
+        """Whether the module has been imported through this stand-in"""
+        return self._module is not None
+
+    def load(self) -> Any:
+        """Import the module (once) and return it"""
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attribute: str) -> Any:
+        return getattr(self.load(), attribute)
+
+    def __repr__(self) -> str:
+        return f"<lazy module {self._name!r}{'' if self.loaded else ' (not imported)'}>"
+
+    @classmethod
+    def load_all(cls) -> None:
+        """Import every module that has a lazy stand-in"""
+        for module in list(cls._instances):
+            module.load()
+
+class _TimingFinder(importlib.abc.MetaPathFinder):
+    """Meta path finder that wraps the loaders found by the other finders with a timer"""
+
+    def find_spec(self, fullname, path, target=None):
+        if not ImportProfiler._active:
+            return None
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+
+        loader = spec.loader
+        if isinstance(loader, _TIMED_LOADERS):
+            loader.exec_module = ImportProfiler._timed(fullname, loader.exec_module)
+        return spec
+
+class ImportProfiler:
+    """
+    Import cost of each startup phase, broken down by module and package
+
+    While a phase is being profiled, every module executed from a source,
+    bytecode or extension file is timed. A module's self time excludes the
+    modules it imports, so the times add up to the phase total; a package's
+    time is the sum over its modules. Imports running on other threads at
+    the same time are counted too.
+    """
+
+    _lock = threading.Lock()
+    _finder = _TimingFinder()
+    _active = 0
+    _local = threading.local()
+    _phases: Dict[str, Dict[str, Any]] = {}
+    # module -> [self seconds, cumulative seconds, phase]
+    _modules: Dict[str, List[Any]] = {}
+
+    @classmethod
+    def _timed(cls, fullname: str, exec_module):
+        def exec_timed(module) -> None:
+            phase = cls._current_phase()
+            if phase is None:
+                exec_module(module)
+                return
+            stack = cls._local.__dict__.setdefault("stack", [])
+            start = time.perf_counter()
+            stack.append(0.0)
+            try:
+                exec_module(module)
+            finally:
+                elapsed = time.perf_counter() - start
+                children = stack.pop()
+                if stack:
+                    stack[-1] += elapsed
+                with cls._lock:
+                    cls._modules[fullname] = [elapsed - children, elapsed, phase]
+        return exec_timed
+
+    @classmethod
+    def _current_phase(cls) -> Optional[str]:
+        with cls._lock:
+            running = [name for name, phase in cls._phases.items() if phase["finished_at"] is None]
+        return running[-1] if running else None
+
+    @classmethod
+    def start(cls, phase: str) -> None:
+        """Start timing the imports of a phase"""
+        with cls._lock:
+            cls._phases[phase] = {"started_at": time.time(), "finished_at": None, "seconds": None}
+            cls._active += 1
+            if cls._finder not in sys.meta_path:
+                sys.meta_path.insert(0, cls._finder)
+
+    @classmethod
+    def stop(cls, phase: str) -> None:
+        """Stop timing a phase and log where its import time went"""
+        with cls._lock:
+            entry = cls._phases.get(phase)
+            if entry is None or entry["finished_at"] is not None:
+                return
+            entry["finished_at"] = time.time()
+            entry["seconds"] = round(entry["finished_at"] - entry["started_at"], 3)
+            cls._active -= 1
+            if not cls._active and cls._finder in sys.meta_path:
+                sys.meta_path.remove(cls._finder)
+
+        top = ", ".join(f"{item['package']} {item['seconds']:.2f}s" for item in cls.report(phase, 5)["packages"])
+        logger.info(f"Startup phase {phase!r} took {entry['seconds']:.2f}s ({top or 'no new imports'})")
+
+    @classmethod
+    @contextmanager
+    def profile(cls, phase: str) -> Iterator[None]:
+        """Time the imports made inside the block as a phase"""
+        cls.start(phase)
+        try:
+            yield
+        finally:
+            cls.stop(phase)
+
+    @classmethod
+    def report(cls, phase: Optional[str] = None, limit: int = 20, origin: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Report import costs
+
+        Args:
+            phase: Only include this phase (default: every phase)
+            limit: Number of packages and modules listed, most expensive first
+            origin: Epoch time phase start and end times are reported relative to (default: first phase start)
+
+        Returns:
+            Dictionary with phase durations, import time per top-level package
+            and the modules with the highest self time
+        """
+        with cls._lock:
+            phases = {
+                name: dict(entry) for name, entry in cls._phases.items() if phase in (None, name)
+            }
+            modules = {
+                name: values for name, values in cls._modules.items() if phase in (None, values[2])
+            }
+
+        if origin is None:
+            origin = min((entry["started_at"] for entry in phases.values()), default=0.0)
+
+        packages: Dict[str, List[float]] = {}
+        for name, (self_seconds, _, _) in modules.items():
+            totals = packages.setdefault(name.split(".")[0], [0.0, 0])
+            totals[0] += self_seconds
+            totals[1] += 1
+
+        return {
+            "phases": [
+                {
+                    "phase": name,
+                    "started_after_seconds": round(entry["started_at"] - origin, 3),
+                    "finished_after_seconds": round(entry["finished_at"] - origin, 3) if entry["finished_at"] else None,
+                    "seconds": entry["seconds"]
+                }
+                for name, entry in phases.items()
+            ],
+            "modules_imported": len(modules),
+            "import_seconds": round(sum(values[0] for values in modules.values()), 3),
+            "packages": [
+                {"package": name, "seconds": round(seconds, 3), "modules": count}
+                for name, (seconds, count) in sorted(packages.items(), key=lambda item: -item[1][0])[:limit]
+            ],
+            "modules": [
+                {"module": name, "self_seconds": round(values[0], 3), "cumulative_seconds": round(values[1], 3), "phase": values[2]}
+                for name, values in sorted(modules.items(), key=lambda item: -item[1][0])[:limit]
+            ]
+        }
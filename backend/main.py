@@ -4,12 +4,18 @@ Refactored version with improved organization and modularity
 Created by @andi-fajar & Claude.ai
 """
 
+# Imported first so the imports below are timed for the startup report
+from lazy_imports import ImportProfiler
+ImportProfiler.start("app")
+
+from contextlib import asynccontextmanager
+
 import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from config import (
-    APP_TITLE, APP_VERSION, SERVER_HOST, SERVER_PORT,
+    APP_TITLE, APP_VERSION, SERVER_HOST, SERVER_PORT, SERVER_WORKERS, STARTUP_IMPORTS,
     CORS_ORIGINS, CORS_CREDENTIALS, CORS_METHODS, CORS_HEADERS,
     setup_logging
 )
@@ -18,14 +24,40 @@ from endpoints import (
     face_comparison_router,
     face_analysis_router,
     anti_spoofing_router,
-    face_embeddings_router
+    face_embeddings_router,
+    identification_router,
+    jobs_router,
+    admin_router
 )
+from services.model_service import ModelService
+from services.gallery_service import GalleryService
+from services.inference_executor import InferenceExecutor
+from services.job_service import JobService
+from services.metrics_service import MetricsMiddleware
+from services.admission_service import AdmissionMiddleware
+from services.prefork_server import PreforkServer, WorkerStatsMiddleware
 
 # Set up logging
 logger = setup_logging()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Load persisted galleries, preload models and resume unfinished bulk jobs"""
+    GalleryService.load_store()
+    if STARTUP_IMPORTS == "eager":
+        ModelService.import_inference_stack()
+    ModelService.start_preloading()
+    # Every worker start takes over the jobs of workers that are gone
+    JobService.resume()
+    yield
+    JobService.shutdown()
+    InferenceExecutor.shutdown()
+
 # Create FastAPI application
-app = FastAPI(title=APP_TITLE, version=APP_VERSION)
+app = FastAPI(title=APP_TITLE, version=APP_VERSION, lifespan=lifespan)
+
+# Admit inference requests before their uploads are read (innermost, so 503s get CORS headers)
+app.add_middleware(AdmissionMiddleware)
 
 # Add CORS middleware
 app.add_middleware(
@@ -36,13 +68,27 @@ app.add_middleware(
     allow_headers=CORS_HEADERS,
 )
 
+# Time every request for /metrics
+app.add_middleware(MetricsMiddleware)
+
+# Count requests per pre-fork worker
+app.add_middleware(WorkerStatsMiddleware)
+
 # Include routers
 app.include_router(basic_router)
 app.include_router(face_comparison_router)
 app.include_router(face_analysis_router)
 app.include_router(anti_spoofing_router)
 app.include_router(face_embeddings_router)
+app.include_router(identification_router)
+app.include_router(jobs_router)
+app.include_router(admin_router)
+
+ImportProfiler.stop("app")
 
 
 if __name__ == "__main__":
-    uvicorn.run(app, host=SERVER_HOST, port=SERVER_PORT)
\ No newline at end of file
+    if SERVER_WORKERS > 1:
+        PreforkServer.run(app, SERVER_HOST, SERVER_PORT, SERVER_WORKERS)
+    else:
+        uvicorn.run(app, host=SERVER_HOST, port=SERVER_PORT)
\ No newline at end of file
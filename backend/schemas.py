@@ -13,8 +13,22 @@ class FacialArea(BaseModel):
     w: int
     h: int
 
+class ImageTimings(BaseModel):
+    image_index: int
+    decode: Optional[float] = None
+    detect: Optional[float] = None
+    align: Optional[float] = None
+    infer: Optional[float] = None
+    postprocess: Optional[float] = None
+
+class RequestTimingsReport(BaseModel):
+    total_ms: float
+    stages_ms: Dict[str, float]
+    images: List[ImageTimings]
+
 class BaseResponse(BaseModel):
     total_images: int
+    timings: Optional[RequestTimingsReport] = None
 
 # Face Comparison Models
 class FacialAreas(BaseModel):
@@ -82,6 +96,7 @@ class FacialAttributesResponse(BaseResponse):
     actions_performed: List[str]
     total_faces_detected: int
     results: List[AttributesImageResult]
+    attribute_timings_ms: Optional[Dict[str, float]] = None
     summary: AttributesSummary
 
 # Anti-Spoofing Models
@@ -121,9 +136,148 @@ class MemoryInfo(BaseModel):
     usage_percent: float
     process_memory_mb: float
 
+class CacheStats(BaseModel):
+    enabled: bool
+    entries: int
+    size_mb: float
+    max_size_mb: float
+    ttl_seconds: int
+    hits: int
+    misses: int
+    evictions: int
+    expirations: int
+    hit_rate: float
+
+class ModelBatchStats(BaseModel):
+    model: str
+    batches: int
+    faces: int
+    requests: int
+    mean_batch_size: float
+    max_batch_size: int
+    mean_added_latency_ms: float
+    max_added_latency_ms: float
+    throughput_faces_per_s: float
+
+class BatchingStats(BaseModel):
+    max_batch_size: int
+    max_wait_ms: float
+    queued_faces: int
+    models: List[ModelBatchStats]
+
+class ResidentModelInfo(BaseModel):
+    key: str
+    resident: bool
+    size_mb: float
+    in_use: int
+    loads: int
+    evictions: int
+
+class ModelMemoryStats(BaseModel):
+    budget_mb: float
+    resident_mb: float
+    evictions: int
+    models: List[ResidentModelInfo]
+
+class EndpointAdmissionStats(BaseModel):
+    endpoint: str
+    admitted: int
+    queued: int
+    rejected: int
+    timed_out: int
+
+class AdmissionStats(BaseModel):
+    capacity: float
+    in_use: float
+    queue_depth: int
+    queued_weight: float
+    max_queue: int
+    rejected: int
+    endpoints: List[EndpointAdmissionStats]
+
+class DeadlineStats(BaseModel):
+    header: str
+    default_timeouts: Dict[str, float]
+    deadline_exceeded: int
+    disconnected: int
+
+class JobServiceStats(BaseModel):
+    workers: int
+    active_jobs: int
+    jobs: Dict[str, int]
+
+class ProcessMemory(BaseModel):
+    pid: Optional[int] = None
+    rss_mb: Optional[float] = None
+    uss_mb: Optional[float] = None
+    pss_mb: Optional[float] = None
+
+class WorkerInfo(ProcessMemory):
+    index: int
+    alive: bool
+    requests: int
+    active_requests: int
+    restarts: int
+    uptime_seconds: Optional[float] = None
+
+class WorkerPoolStats(BaseModel):
+    worker_index: Optional[int] = None
+    parent: ProcessMemory
+    workers: List[WorkerInfo]
+    total_rss_mb: float
+    total_pss_mb: float
+
 class HealthResponse(BaseModel):
     status: str
     memory: Optional[MemoryInfo] = None
+    cache: Optional[CacheStats] = None
+    batching: Optional[BatchingStats] = None
+    model_memory: Optional[ModelMemoryStats] = None
+    admission: Optional[AdmissionStats] = None
+    deadlines: Optional[DeadlineStats] = None
+    jobs: Optional[JobServiceStats] = None
+    workers: Optional[WorkerPoolStats] = None
+
+# Startup report Models
+class StartupPhase(BaseModel):
+    phase: str
+    started_after_seconds: float
+    finished_after_seconds: Optional[float] = None
+    seconds: Optional[float] = None
+
+class PackageImportCost(BaseModel):
+    package: str
+    seconds: float
+    modules: int
+
+class ModuleImportCost(BaseModel):
+    module: str
+    self_seconds: float
+    cumulative_seconds: float
+    phase: str
+
+class StartupResponse(BaseModel):
+    process_started_at: float
+    imports: str
+    phases: List[StartupPhase]
+    modules_imported: int
+    import_seconds: float
+    packages: List[PackageImportCost]
+    modules: List[ModuleImportCost]
+
+# Readiness Models
+class ModelWarmupInfo(BaseModel):
+    name: str
+    task: str
+    status: str
+    warmup_time: float
+    error: Optional[str] = None
+
+class ReadyResponse(BaseModel):
+    ready: bool
+    state: str
+    imports: str
+    models: List[ModelWarmupInfo]
 
 # Models List Response
 class ModelsResponse(BaseModel):
@@ -132,7 +286,8 @@ class ModelsResponse(BaseModel):
 # Face Embeddings Models
 class EmbeddingResult(BaseModel):
     face_index: int
-    embedding: List[float]
+    # Float list, or base64 of little-endian values when another encoding was negotiated
+    embedding: Union[List[float], str]
     embedding_dimensions: int
     region: Optional[FacialArea] = None
 
@@ -160,12 +315,118 @@ class EmbeddingsSummary(BaseModel):
     failed_extractions: int
     extraction_rate: str
 
+class EmbeddingFormatInfo(BaseModel):
+    encoding: str
+    dtype: str
+    byte_order: str
+
 class FaceEmbeddingsResponse(BaseResponse):
     model_used: str
     total_embeddings: int
     results: List[EmbeddingImageResult]
     comparisons: Optional[List[EmbeddingComparison]] = None
     summary: EmbeddingsSummary
+    embedding_format: Optional[EmbeddingFormatInfo] = None
+
+# Gallery and Identification Models
+class EnrollmentImageResult(BaseModel):
+    image_index: int
+    filename: str
+    faces_detected: int
+    enrolled: bool
+    region: Optional[FacialArea] = None
+    error: Optional[str] = None
+
+class EnrollmentResponse(BaseResponse):
+    identity: str
+    model_used: str
+    enrolled_embeddings: int
+    identity_embeddings: int
+    results: List[EnrollmentImageResult]
+
+class IdentificationMatch(BaseModel):
+    identity: str
+    distance: float
+    similarity: float
+    verified: bool
+    filename: str
+
+class IdentifiedFace(BaseModel):
+    face_index: int
+    region: Optional[FacialArea] = None
+    matches: List[IdentificationMatch]
+
+class IdentificationResponse(BaseModel):
+    model_used: str
+    filename: str
+    threshold: float
+    top_k: int
+    faces: List[IdentifiedFace]
+    search_time_ms: float
+    error: Optional[str] = None
+    timings: Optional[RequestTimingsReport] = None
+
+class GalleryIndexStats(BaseModel):
+    type: str
+    size: int
+    trained: Optional[bool] = None
+    nlist: Optional[int] = None
+    nprobe: Optional[int] = None
+    ef_search: Optional[int] = None
+    mapped: Optional[int] = None
+
+class EmbeddingStoreStats(BaseModel):
+    model: str
+    rows: int
+    dtype: str
+    size_mb: float
+
+class GalleryStats(BaseModel):
+    model: str
+    identities: int
+    embeddings: int
+    embedding_dimensions: int
+    index: Optional[GalleryIndexStats] = None
+    store: Optional[EmbeddingStoreStats] = None
+
+class GalleryResponse(BaseModel):
+    galleries: List[GalleryStats]
+
+class GalleryRemovalResponse(BaseModel):
+    identity: str
+    removed_embeddings: int
+
+# Bulk Job Models
+class JobStatus(BaseModel):
+    id: str
+    status: str
+    error: Optional[str] = None
+    source: str
+    tasks: List[str]
+    model: str
+    actions: List[str]
+    total_images: int
+    processed_images: int
+    failed_images: int
+    faces: int
+    chunks: int
+    completed_chunks: int
+    progress: float
+    images_per_second: Optional[float] = None
+    eta_seconds: Optional[float] = None
+    created_at: float
+    finished_at: Optional[float] = None
+
+class JobListResponse(BaseModel):
+    jobs: List[JobStatus]
+
+class JobResultsResponse(BaseModel):
+    id: str
+    status: str
+    offset: int
+    limit: int
+    complete: bool
+    results: List[Dict[str, Any]]
 
 # Basic Response Models
 class BasicResponse(BaseModel):
@@ -5,8 +5,12 @@ Contains business logic and service layer implementations
 
 from .face_service import FaceService
 from .file_service import FileService
+from .model_service import ModelService
+from .gallery_service import GalleryService
 
 __all__ = [
     "FaceService",
-    "FileService"
+    "FileService",
+    "ModelService",
+    "GalleryService"
 ]
\ No newline at end of file
@@ -0,0 +1,271 @@
+"""
+Admission control service for Face Matching API
+Weighted concurrency limiting with a bounded wait queue and fast load shedding
+"""
+
+import math
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+from fastapi import HTTPException, Request
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from starlette.routing import Match
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from config import (
+    ADMISSION_CAPACITY, ADMISSION_MAX_QUEUE, ADMISSION_QUEUE_TIMEOUT_SECONDS,
+    ADMISSION_ENDPOINT_WEIGHTS, ADMISSION_BYTES_PER_IMAGE, ADMISSION_ENDPOINT_MAX_IMAGES
+)
+from services.deadline_service import RequestDeadline
+
+logger = logging.getLogger(__name__)
+
+class _Waiter:
+    """A request queued for capacity"""
+
+    def __init__(self, weight: float, future: asyncio.Future):
+        self.weight = weight
+        self.future = future
+
+class AdmissionController:
+    """
+    Limits the total cost of inference requests running at once
+
+    Each request costs its endpoint weight times its estimated number of images.
+    Requests that do not fit wait in a FIFO queue of at most ADMISSION_MAX_QUEUE
+    entries for up to ADMISSION_QUEUE_TIMEOUT_SECONDS; anything beyond that is
+    rejected immediately with 503 and a Retry-After estimate. State is only
+    touched from the event loop thread.
+    """
+
+    _in_use = 0.0
+    _waiters: Deque[_Waiter] = deque()
+    # Exponential moving average of seconds a request holds one unit of capacity
+    _seconds_per_unit = 1.0
+    _stats: Dict[str, Dict[str, int]] = {}
+
+    @classmethod
+    def _endpoint_stats(cls, endpoint: str) -> Dict[str, int]:
+        stats = cls._stats.get(endpoint)
+        if stats is None:
+            stats = {"admitted": 0, "queued": 0, "rejected": 0, "timed_out": 0}
+            cls._stats[endpoint] = stats
+        return stats
+
+    @classmethod
+    def _retry_after(cls) -> int:
+        """Estimate seconds until the queued work drains"""
+        queued = cls._in_use + sum(waiter.weight for waiter in cls._waiters)
+        return max(1, math.ceil(queued * cls._seconds_per_unit / ADMISSION_CAPACITY))
+
+    @classmethod
+    def _reject(cls, endpoint: str, reason: str) -> HTTPException:
+        retry_after = cls._retry_after()
+        logger.warning(f"Rejected {endpoint} request: {reason} (retry after {retry_after}s)")
+        return HTTPException(
+            status_code=503,
+            detail=f"Server is busy: {reason}. Please retry later.",
+            headers={"Retry-After": str(retry_after)}
+        )
+
+    @classmethod
+    def _wake_waiters(cls) -> None:
+        """Admit queued requests in FIFO order while they fit"""
+        while cls._waiters:
+            waiter = cls._waiters[0]
+            if waiter.future.done():
+                cls._waiters.popleft()
+                continue
+            if cls._in_use + waiter.weight > ADMISSION_CAPACITY and cls._in_use > 0:
+                break
+            cls._waiters.popleft()
+            cls._in_use += waiter.weight
+            waiter.future.set_result(None)
+
+    @classmethod
+    async def acquire(cls, endpoint: str, weight: float) -> None:
+        """
+        Wait for capacity or raise a 503 when the queue is full or the wait times out
+
+        Args:
+            endpoint: Endpoint name used in statistics
+            weight: Cost of the request in capacity units
+        """
+        stats = cls._endpoint_stats(endpoint)
+        # A request larger than the whole capacity still runs, alone
+        weight = min(weight, ADMISSION_CAPACITY)
+
+        if not cls._waiters and cls._in_use + weight <= ADMISSION_CAPACITY:
+            cls._in_use += weight
+            stats["admitted"] += 1
+            return
+
+        if len(cls._waiters) >= ADMISSION_MAX_QUEUE:
+            stats["rejected"] += 1
+            raise cls._reject(endpoint, "request queue is full")
+
+        # Never queue past the request's own deadline
+        timeout = ADMISSION_QUEUE_TIMEOUT_SECONDS
+        deadline = RequestDeadline.current()
+        if deadline is not None:
+            timeout = max(0.0, min(timeout, deadline.remaining()))
+
+        waiter = _Waiter(weight, asyncio.get_running_loop().create_future())
+        cls._waiters.append(waiter)
+        stats["queued"] += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout)
+        except asyncio.TimeoutError:
+            if not waiter.future.done():
+                waiter.future.cancel()
+                stats["timed_out"] += 1
+                RequestDeadline.expire_check("admission")
+                raise cls._reject(endpoint, "timed out waiting for capacity")
+        except asyncio.CancelledError:
+            # Client went away while queued; hand back capacity granted in the meantime
+            if waiter.future.done() and not waiter.future.cancelled():
+                cls.release(weight)
+            else:
+                waiter.future.cancel()
+            raise
+        stats["admitted"] += 1
+
+    @classmethod
+    def release(cls, weight: float, held_seconds: float = None) -> None:
+        """
+        Return capacity and admit waiting requests
+
+        Args:
+            weight: Weight passed to acquire
+            held_seconds: How long the capacity was held, used for Retry-After estimates
+        """
+        weight = min(weight, ADMISSION_CAPACITY)
+        cls._in_use = max(0.0, cls._in_use - weight)
+        if held_seconds is not None and weight > 0:
+            cls._seconds_per_unit = 0.9 * cls._seconds_per_unit + 0.1 * held_seconds / weight
+        cls._wake_waiters()
+
+    @classmethod
+    def limit(cls, endpoint: str) -> Callable[[], Awaitable[None]]:
+        """
+        Build a FastAPI dependency declaring a route as admission controlled
+
+        The dependency itself does nothing: AdmissionMiddleware finds it on the
+        matched route and holds capacity for the whole request, starting before
+        the request body is received.
+
+        Args:
+            endpoint: Endpoint name (key of ADMISSION_ENDPOINT_WEIGHTS)
+
+        Returns:
+            Dependency function to use with Depends
+        """
+        async def dependency() -> None:
+            return None
+
+        dependency.admission_endpoint = endpoint
+        return dependency
+
+    @staticmethod
+    def estimate_weight(endpoint: str, content_length: Optional[str]) -> float:
+        """
+        Estimate the cost of a request from its headers, before its body is read
+
+        Args:
+            endpoint: Endpoint name
+            content_length: Content-Length header (None for chunked uploads)
+
+        Returns:
+            ADMISSION_ENDPOINT_WEIGHTS[endpoint] times the estimated image count:
+            the body size over ADMISSION_BYTES_PER_IMAGE, between one image and
+            the endpoint's file limit (the limit when the size is unknown)
+        """
+        max_images = ADMISSION_ENDPOINT_MAX_IMAGES.get(endpoint, 1)
+        try:
+            images = math.ceil(int(content_length) / ADMISSION_BYTES_PER_IMAGE)
+        except (TypeError, ValueError):
+            images = max_images
+        return ADMISSION_ENDPOINT_WEIGHTS.get(endpoint, 1.0) * min(max(images, 1), max_images)
+
+    @classmethod
+    def get_stats(cls) -> Dict[str, Any]:
+        """
+        Report capacity usage, queue depth and per-endpoint admission counts
+
+        Returns:
+            Dictionary with admission control statistics
+        """
+        waiters = [waiter for waiter in cls._waiters if not waiter.future.done()]
+        endpoints: List[Dict[str, Any]] = [
+            {"endpoint": endpoint, **stats} for endpoint, stats in cls._stats.items()
+        ]
+        return {
+            "capacity": ADMISSION_CAPACITY,
+            "in_use": round(cls._in_use, 2),
+            "queue_depth": len(waiters),
+            "queued_weight": round(sum(waiter.weight for waiter in waiters), 2),
+            "max_queue": ADMISSION_MAX_QUEUE,
+            "rejected": sum(stats["rejected"] + stats["timed_out"] for stats in cls._stats.values()),
+            "endpoints": endpoints
+        }
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware admitting requests to routes declared with AdmissionController.limit
+
+    FastAPI receives and parses a multipart body before it runs any dependency,
+    so admission happens here instead: a request that is queued waits before
+    its upload is read, and one that is rejected gets its 503 without the
+    server receiving or parsing the upload. The request deadline starts here
+    too, so queueing counts against it.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    @staticmethod
+    def _endpoint(scope: Scope) -> Optional[str]:
+        """Admission endpoint name of the route the request matches, if any"""
+        for route in scope["app"].routes:
+            if not isinstance(route, APIRoute):
+                continue
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                for dependency in route.dependant.dependencies:
+                    endpoint = getattr(dependency.call, "admission_endpoint", None)
+                    if endpoint is not None:
+                        return endpoint
+                return None
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        endpoint = self._endpoint(scope) if scope["type"] == "http" else None
+        if endpoint is None:
+            await self.app(scope, receive, send)
+            return
+
+        request = Request(scope, receive)
+        weight = AdmissionController.estimate_weight(endpoint, request.headers.get("content-length"))
+        try:
+            deadline = RequestDeadline.for_request(request, endpoint)
+        except HTTPException as e:
+            await JSONResponse({"detail": e.detail}, status_code=e.status_code)(scope, receive, send)
+            return
+
+        with RequestDeadline.activate(deadline):
+            try:
+                await AdmissionController.acquire(endpoint, weight)
+            except HTTPException as e:
+                response = JSONResponse({"detail": e.detail}, status_code=e.status_code, headers=e.headers)
+                await response(scope, receive, send)
+                return
+
+            start = time.perf_counter()
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                AdmissionController.release(weight, time.perf_counter() - start)
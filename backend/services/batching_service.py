@@ -0,0 +1,203 @@
+"""
+Batching service for Face Matching API
+Coalesces aligned face crops from concurrent requests into batched forward passes
+"""
+
+import time
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, List
+
+import numpy as np
+
+from config import EMBEDDING_BATCH_MAX_SIZE, EMBEDDING_BATCH_MAX_WAIT_MS, MODEL_CONCURRENCY
+from lazy_imports import LazyModule
+from services.inference_executor import InferenceExecutor
+from services.metrics_service import MetricsService
+
+logger = logging.getLogger(__name__)
+
+DeepFace = LazyModule("deepface.DeepFace")
+recognition = LazyModule("deepface.models.FacialRecognition")
+
+# Keras models whose forward L2-normalizes the output of the model call
+_L2_NORMALIZED_MODELS = {"VGG-Face"}
+
+@dataclass
+class _PendingCrops:
+    """Face crops of one caller waiting for a batch"""
+    crops: np.ndarray
+    future: asyncio.Future
+    enqueued_at: float = field(default_factory=time.perf_counter)
+
+def forward_batch(model_name: str, crops: np.ndarray) -> np.ndarray:
+    """
+    Run one forward pass of a recognition model over stacked face crops
+
+    Args:
+        model_name: Name of the face recognition model
+        crops: Preprocessed crops of shape (faces, height, width, channels)
+
+    Returns:
+        Float32 embedding matrix with one row per crop
+    """
+    model = DeepFace.build_model(model_name=model_name, task="facial_recognition")
+    forward = type(model).forward
+    if forward is recognition.FacialRecognition.forward or model_name in _L2_NORMALIZED_MODELS:
+        # Keras models: the same call FacialRecognition.forward makes, on the whole batch
+        embeddings = np.asarray(model.model(crops, training=False).numpy(), dtype=np.float32)
+        if model_name in _L2_NORMALIZED_MODELS:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings /= np.where(norms == 0, 1, norms)
+        return embeddings
+    # Models with a custom single-image forward (Dlib, SFace)
+    return np.asarray([model.forward(crop[None]) for crop in crops], dtype=np.float32)
+
+class EmbeddingBatcher:
+    """
+    Dynamic micro-batcher in front of face recognition models
+
+    Crops submitted by concurrent requests wait up to EMBEDDING_BATCH_MAX_WAIT_MS
+    (or until EMBEDDING_BATCH_MAX_SIZE crops are queued) and run as one forward
+    pass. While a model already runs MODEL_CONCURRENCY batches, new crops keep
+    accumulating and are flushed as soon as a batch finishes. All queue state is
+    only touched from the event loop thread.
+    """
+
+    _pending: Dict[str, List[_PendingCrops]] = {}
+    _timers: Dict[str, asyncio.TimerHandle] = {}
+    _inflight: Dict[str, int] = {}
+    _stats: Dict[str, Dict[str, float]] = {}
+
+    @classmethod
+    async def embed(cls, model_name: str, crops: np.ndarray) -> np.ndarray:
+        """
+        Embed face crops, batched with crops of concurrent callers
+
+        Args:
+            model_name: Name of the face recognition model
+            crops: Preprocessed crops of shape (faces, height, width, channels)
+
+        Returns:
+            Float32 embedding matrix with one row per crop
+        """
+        if len(crops) == 0:
+            return np.empty((0, 0), dtype=np.float32)
+
+        loop = asyncio.get_running_loop()
+        pending = _PendingCrops(crops, loop.create_future())
+        queue = cls._pending.setdefault(model_name, [])
+        queue.append(pending)
+
+        if sum(len(item.crops) for item in queue) >= EMBEDDING_BATCH_MAX_SIZE:
+            cls._flush(model_name)
+        elif model_name not in cls._timers:
+            cls._timers[model_name] = loop.call_later(
+                EMBEDDING_BATCH_MAX_WAIT_MS / 1000, cls._flush, model_name
+            )
+
+        return await pending.future
+
+    @classmethod
+    def _flush(cls, model_name: str) -> None:
+        """Start a batch from queued crops if the model has a free slot"""
+        timer = cls._timers.pop(model_name, None)
+        if timer is not None:
+            timer.cancel()
+
+        queue = cls._pending.get(model_name)
+        if not queue or cls._inflight.get(model_name, 0) >= MODEL_CONCURRENCY:
+            return
+
+        # Take whole callers up to the batch size (a single oversized caller runs alone)
+        batch, rows = [], 0
+        while queue and (not batch or rows + len(queue[0].crops) <= EMBEDDING_BATCH_MAX_SIZE):
+            item = queue.pop(0)
+            batch.append(item)
+            rows += len(item.crops)
+
+        cls._inflight[model_name] = cls._inflight.get(model_name, 0) + 1
+        asyncio.get_running_loop().create_task(cls._run_batch(model_name, batch))
+
+    @classmethod
+    async def _run_batch(cls, model_name: str, batch: List[_PendingCrops]) -> None:
+        """Run one batched forward pass and hand each caller its rows"""
+        started = time.perf_counter()
+        try:
+            crops = np.concatenate([item.crops for item in batch])
+            embeddings = await InferenceExecutor.run(
+                forward_batch, model_name, crops,
+                model_keys=[f"facial_recognition/{model_name}"]
+            )
+            offset = 0
+            for item in batch:
+                if not item.future.done():
+                    item.future.set_result(embeddings[offset:offset + len(item.crops)])
+                offset += len(item.crops)
+            cls._record(model_name, batch, len(crops), started, time.perf_counter())
+        except Exception as e:
+            logger.error(f"Error in batched {model_name} forward pass: {e}")
+            for item in batch:
+                if not item.future.done():
+                    item.future.set_exception(e)
+        finally:
+            cls._inflight[model_name] -= 1
+            # Crops that queued up during this batch have already waited long enough
+            if cls._pending.get(model_name):
+                cls._flush(model_name)
+
+    @classmethod
+    def _record(cls, model_name: str, batch: List[_PendingCrops], faces: int, started: float, finished: float) -> None:
+        """Update per-model batch metrics"""
+        waits = [started - item.enqueued_at for item in batch]
+        inference_time = finished - started
+        stats = cls._stats.setdefault(model_name, {
+            "batches": 0, "faces": 0, "requests": 0, "max_batch_size": 0,
+            "total_wait": 0.0, "max_wait": 0.0, "total_inference_time": 0.0
+        })
+        stats["batches"] += 1
+        stats["faces"] += faces
+        stats["requests"] += len(batch)
+        stats["max_batch_size"] = max(stats["max_batch_size"], faces)
+        stats["total_wait"] += sum(waits)
+        stats["max_wait"] = max(stats["max_wait"], max(waits))
+        stats["total_inference_time"] += inference_time
+        for wait in waits:
+            MetricsService.observe_stage("batch_wait", wait, model_name)
+
+        logger.debug(
+            f"{model_name} batch: {faces} face(s) from {len(batch)} request(s), "
+            f"added latency up to {1000 * max(waits):.1f}ms, "
+            f"{faces / max(inference_time, 1e-9):.1f} faces/s"
+        )
+
+    @classmethod
+    def get_stats(cls) -> Dict[str, Any]:
+        """
+        Report batching settings and per-model batch metrics
+
+        Returns:
+            Dictionary with settings, queue depth and per-model throughput and added latency
+        """
+        models = []
+        for model_name, stats in list(cls._stats.items()):
+            batches = max(stats["batches"], 1)
+            models.append({
+                "model": model_name,
+                "batches": int(stats["batches"]),
+                "faces": int(stats["faces"]),
+                "requests": int(stats["requests"]),
+                "mean_batch_size": round(stats["faces"] / batches, 2),
+                "max_batch_size": int(stats["max_batch_size"]),
+                "mean_added_latency_ms": round(1000 * stats["total_wait"] / max(stats["requests"], 1), 3),
+                "max_added_latency_ms": round(1000 * stats["max_wait"], 3),
+                "throughput_faces_per_s": round(stats["faces"] / max(stats["total_inference_time"], 1e-9), 2)
+            })
+
+        return {
+            "max_batch_size": EMBEDDING_BATCH_MAX_SIZE,
+            "max_wait_ms": EMBEDDING_BATCH_MAX_WAIT_MS,
+            "queued_faces": sum(len(item.crops) for queue in cls._pending.values() for item in queue),
+            "models": models
+        }
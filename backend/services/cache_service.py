@@ -0,0 +1,230 @@
+"""
+Result cache service for Face Matching API
+Content-addressed LRU cache for detection and embedding results with bounded memory
+"""
+
+import time
+import hashlib
+import logging
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple, Union
+
+import numpy as np
+
+from config import RESULT_CACHE_MAX_MB, RESULT_CACHE_TTL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Rough per-object overhead used when estimating entry sizes
+_OBJECT_OVERHEAD_BYTES = 64
+
+class CacheService:
+    """
+    Service class for caching inference results keyed by image content
+
+    Cached values are shared between requests rather than copied, so
+    neither the code that stores them nor their readers may mutate them.
+    """
+
+    _lock = threading.Lock()
+    _entries: "OrderedDict[Hashable, Tuple[float, int, Any]]" = OrderedDict()
+    _max_bytes = int(RESULT_CACHE_MAX_MB * 1024 * 1024)
+    _ttl = RESULT_CACHE_TTL_SECONDS
+    _total_bytes = 0
+    _hits = 0
+    _misses = 0
+    _evictions = 0
+    _expirations = 0
+    # Digests of the uploaded bytes of live decoded images, by object id
+    _upload_digests: Dict[int, str] = {}
+
+    @classmethod
+    def register_upload(cls, image: np.ndarray, content: bytes) -> None:
+        """
+        Remember the digest of the bytes an image was decoded from
+
+        Cache keys of the image then hash the compressed upload rather than
+        every decoded pixel. The digest is dropped when the image is freed.
+
+        Args:
+            image: Decoded image array
+            content: Uploaded bytes it was decoded from
+        """
+        if not cls.enabled():
+            return
+        image_id = id(image)
+        cls._upload_digests[image_id] = hashlib.sha256(content).hexdigest()
+        weakref.finalize(image, cls._upload_digests.pop, image_id, None)
+
+    @classmethod
+    def upload_digest(cls, image: Union[str, np.ndarray]) -> Optional[str]:
+        """Get the digest of the upload an image was decoded from, if registered"""
+        return cls._upload_digests.get(id(image)) if isinstance(image, np.ndarray) else None
+
+    @classmethod
+    def content_hash(cls, image: Union[str, np.ndarray]) -> str:
+        """
+        Hash image content so identical uploads share cache entries
+
+        Args:
+            image: Decoded image array or path to an image file
+
+        Returns:
+            Hex digest of the uploaded bytes when known, else of the pixels or file
+        """
+        upload_digest = cls.upload_digest(image)
+        if upload_digest is not None:
+            return upload_digest
+        digest = hashlib.sha256()
+        if isinstance(image, np.ndarray):
+            digest.update(str(image.shape).encode())
+            digest.update(memoryview(np.ascontiguousarray(image)).cast("B"))
+        else:
+            with open(image, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(chunk)
+        return digest.hexdigest()
+
+    @classmethod
+    def make_key(cls, image: Union[str, np.ndarray], *parts: str) -> Tuple[str, ...]:
+        """
+        Build a cache key from image content and model settings
+
+        Args:
+            image: Decoded image array or path to an image file
+            *parts: Operation, model and detector identifiers
+
+        Returns:
+            Tuple key combining the content hash with the given parts
+        """
+        return (cls.content_hash(image),) + tuple(parts)
+
+    @staticmethod
+    def _estimate_size(value: Any) -> int:
+        """Estimate the resident size of a cached value in bytes"""
+        if isinstance(value, np.ndarray):
+            return value.nbytes + _OBJECT_OVERHEAD_BYTES
+        if isinstance(value, dict):
+            return _OBJECT_OVERHEAD_BYTES + sum(
+                CacheService._estimate_size(k) + CacheService._estimate_size(v)
+                for k, v in value.items()
+            )
+        if isinstance(value, (list, tuple)):
+            return _OBJECT_OVERHEAD_BYTES + sum(CacheService._estimate_size(v) for v in value)
+        if isinstance(value, str):
+            return _OBJECT_OVERHEAD_BYTES + len(value)
+        return _OBJECT_OVERHEAD_BYTES // 2
+
+    @staticmethod
+    def _freeze(value: Any) -> None:
+        """Make every array in a cached value read-only"""
+        if isinstance(value, np.ndarray):
+            value.flags.writeable = False
+        elif isinstance(value, dict):
+            for item in value.values():
+                CacheService._freeze(item)
+        elif isinstance(value, (list, tuple)):
+            for item in value:
+                CacheService._freeze(item)
+
+    @classmethod
+    def enabled(cls) -> bool:
+        """Check whether caching is enabled"""
+        return cls._max_bytes > 0
+
+    @classmethod
+    def get(cls, key: Hashable) -> Optional[Any]:
+        """
+        Look up a cached value, refreshing its LRU position
+
+        Args:
+            key: Cache key from make_key
+
+        Returns:
+            The cached value, shared with other readers and read-only, or None on a miss
+        """
+        if not cls.enabled():
+            return None
+
+        with cls._lock:
+            entry = cls._entries.get(key)
+            if entry is None:
+                cls._misses += 1
+                return None
+
+            expires_at, size, value = entry
+            if expires_at < time.monotonic():
+                del cls._entries[key]
+                cls._total_bytes -= size
+                cls._expirations += 1
+                cls._misses += 1
+                return None
+
+            cls._entries.move_to_end(key)
+            cls._hits += 1
+
+        return value
+
+    @classmethod
+    def put(cls, key: Hashable, value: Any) -> None:
+        """
+        Store a value, evicting least recently used entries to stay within budget
+
+        Args:
+            key: Cache key from make_key
+            value: Result to cache; it is shared from now on, so it must not be
+                mutated (its arrays are made read-only)
+        """
+        if not cls.enabled():
+            return
+
+        cls._freeze(value)
+        size = cls._estimate_size(value)
+        if size > cls._max_bytes:
+            logger.debug(f"Not caching entry of {size} bytes, larger than the cache budget")
+            return
+
+        with cls._lock:
+            previous = cls._entries.pop(key, None)
+            if previous is not None:
+                cls._total_bytes -= previous[1]
+
+            cls._entries[key] = (time.monotonic() + cls._ttl, size, value)
+            cls._total_bytes += size
+
+            while cls._total_bytes > cls._max_bytes:
+                _, (_, evicted_size, _) = cls._entries.popitem(last=False)
+                cls._total_bytes -= evicted_size
+                cls._evictions += 1
+
+    @classmethod
+    def clear(cls) -> None:
+        """Remove every cached entry"""
+        with cls._lock:
+            cls._entries.clear()
+            cls._total_bytes = 0
+
+    @classmethod
+    def get_stats(cls) -> Dict[str, Any]:
+        """
+        Report cache usage and hit/miss counters
+
+        Returns:
+            Dictionary with cache statistics
+        """
+        with cls._lock:
+            lookups = cls._hits + cls._misses
+            return {
+                "enabled": cls.enabled(),
+                "entries": len(cls._entries),
+                "size_mb": round(cls._total_bytes / (1024 * 1024), 2),
+                "max_size_mb": round(cls._max_bytes / (1024 * 1024), 2),
+                "ttl_seconds": cls._ttl,
+                "hits": cls._hits,
+                "misses": cls._misses,
+                "evictions": cls._evictions,
+                "expirations": cls._expirations,
+                "hit_rate": round(cls._hits / lookups, 4) if lookups else 0.0
+            }
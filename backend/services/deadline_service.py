@@ -0,0 +1,166 @@
+"""
+Deadline service for Face Matching API
+Request deadlines and client disconnect detection between processing steps
+"""
+
+import time
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, Optional
+
+from fastapi import HTTPException, Request
+
+from config import REQUEST_TIMEOUT_HEADER, REQUEST_TIMEOUTS, DEFAULT_REQUEST_TIMEOUT_SECONDS, MAX_REQUEST_TIMEOUT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Status nginx uses for requests the client abandoned; the client never sees it
+CLIENT_CLOSED_REQUEST = 499
+
+class RequestCancelledError(HTTPException):
+    """Raised when a request's deadline passed or its client disconnected"""
+
+class RequestDeadline:
+    """
+    Deadline and connection state of the request being processed
+
+    The deadline comes from the REQUEST_TIMEOUT_HEADER header (seconds, capped at
+    MAX_REQUEST_TIMEOUT_SECONDS) or the endpoint default in REQUEST_TIMEOUTS.
+    Services call RequestDeadline.check() between steps; outside a tracked
+    request it does nothing.
+    """
+
+    _current: ContextVar[Optional["RequestDeadline"]] = ContextVar("request_deadline", default=None)
+    _stats: Dict[str, Dict[str, int]] = {}
+
+    def __init__(self, request: Request, endpoint: str, timeout: float):
+        self.request = request
+        self.endpoint = endpoint
+        self.timeout = timeout
+        self.expires_at = time.monotonic() + timeout
+
+    def remaining(self) -> float:
+        """Seconds left before the deadline"""
+        return self.expires_at - time.monotonic()
+
+    def _cancel(self, status_code: int, reason: str, stage: str) -> RequestCancelledError:
+        stats = self._stats.setdefault(self.endpoint, {"deadline_exceeded": 0, "disconnected": 0})
+        stats["deadline_exceeded" if status_code == 504 else "disconnected"] += 1
+        logger.warning(f"Abandoned {self.endpoint} request before {stage}: {reason}")
+        return RequestCancelledError(status_code=status_code, detail=f"Request abandoned: {reason}")
+
+    @classmethod
+    def current(cls) -> Optional["RequestDeadline"]:
+        """Get the deadline of the request being processed, if any"""
+        return cls._current.get()
+
+    @classmethod
+    def expire_check(cls, stage: str) -> None:
+        """
+        Raise if the current request's deadline has passed (no I/O, safe in tight loops)
+
+        Args:
+            stage: Name of the step about to run, for logs
+        """
+        deadline = cls._current.get()
+        if deadline is not None and deadline.remaining() <= 0:
+            raise deadline._cancel(504, f"deadline of {deadline.timeout:g}s exceeded", stage)
+
+    @classmethod
+    async def check(cls, stage: str) -> None:
+        """
+        Raise if the current request's deadline has passed or its client disconnected
+
+        Args:
+            stage: Name of the step about to run, for logs
+        """
+        cls.expire_check(stage)
+        deadline = cls._current.get()
+        if deadline is not None and await deadline.request.is_disconnected():
+            raise deadline._cancel(CLIENT_CLOSED_REQUEST, "client disconnected", stage)
+
+    @classmethod
+    def for_request(cls, request: Request, endpoint: str) -> "RequestDeadline":
+        """
+        Build the deadline of a request from REQUEST_TIMEOUT_HEADER or the endpoint default
+
+        Args:
+            request: Incoming request
+            endpoint: Endpoint name (key of REQUEST_TIMEOUTS)
+
+        Returns:
+            Deadline starting now
+
+        Raises:
+            HTTPException: 400 for a header that is not a positive number
+        """
+        timeout = REQUEST_TIMEOUTS.get(endpoint, DEFAULT_REQUEST_TIMEOUT_SECONDS)
+        header = request.headers.get(REQUEST_TIMEOUT_HEADER)
+        if header is not None:
+            try:
+                timeout = float(header)
+            except ValueError:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"{REQUEST_TIMEOUT_HEADER} must be a number of seconds"
+                )
+            if timeout <= 0:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"{REQUEST_TIMEOUT_HEADER} must be positive"
+                )
+            timeout = min(timeout, MAX_REQUEST_TIMEOUT_SECONDS)
+        return cls(request, endpoint, timeout)
+
+    @classmethod
+    @contextmanager
+    def activate(cls, deadline: "RequestDeadline") -> Iterator[None]:
+        """Make a deadline the current one for a block (track then reuses it)"""
+        token = cls._current.set(deadline)
+        try:
+            yield
+        finally:
+            cls._current.reset(token)
+
+    @classmethod
+    def track(cls, endpoint: str) -> Callable[[Request], AsyncIterator[None]]:
+        """
+        Build a FastAPI dependency that sets the deadline for the whole request
+
+        Args:
+            endpoint: Endpoint name (key of REQUEST_TIMEOUTS)
+
+        Returns:
+            Dependency function to use with Depends
+        """
+        async def dependency(request: Request) -> AsyncIterator[None]:
+            current = cls._current.get()
+            if current is not None and current.request.scope is request.scope:
+                # Started by admission control when the request arrived
+                current.request = request
+                yield
+                return
+
+            token = cls._current.set(cls.for_request(request, endpoint))
+            try:
+                yield
+            finally:
+                cls._current.reset(token)
+
+        return dependency
+
+    @classmethod
+    def get_stats(cls) -> Dict[str, Any]:
+        """
+        Report default timeouts and abandoned request counts
+
+        Returns:
+            Dictionary with per-endpoint default timeouts and cancellation counts
+        """
+        return {
+            "header": REQUEST_TIMEOUT_HEADER,
+            "default_timeouts": dict(REQUEST_TIMEOUTS),
+            "deadline_exceeded": sum(stats["deadline_exceeded"] for stats in cls._stats.values()),
+            "disconnected": sum(stats["disconnected"] for stats in cls._stats.values())
+        }
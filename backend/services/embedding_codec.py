@@ -0,0 +1,186 @@
+"""
+Embedding codec service for Face Matching API
+Content negotiation and compact encodings (base64, MessagePack, .npy) of embedding responses
+"""
+
+import io
+import base64
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse, Response
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+NPY_MEDIA_TYPE = "application/x-npy"
+EMBEDDING_FACES_HEADER = "X-Embedding-Faces"
+
+# Accepted media types and the container each selects
+_MEDIA_TYPES = {
+    "application/json": "json",
+    "application/x-ndjson": "json",
+    "application/msgpack": "msgpack",
+    "application/x-msgpack": "msgpack",
+    "application/vnd.msgpack": "msgpack",
+    "application/x-npy": "npy",
+    "application/npy": "npy"
+}
+EMBEDDING_DTYPES = ["float32", "float16"]
+
+@dataclass(frozen=True)
+class EmbeddingFormat:
+    """Negotiated representation of embedding vectors in a response"""
+    container: str = "json"  # json, msgpack or npy
+    encoding: str = "list"  # list (JSON floats), base64, binary (MessagePack bin) or npy
+    dtype: str = "float32"
+
+    def describe(self) -> Dict[str, str]:
+        """Self-description added to responses with packed embeddings"""
+        return {"encoding": self.encoding, "dtype": self.dtype, "byte_order": "little"}
+
+class EmbeddingCodec:
+    """
+    Encodes embedding responses in the representation the client accepts
+
+    JSON with embeddings as lists of floats stays the default. The Accept
+    header can ask for base64 blobs inside JSON
+    ("application/json; encoding=base64"), MessagePack with raw bytes
+    ("application/msgpack") or a single .npy matrix ("application/x-npy"),
+    each optionally with "dtype=float16". Packed vectors are little-endian
+    and written straight from the NumPy buffers, without converting floats
+    one by one.
+    """
+
+    @staticmethod
+    def negotiate(accept: Optional[str]) -> EmbeddingFormat:
+        """
+        Pick the embedding format from an Accept header
+
+        Args:
+            accept: Accept header value; media types other than the supported ones are ignored
+
+        Returns:
+            Format of the supported media type with the highest quality (JSON lists if none)
+
+        Raises:
+            HTTPException: 406 for unknown encodings or dtypes, or MessagePack without msgpack installed
+        """
+        candidates = []
+        for position, item in enumerate((accept or "").split(",")):
+            media_type, *parts = [part.strip() for part in item.split(";")]
+            container = _MEDIA_TYPES.get(media_type.lower())
+            if container is None:
+                continue
+            params = {}
+            for part in parts:
+                key, _, value = part.partition("=")
+                params[key.strip().lower()] = value.strip().strip('"').lower()
+            try:
+                quality = float(params.pop("q", 1))
+            except ValueError:
+                quality = 0.0
+            if quality > 0:
+                candidates.append((-quality, position, container, params))
+
+        if not candidates:
+            return EmbeddingFormat()
+        _, _, container, params = min(candidates)
+
+        dtype = params.get("dtype", "float32")
+        if dtype not in EMBEDDING_DTYPES:
+            raise HTTPException(status_code=406, detail=f"Embedding dtype {dtype} not supported. Available: {EMBEDDING_DTYPES}")
+
+        if container == "json":
+            encoding = params.get("encoding", "list")
+            if encoding not in ("list", "base64"):
+                raise HTTPException(status_code=406, detail=f"Embedding encoding {encoding} not supported. Available: ['list', 'base64']")
+        elif container == "msgpack":
+            if msgpack is None:
+                raise HTTPException(status_code=406, detail="MessagePack responses need the msgpack package from requirements.txt - install it or accept JSON")
+            encoding = "binary"
+        else:
+            encoding = "npy"
+        return EmbeddingFormat(container, encoding, dtype)
+
+    @staticmethod
+    def _encode_vector(vector: Any, fmt: EmbeddingFormat) -> Any:
+        if fmt.encoding == "list":
+            return np.asarray(vector, dtype=np.float32).tolist()
+        buffer = np.asarray(vector, dtype=f"<{'f4' if fmt.dtype == 'float32' else 'f2'}").tobytes()
+        return base64.b64encode(buffer).decode("ascii") if fmt.encoding == "base64" else buffer
+
+    @classmethod
+    def encode_result(cls, result: Dict[str, Any], fmt: EmbeddingFormat) -> Dict[str, Any]:
+        """
+        Encode the embeddings of one image result
+
+        Args:
+            result: Image result whose embeddings hold float32 arrays
+            fmt: Negotiated format (list, base64 or binary encoding)
+
+        Returns:
+            Copy of the result with encoded embedding vectors
+        """
+        if not result.get("embeddings"):
+            return result
+        return {
+            **result,
+            "embeddings": [
+                {**embedding, "embedding": cls._encode_vector(embedding["embedding"], fmt)}
+                for embedding in result["embeddings"]
+            ]
+        }
+
+    @classmethod
+    def render(cls, content: Dict[str, Any], fmt: EmbeddingFormat) -> Response:
+        """
+        Build the response of an embedding extraction
+
+        Args:
+            content: Response body whose results hold float32 embedding arrays
+            fmt: Negotiated format
+
+        Returns:
+            JSON or MessagePack response with the full body, or a .npy response
+            holding only the (faces, dimensions) matrix
+        """
+        headers = {"Vary": "Accept"}
+        if fmt.container == "npy":
+            return cls._render_npy(content, fmt, headers)
+
+        body = {**content, "results": [cls.encode_result(result, fmt) for result in content["results"]]}
+        if fmt.encoding != "list":
+            body["embedding_format"] = fmt.describe()
+        if fmt.container == "msgpack":
+            return Response(content=msgpack.packb(body, use_bin_type=True), media_type=MSGPACK_MEDIA_TYPE, headers=headers)
+        return JSONResponse(content=body, headers=headers)
+
+    @staticmethod
+    def _render_npy(content: Dict[str, Any], fmt: EmbeddingFormat, headers: Dict[str, str]) -> Response:
+        """
+        Stack every face embedding into one matrix, in image then face order
+
+        A header gives the number of faces of each image, which maps matrix
+        rows back to faces and stays as short as the image count allows,
+        however many faces the images hold.
+        """
+        vectors: List[Any] = []
+        face_counts: List[str] = []
+        for result in sorted(content["results"], key=lambda r: r["image_index"]):
+            embeddings = result.get("embeddings") or []
+            vectors.extend(embedding["embedding"] for embedding in embeddings)
+            face_counts.append(str(len(embeddings)))
+
+        dtype = np.dtype(f"<{'f4' if fmt.dtype == 'float32' else 'f2'}")
+        matrix = np.asarray(vectors, dtype=dtype) if vectors else np.empty((0, 0), dtype=dtype)
+        buffer = io.BytesIO()
+        np.lib.format.write_array(buffer, matrix, allow_pickle=False)
+
+        headers[EMBEDDING_FACES_HEADER] = ",".join(face_counts)
+        return Response(content=buffer.getvalue(), media_type=NPY_MEDIA_TYPE, headers=headers)
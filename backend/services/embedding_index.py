@@ -0,0 +1,536 @@
+"""
+Embedding index module for Face Matching API
+Pluggable nearest-neighbour indexes over L2-normalized face embeddings
+"""
+
+import math
+import time
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import (
+    ANN_IVF_NLIST, ANN_IVF_NPROBE, ANN_MIN_TRAIN_SIZE,
+    ANN_HNSW_M, ANN_HNSW_EF_CONSTRUCTION, ANN_HNSW_EF_SEARCH
+)
+
+logger = logging.getLogger(__name__)
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+INDEX_TYPES = ["exact", "ivf", "hnsw"]
+
+# k-means settings for the IVF coarse quantizer
+_KMEANS_ITERATIONS = 10
+_KMEANS_SAMPLES_PER_LIST = 64
+# Retrain the IVF quantizer once the index grows this many times past its training size
+_RETRAIN_GROWTH_FACTOR = 4
+# Rows scored (or copied) at a time when reading memory-mapped vectors
+_MAPPED_CHUNK_ROWS = 16384
+
+def _top_k(similarities: np.ndarray, ids: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Select the k most similar entries of each row
+
+    Args:
+        similarities: Query-by-candidate similarity matrix
+        ids: Id of each candidate column
+        k: Number of entries to keep per query
+
+    Returns:
+        Tuple of (ids, similarities) matrices, padded with -1 / -inf when fewer than k candidates exist
+    """
+    queries, total = similarities.shape
+    result_ids = np.full((queries, k), -1, dtype=np.int64)
+    result_sims = np.full((queries, k), -np.inf, dtype=np.float32)
+    count = min(k, total)
+    if count == 0:
+        return result_ids, result_sims
+
+    if count < total:
+        columns = np.argpartition(-similarities, count - 1, axis=1)[:, :count]
+    else:
+        columns = np.tile(np.arange(total), (queries, 1))
+    column_sims = np.take_along_axis(similarities, columns, axis=1)
+    order = np.argsort(-column_sims, axis=1, kind="stable")
+
+    result_ids[:, :count] = ids[np.take_along_axis(columns, order, axis=1)]
+    result_sims[:, :count] = np.take_along_axis(column_sims, order, axis=1)
+    return result_ids, result_sims
+
+class _VectorBlock:
+    """Growable float32 row storage with stable ids and snapshot-safe reads"""
+
+    def __init__(self, dimensions: int):
+        self.vectors = np.empty((0, dimensions), dtype=np.float32)
+        self.ids = np.empty(0, dtype=np.int64)
+        self.size = 0
+
+    def append(self, ids: np.ndarray, vectors: np.ndarray) -> None:
+        """Append rows, growing capacity geometrically"""
+        needed = self.size + len(ids)
+        if needed > self.ids.shape[0]:
+            capacity = max(needed, 2 * self.ids.shape[0], 64)
+            grown_vectors = np.empty((capacity, self.vectors.shape[1]), dtype=np.float32)
+            grown_ids = np.empty(capacity, dtype=np.int64)
+            grown_vectors[:self.size] = self.vectors[:self.size]
+            grown_ids[:self.size] = self.ids[:self.size]
+            self.vectors, self.ids = grown_vectors, grown_ids
+
+        # Rows past the current size are invisible to earlier snapshots
+        self.vectors[self.size:needed] = vectors
+        self.ids[self.size:needed] = ids
+        self.size = needed
+
+    def remove(self, ids: np.ndarray) -> int:
+        """Remove rows by id, compacting into fresh arrays"""
+        keep = ~np.isin(self.ids[:self.size], ids)
+        removed = self.size - int(np.count_nonzero(keep))
+        if removed:
+            self.vectors = self.vectors[:self.size][keep]
+            self.ids = self.ids[:self.size][keep]
+            self.size = self.ids.shape[0]
+        return removed
+
+    def snapshot(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Get views of the current rows"""
+        return self.vectors[:self.size], self.ids[:self.size]
+
+class EmbeddingIndex:
+    """Base class for indexes over L2-normalized embeddings scored by inner product"""
+
+    index_type = "base"
+
+    def __init__(self, dimensions: int):
+        self.dimensions = dimensions
+        self._lock = threading.Lock()
+
+    def add(self, ids: np.ndarray, vectors: np.ndarray) -> None:
+        """
+        Insert vectors under the given ids
+
+        Args:
+            ids: Unique int64 id of each vector
+            vectors: L2-normalized float32 vectors, one per row
+        """
+        raise NotImplementedError
+
+    def add_mapped(self, ids: np.ndarray, vectors: np.ndarray, live: np.ndarray) -> None:
+        """
+        Insert read-only vectors loaded from the embedding store
+
+        The default copies live rows into the index in chunks; indexes that can
+        score the mapping in place override this to avoid the copy.
+
+        Args:
+            ids: Unique int64 id of each row
+            vectors: Memory-mapped L2-normalized vectors (float32 or float16)
+            live: Boolean mask of rows that were not removed
+        """
+        for start in range(0, len(ids), _MAPPED_CHUNK_ROWS):
+            end = start + _MAPPED_CHUNK_ROWS
+            keep = live[start:end]
+            if keep.any():
+                self.add(ids[start:end][keep], np.asarray(vectors[start:end], dtype=np.float32)[keep])
+
+    def remove(self, ids: np.ndarray) -> int:
+        """
+        Delete vectors by id
+
+        Args:
+            ids: Ids to delete
+
+        Returns:
+            Number of vectors removed
+        """
+        raise NotImplementedError
+
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the k most similar vectors for each query
+
+        Args:
+            queries: L2-normalized float32 queries, one per row
+            k: Number of neighbours per query
+
+        Returns:
+            Tuple of (ids, similarities) matrices of shape (queries, k), padded with -1 / -inf
+        """
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def wait_until_trained(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait for background training of the index structure, if any
+
+        Args:
+            timeout: Seconds to wait at most (default: no limit)
+
+        Returns:
+            True once no training is running
+        """
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Report index type and size"""
+        return {"type": self.index_type, "size": len(self)}
+
+class ExactIndex(EmbeddingIndex):
+    """
+    Brute-force index: one matrix product over every vector
+
+    Vectors loaded from the embedding store stay in their read-only memory map
+    (shared with other processes through the page cache) and are scored in place.
+    """
+
+    index_type = "exact"
+
+    def __init__(self, dimensions: int):
+        super().__init__(dimensions)
+        self._block = _VectorBlock(dimensions)
+        self._mapped: Optional[np.ndarray] = None
+        self._mapped_ids = np.empty(0, dtype=np.int64)
+        self._mapped_live = np.empty(0, dtype=bool)
+        self._mapped_size = 0
+
+    def add(self, ids: np.ndarray, vectors: np.ndarray) -> None:
+        with self._lock:
+            self._block.append(ids, vectors)
+
+    def add_mapped(self, ids: np.ndarray, vectors: np.ndarray, live: np.ndarray) -> None:
+        with self._lock:
+            if self._mapped is not None:
+                raise ValueError("Index already holds memory-mapped vectors")
+            self._mapped = vectors
+            self._mapped_ids = ids
+            self._mapped_live = live.copy()
+            self._mapped_size = int(np.count_nonzero(live))
+
+    def remove(self, ids: np.ndarray) -> int:
+        with self._lock:
+            removed = self._block.remove(ids)
+            if self._mapped is not None:
+                hit = np.isin(self._mapped_ids, ids) & self._mapped_live
+                count = int(np.count_nonzero(hit))
+                if count:
+                    # Replace rather than mutate the mask so running searches keep a consistent view
+                    self._mapped_live = self._mapped_live & ~hit
+                    self._mapped_size -= count
+                    removed += count
+            return removed
+
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        with self._lock:
+            vectors, ids = self._block.snapshot()
+            mapped, mapped_ids, mapped_live = self._mapped, self._mapped_ids, self._mapped_live
+
+        similarities = queries @ vectors.T
+        if mapped is not None and len(mapped_ids):
+            mapped_sims = np.empty((queries.shape[0], len(mapped_ids)), dtype=np.float32)
+            for start in range(0, len(mapped_ids), _MAPPED_CHUNK_ROWS):
+                chunk = mapped[start:start + _MAPPED_CHUNK_ROWS]
+                if chunk.dtype != np.float32:
+                    chunk = chunk.astype(np.float32)
+                mapped_sims[:, start:start + len(chunk)] = queries @ chunk.T
+            mapped_sims[:, ~mapped_live] = -np.inf
+            similarities = np.concatenate([similarities, mapped_sims], axis=1)
+            ids = np.concatenate([ids, mapped_ids])
+
+        result_ids, result_sims = _top_k(similarities, ids, k)
+        # Removed mapped rows only surface when k exceeds the live rows
+        result_ids[np.isneginf(result_sims)] = -1
+        return result_ids, result_sims
+
+    def __len__(self) -> int:
+        return self._block.size + self._mapped_size
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"type": self.index_type, "size": len(self), "mapped": self._mapped_size}
+
+class IVFIndex(EmbeddingIndex):
+    """
+    Inverted-file index: vectors are bucketed by their nearest k-means centroid
+    and a search only scans the nprobe closest buckets.
+
+    Until the index holds min_train_size vectors it searches exhaustively.
+    k-means (re)training runs on a background thread; adds and searches
+    use the previous lists until the new ones are swapped in.
+    """
+
+    index_type = "ivf"
+
+    def __init__(
+        self,
+        dimensions: int,
+        nlist: int = ANN_IVF_NLIST,
+        nprobe: int = ANN_IVF_NPROBE,
+        min_train_size: int = ANN_MIN_TRAIN_SIZE
+    ):
+        super().__init__(dimensions)
+        self.requested_nlist = nlist
+        self.nprobe = nprobe
+        self.min_train_size = min_train_size
+        self._centroids: Optional[np.ndarray] = None
+        self._lists: List[_VectorBlock] = [_VectorBlock(dimensions)]
+        # List number of each vector id (-1 when absent), grown as ids arrive
+        self._assignments = np.empty(0, dtype=np.int32)
+        self._trained_size = 0
+        self._size = 0
+        # Background k-means training in progress
+        self._training: Optional[threading.Thread] = None
+
+    @property
+    def trained(self) -> bool:
+        return self._centroids is not None
+
+    def _start_training(self) -> None:
+        """Retrain on a background thread from a snapshot of the current vectors (call with the lock held)"""
+        snapshots = [block.snapshot() for block in self._lists]
+        vectors = np.concatenate([vectors for vectors, _ in snapshots])
+        ids = np.concatenate([ids for _, ids in snapshots])
+        if not len(ids):
+            return
+        self._training = threading.Thread(target=self._train, args=(ids, vectors), name="ivf-train", daemon=True)
+        self._training.start()
+
+    def _train(self, ids: np.ndarray, vectors: np.ndarray) -> None:
+        """
+        Fit centroids with spherical k-means, then swap them in with every vector redistributed
+
+        Runs without the lock so adds and searches continue against the current
+        lists; only vectors added since the snapshot are assigned under the lock.
+        """
+        try:
+            start = time.perf_counter()
+            nlist = self.requested_nlist or int(4 * math.sqrt(len(ids)))
+            nlist = max(1, min(nlist, len(ids)))
+            rng = np.random.default_rng(0)
+
+            sample_size = min(len(ids), nlist * _KMEANS_SAMPLES_PER_LIST)
+            sample = vectors[rng.choice(len(ids), sample_size, replace=False)]
+            centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+
+            for _ in range(_KMEANS_ITERATIONS):
+                assignment = np.argmax(sample @ centroids.T, axis=1)
+                order = np.argsort(assignment, kind="stable")
+                members, starts = np.unique(assignment[order], return_index=True)
+                sums = np.zeros_like(centroids)
+                sums[members] = np.add.reduceat(sample[order], starts, axis=0)
+                empty = np.ones(nlist, dtype=bool)
+                empty[members] = False
+                # Re-seed empty clusters from random samples
+                sums[empty] = sample[rng.choice(sample_size, int(empty.sum()))]
+                norms = np.linalg.norm(sums, axis=1, keepdims=True)
+                centroids = sums / np.where(norms == 0, 1, norms)
+            centroids = centroids.astype(np.float32)
+
+            # List of every snapshot vector by id
+            snapshot_lists = np.full(int(ids.max()) + 1, -1, dtype=np.int32)
+            snapshot_lists[ids] = np.argmax(vectors @ centroids.T, axis=1)
+
+            with self._lock:
+                snapshots = [block.snapshot() for block in self._lists]
+                current_vectors = np.concatenate([vectors for vectors, _ in snapshots])
+                current_ids = np.concatenate([ids for _, ids in snapshots])
+                if not len(current_ids):
+                    return
+                list_nos = np.full(len(current_ids), -1, dtype=np.int32)
+                known = current_ids < len(snapshot_lists)
+                list_nos[known] = snapshot_lists[current_ids[known]]
+                added = list_nos < 0
+                if added.any():
+                    list_nos[added] = np.argmax(current_vectors[added] @ centroids.T, axis=1)
+
+                self._centroids = centroids
+                self._lists = [_VectorBlock(self.dimensions) for _ in range(nlist)]
+                self._assignments = np.full(int(current_ids.max()) + 1, -1, dtype=np.int32)
+                self._trained_size = len(ids)
+                self._distribute(current_ids, current_vectors, list_nos)
+            logger.info(f"Trained IVF index with {nlist} lists on {len(ids)} vectors in {time.perf_counter() - start:.2f}s")
+        except Exception as e:
+            logger.error(f"Failed to train IVF index: {e}")
+        finally:
+            with self._lock:
+                self._training = None
+
+    def _distribute(self, ids: np.ndarray, vectors: np.ndarray, assignment: Optional[np.ndarray] = None) -> None:
+        """Append vectors to the list of their nearest centroid (or of the given list numbers)"""
+        if assignment is None:
+            assignment = np.argmax(vectors @ self._centroids.T, axis=1)
+        if len(ids) and ids.max() >= self._assignments.shape[0]:
+            grown = np.full(max(int(ids.max()) + 1, 2 * self._assignments.shape[0]), -1, dtype=np.int32)
+            grown[:self._assignments.shape[0]] = self._assignments
+            self._assignments = grown
+        self._assignments[ids] = assignment
+
+        order = np.argsort(assignment, kind="stable")
+        assignment, ids, vectors = assignment[order], ids[order], vectors[order]
+        boundaries = np.flatnonzero(np.diff(assignment)) + 1
+
+        for group_ids, group_vectors, list_no in zip(
+            np.split(ids, boundaries), np.split(vectors, boundaries), assignment[np.r_[0, boundaries]]
+        ):
+            self._lists[list_no].append(group_ids, group_vectors)
+
+    def add(self, ids: np.ndarray, vectors: np.ndarray) -> None:
+        with self._lock:
+            if self.trained:
+                self._distribute(ids, vectors)
+            else:
+                self._lists[0].append(ids, vectors)
+            self._size += len(ids)
+
+            if self._training is None and (
+                (not self.trained and self._size >= self.min_train_size)
+                or (self.trained and self._size >= _RETRAIN_GROWTH_FACTOR * self._trained_size)
+            ):
+                self._start_training()
+
+    def wait_until_trained(self, timeout: Optional[float] = None) -> bool:
+        with self._lock:
+            training = self._training
+        if training is None:
+            return True
+        training.join(timeout)
+        return not training.is_alive()
+
+    def remove(self, ids: np.ndarray) -> int:
+        with self._lock:
+            if not self.trained:
+                removed = self._lists[0].remove(ids)
+            else:
+                removed = 0
+                ids = ids[(ids >= 0) & (ids < self._assignments.shape[0])]
+                list_nos = self._assignments[ids]
+                for list_no in np.unique(list_nos[list_nos >= 0]):
+                    removed += self._lists[list_no].remove(ids[list_nos == list_no])
+                self._assignments[ids] = -1
+            self._size -= removed
+            return removed
+
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        with self._lock:
+            centroids = self._centroids
+            snapshots = [block.snapshot() for block in self._lists]
+
+        if centroids is None:
+            vectors, ids = snapshots[0]
+            return _top_k(queries @ vectors.T, ids, k)
+
+        nprobe = min(self.nprobe, len(snapshots))
+        probes = np.argpartition(-(queries @ centroids.T), nprobe - 1, axis=1)[:, :nprobe]
+
+        result_ids = np.full((queries.shape[0], k), -1, dtype=np.int64)
+        result_sims = np.full((queries.shape[0], k), -np.inf, dtype=np.float32)
+        for row, query in enumerate(queries):
+            probed = [snapshots[list_no] for list_no in probes[row] if snapshots[list_no][1].size]
+            if not probed:
+                continue
+            vectors = np.concatenate([vectors for vectors, _ in probed])
+            ids = np.concatenate([ids for _, ids in probed])
+            found_ids, found_sims = _top_k((vectors @ query)[None, :], ids, k)
+            result_ids[row], result_sims[row] = found_ids[0], found_sims[0]
+        return result_ids, result_sims
+
+    def __len__(self) -> int:
+        return self._size
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "type": self.index_type,
+            "size": self._size,
+            "trained": self.trained,
+            "training": self._training is not None,
+            "nlist": len(self._lists) if self.trained else 0,
+            "nprobe": self.nprobe
+        }
+
+class HNSWIndex(EmbeddingIndex):
+    """Hierarchical navigable small world graph index backed by the optional hnswlib package"""
+
+    index_type = "hnsw"
+
+    def __init__(
+        self,
+        dimensions: int,
+        m: int = ANN_HNSW_M,
+        ef_construction: int = ANN_HNSW_EF_CONSTRUCTION,
+        ef_search: int = ANN_HNSW_EF_SEARCH
+    ):
+        if hnswlib is None:
+            raise RuntimeError("hnswlib is not installed - install it or use the 'ivf' or 'exact' index")
+        super().__init__(dimensions)
+        self.ef_search = ef_search
+        self._index = hnswlib.Index(space="ip", dim=dimensions)
+        self._index.init_index(
+            max_elements=1024, ef_construction=ef_construction, M=m, allow_replace_deleted=True
+        )
+        self._index.set_ef(ef_search)
+        self._size = 0
+
+    def add(self, ids: np.ndarray, vectors: np.ndarray) -> None:
+        with self._lock:
+            needed = self._index.get_current_count() + len(ids)
+            if needed > self._index.get_max_elements():
+                self._index.resize_index(max(needed, 2 * self._index.get_max_elements()))
+            self._index.add_items(vectors, ids, replace_deleted=True)
+            self._size += len(ids)
+
+    def remove(self, ids: np.ndarray) -> int:
+        removed = 0
+        with self._lock:
+            for vector_id in ids.tolist():
+                try:
+                    self._index.mark_deleted(vector_id)
+                    removed += 1
+                except RuntimeError:
+                    pass
+            self._size -= removed
+        return removed
+
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        result_ids = np.full((queries.shape[0], k), -1, dtype=np.int64)
+        result_sims = np.full((queries.shape[0], k), -np.inf, dtype=np.float32)
+        with self._lock:
+            count = min(k, self._size)
+            if count == 0:
+                return result_ids, result_sims
+            self._index.set_ef(max(self.ef_search, count))
+            labels, distances = self._index.knn_query(queries, k=count)
+        # hnswlib reports inner-product distance as 1 - similarity
+        result_ids[:, :count] = labels
+        result_sims[:, :count] = 1 - distances
+        return result_ids, result_sims
+
+    def __len__(self) -> int:
+        return self._size
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"type": self.index_type, "size": self._size, "ef_search": self.ef_search}
+
+def create_index(index_type: str, dimensions: int, **params: Any) -> EmbeddingIndex:
+    """
+    Create an embedding index of the given type
+
+    Args:
+        index_type: One of INDEX_TYPES (exact, ivf, hnsw)
+        dimensions: Embedding dimensions of the model
+        **params: Index-specific tuning parameters (nprobe, nlist, ef_search, ...)
+
+    Returns:
+        A new, empty EmbeddingIndex
+    """
+    if index_type == "exact":
+        return ExactIndex(dimensions)
+    if index_type == "ivf":
+        return IVFIndex(dimensions, **params)
+    if index_type == "hnsw":
+        return HNSWIndex(dimensions, **params)
+    raise ValueError(f"Unsupported index type: {index_type}. Available types: {INDEX_TYPES}")
@@ -0,0 +1,307 @@
+"""
+Embedding store module for Face Matching API
+Append-only on-disk embedding storage, memory-mapped at startup
+"""
+
+import os
+import json
+import fcntl
+import logging
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+STORE_DTYPES = ["float32", "float16"]
+
+VECTORS_FILE = "vectors.bin"
+METADATA_FILE = "metadata.jsonl"
+TOMBSTONES_FILE = "tombstones.jsonl"
+HEADER_FILE = "store.json"
+LOCK_FILE = ".lock"
+
+class EmbeddingStore:
+    """
+    On-disk embeddings of one model
+
+    Vectors are appended to one contiguous raw array and memory-mapped read-only
+    when loaded, so worker processes share them through the page cache. Row i of
+    the array is described by line i of the metadata sidecar (identity, filename).
+    Removals are recorded as tombstones applying to rows written before them.
+    """
+
+    def __init__(self, directory: str, model_name: str, dimensions: int, dtype: str = "float32"):
+        if dtype not in STORE_DTYPES:
+            raise ValueError(f"Unsupported store dtype: {dtype}. Available dtypes: {STORE_DTYPES}")
+        self.directory = directory
+        self.model_name = model_name
+        self.dimensions = dimensions
+        self.dtype = np.dtype(dtype)
+        # File sizes last checked by _repair, and the committed rows they hold
+        self._verified_sizes = None
+        self._verified_rows = 0
+        # Rows, metadata and tombstone bytes already returned by load or tail
+        self._tail_position = (0, 0, 0)
+
+    @classmethod
+    def open(cls, directory: str, model_name: str, dimensions: int, dtype: str = "float32") -> "EmbeddingStore":
+        """
+        Open the store of a model, creating it if needed
+
+        Args:
+            directory: Store root directory
+            model_name: Face recognition model name
+            dimensions: Embedding dimensions (must match an existing store)
+            dtype: On-disk dtype for a new store (an existing store keeps its own)
+
+        Returns:
+            EmbeddingStore for the model
+        """
+        model_dir = os.path.join(directory, model_name)
+        os.makedirs(model_dir, exist_ok=True)
+        header_path = os.path.join(model_dir, HEADER_FILE)
+
+        if os.path.exists(header_path):
+            with open(header_path) as f:
+                header = json.load(f)
+            if header["dimensions"] != dimensions:
+                raise ValueError(
+                    f"{model_name} store holds {header['dimensions']}-d embeddings, got {dimensions}-d"
+                )
+            return cls(model_dir, model_name, header["dimensions"], header["dtype"])
+
+        with open(header_path, "w") as f:
+            json.dump({"model": model_name, "dimensions": dimensions, "dtype": dtype}, f)
+        return cls(model_dir, model_name, dimensions, dtype)
+
+    @classmethod
+    def list_stores(cls, directory: str) -> List["EmbeddingStore"]:
+        """
+        Find every model store below a root directory
+
+        Args:
+            directory: Store root directory
+
+        Returns:
+            List of existing stores
+        """
+        stores = []
+        if not os.path.isdir(directory):
+            return stores
+        for model_name in sorted(os.listdir(directory)):
+            header_path = os.path.join(directory, model_name, HEADER_FILE)
+            if os.path.exists(header_path):
+                with open(header_path) as f:
+                    header = json.load(f)
+                stores.append(cls(os.path.join(directory, model_name), model_name, header["dimensions"], header["dtype"]))
+        return stores
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        """Serialize writers across processes with an advisory file lock"""
+        with open(self._path(LOCK_FILE), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _row_bytes(self) -> int:
+        return self.dimensions * self.dtype.itemsize
+
+    def _count_rows(self) -> int:
+        """Number of complete rows in the vectors file"""
+        path = self._path(VECTORS_FILE)
+        return os.path.getsize(path) // self._row_bytes() if os.path.exists(path) else 0
+
+    @staticmethod
+    def _read_records(path: str, offset: int = 0) -> Tuple[List[Dict[str, Any]], List[int]]:
+        """Complete JSON lines of a sidecar file from a byte offset, with the offset after each"""
+        records: List[Dict[str, Any]] = []
+        ends: List[int] = []
+        if not os.path.exists(path) or os.path.getsize(path) <= offset:
+            return records, ends
+        with open(path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Torn last line from a crash mid-append
+                    break
+                offset += len(line)
+                records.append(record)
+                ends.append(offset)
+        return records, ends
+
+    def _repair(self) -> int:
+        """
+        Trim both files to the rows fully written to each (call with the lock held)
+
+        A crash between the vectors and metadata writes leaves vector rows without
+        metadata, or a torn metadata line; rows appended after them would otherwise
+        be described by the wrong metadata line, or not loaded at all.
+
+        Returns:
+            Number of committed rows
+        """
+        vectors_path = self._path(VECTORS_FILE)
+        metadata_path = self._path(METADATA_FILE)
+        sizes = tuple(os.path.getsize(path) if os.path.exists(path) else 0 for path in (vectors_path, metadata_path))
+        if sizes == self._verified_sizes:
+            return self._verified_rows
+
+        # Byte offset after each complete metadata line
+        offsets = [0] + self._read_records(metadata_path)[1]
+
+        rows = min(sizes[0] // self._row_bytes(), len(offsets) - 1)
+        if sizes[0] != rows * self._row_bytes():
+            logger.warning(f"{self.model_name} store: dropping {sizes[0] - rows * self._row_bytes()} bytes of uncommitted vectors")
+            os.truncate(vectors_path, rows * self._row_bytes())
+        if sizes[1] != offsets[rows]:
+            logger.warning(f"{self.model_name} store: dropping {sizes[1] - offsets[rows]} bytes of uncommitted metadata")
+            os.truncate(metadata_path, offsets[rows])
+
+        self._verified_sizes = (rows * self._row_bytes(), offsets[rows])
+        self._verified_rows = rows
+        return rows
+
+    def append(self, identity: str, vectors: np.ndarray, filenames: List[str]) -> None:
+        """
+        Persist embeddings of an identity
+
+        Args:
+            identity: Identity label
+            vectors: L2-normalized embeddings, one per row
+            filenames: Source filename of each embedding
+        """
+        data = np.ascontiguousarray(np.atleast_2d(vectors), dtype=self.dtype)
+        if data.shape[1] != self.dimensions:
+            raise ValueError(
+                f"{self.model_name} store holds {self.dimensions}-d embeddings, got {data.shape[1]}-d"
+            )
+        lines = "".join(
+            json.dumps({"identity": identity, "filename": filename}) + "\n"
+            for filename in filenames
+        )
+
+        with self._locked():
+            # Drop rows left uncommitted by a crash mid-append before writing new ones
+            rows = self._repair()
+            with open(self._path(VECTORS_FILE), "ab") as f:
+                f.write(data.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            # The metadata lines commit the rows
+            with open(self._path(METADATA_FILE), "ab") as f:
+                f.write(lines.encode())
+                f.flush()
+                os.fsync(f.fileno())
+            self._verified_sizes = (
+                (rows + len(data)) * self._row_bytes(),
+                os.path.getsize(self._path(METADATA_FILE))
+            )
+            self._verified_rows = rows + len(data)
+
+    def remove(self, identity: str) -> None:
+        """
+        Record that every embedding stored so far for an identity is removed
+
+        Args:
+            identity: Identity label
+        """
+        with self._locked():
+            with open(self._path(TOMBSTONES_FILE), "a") as f:
+                f.write(json.dumps({"identity": identity, "before_row": self._repair()}) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def load(self) -> Tuple[np.ndarray, List[str], List[str], np.ndarray]:
+        """
+        Memory-map the stored vectors and read their metadata
+
+        Returns:
+            Tuple of (read-only memmap of shape (rows, dimensions), identity per row,
+            filename per row, boolean mask of live rows)
+        """
+        # Removals first: each applies to rows committed before it, which the metadata read then includes
+        tombstones, tombstone_ends = self._read_records(self._path(TOMBSTONES_FILE))
+        records, metadata_ends = self._read_records(self._path(METADATA_FILE))
+
+        # Rows are only valid once both the vector and its metadata line were written
+        rows = min(self._count_rows(), len(records))
+        identities = [record["identity"] for record in records[:rows]]
+        filenames = [record["filename"] for record in records[:rows]]
+
+        if rows:
+            vectors = np.memmap(
+                self._path(VECTORS_FILE), dtype=self.dtype, mode="r", shape=(rows, self.dimensions)
+            )
+        else:
+            vectors = np.empty((0, self.dimensions), dtype=self.dtype)
+
+        alive = np.ones(rows, dtype=bool)
+        if tombstones:
+            row_identities = np.asarray(identities, dtype=object)
+            for record in tombstones:
+                before = min(record["before_row"], rows)
+                alive[:before] &= row_identities[:before] != record["identity"]
+
+        self._tail_position = (
+            rows,
+            metadata_ends[rows - 1] if rows else 0,
+            tombstone_ends[-1] if tombstone_ends else 0
+        )
+        return vectors, identities, filenames, alive
+
+    def tail(self) -> Tuple[np.ndarray, List[str], List[str], List[Tuple[str, int]], int]:
+        """
+        Read what other processes committed since the last load or tail of this instance
+
+        Returns:
+            Tuple of (new vectors, identity per new row, filename per new row,
+            (identity, before_row) removals in the order they were made, row number
+            of the first new row)
+        """
+        rows, metadata_offset, tombstones_offset = self._tail_position
+        tombstones, tombstone_ends = self._read_records(self._path(TOMBSTONES_FILE), tombstones_offset)
+        records, metadata_ends = self._read_records(self._path(METADATA_FILE), metadata_offset)
+
+        count = max(0, min(self._count_rows() - rows, len(records)))
+        if count:
+            vectors = np.fromfile(
+                self._path(VECTORS_FILE), dtype=self.dtype,
+                count=count * self.dimensions, offset=rows * self._row_bytes()
+            ).reshape(count, self.dimensions)
+        else:
+            vectors = np.empty((0, self.dimensions), dtype=self.dtype)
+
+        self._tail_position = (
+            rows + count,
+            metadata_ends[count - 1] if count else metadata_offset,
+            tombstone_ends[-1] if tombstone_ends else tombstones_offset
+        )
+        return (
+            vectors,
+            [record["identity"] for record in records[:count]],
+            [record["filename"] for record in records[:count]],
+            [(record["identity"], record["before_row"]) for record in tombstones],
+            rows
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Report on-disk size of the store"""
+        path = self._path(VECTORS_FILE)
+        return {
+            "model": self.model_name,
+            "rows": self._count_rows(),
+            "dtype": self.dtype.name,
+            "size_mb": round((os.path.getsize(path) if os.path.exists(path) else 0) / (1024 * 1024), 2)
+        }
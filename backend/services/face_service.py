@@ -3,85 +3,275 @@ Face processing service for Face Matching API
 Contains core face analysis business logic
 """
 
+import time
+import asyncio
 import logging
-from typing import List, Dict, Any, Optional
-from deepface import DeepFace
+from typing import List, Dict, Any, Callable, Optional, Tuple, Union
+import numpy as np
+
+from config import ATTRIBUTE_MODELS, ANTI_SPOOFING_MODEL, DEFAULT_DETECTOR_BACKEND
+from lazy_imports import LazyModule
+from services.inference_executor import InferenceExecutor
+from services.batching_service import EmbeddingBatcher
+from services.cache_service import CacheService
+from services.deadline_service import RequestDeadline
+from services.metrics_service import MetricsService
+from services.timing_service import RequestTimings
 
 logger = logging.getLogger(__name__)
 
+# Imported on first use (or by ModelService in the background), see lazy_imports
+DeepFace = LazyModule("deepface.DeepFace")
+detection = LazyModule("deepface.modules.detection")
+preprocessing = LazyModule("deepface.modules.preprocessing")
+verification = LazyModule("deepface.modules.verification")
+
 class FaceService:
     """Service class for face-related operations"""
     
+    # Input shape of each recognition model, so preprocessing does not reload evicted models
+    _input_shapes: Dict[str, Tuple[int, int]] = {}
+    
     @staticmethod
-    def verify_faces(img1_path: str, img2_path: str, model_name: str) -> Dict[str, Any]:
+    async def verify_faces(img1_path: Union[str, np.ndarray], img2_path: Union[str, np.ndarray], model_name: str) -> Dict[str, Any]:
         """
         Verify if two face images belong to the same person
         
         Args:
-            img1_path: Path to first image
-            img2_path: Path to second image
+            img1_path: First image as a BGR array or file path
+            img2_path: Second image as a BGR array or file path
             model_name: Name of the face recognition model to use
             
         Returns:
             Dict containing verification results
         """
         try:
-            result = DeepFace.verify(
-                img1_path=img1_path,
-                img2_path=img2_path,
-                model_name=model_name,
-                enforce_detection=False
-            )
+            # Route through the shared embedding path so both images join the micro-batches
+            result = (await FaceService.compare_images([img1_path, img2_path], model_name))[0]
+            if "error" in result:
+                raise ValueError(result["error"])
+            result.pop("index1")
+            result.pop("index2")
             return result
         except Exception as e:
             logger.error(f"Error in face verification: {e}")
             raise
     
     @staticmethod
-    def analyze_face_attributes(img_path: str, actions: List[str]) -> List[Dict[str, Any]]:
+    async def analyze_face_attributes(img_path: Union[str, np.ndarray], actions: List[str]) -> List[Dict[str, Any]]:
         """
         Analyze facial attributes in an image
         
         Args:
-            img_path: Path to the image
+            img_path: Image as a BGR array or file path
             actions: List of attributes to analyze
             
         Returns:
             List of dictionaries containing analysis results for each face
         """
-        try:
-            analysis = DeepFace.analyze(
+        results, _ = await FaceService.analyze_face_attributes_batch([img_path], actions)
+        if isinstance(results[0], Exception):
+            raise results[0]
+        return results[0]
+    
+    @staticmethod
+    def detect_faces(img_path: Union[str, np.ndarray]) -> List[Dict[str, Any]]:
+        """
+        Detect and align faces the way DeepFace.analyze does
+        
+        Args:
+            img_path: Image as a BGR array or file path
+            
+        Returns:
+            List of DeepFace face objects (RGB face crop, facial_area, confidence)
+        """
+        with RequestTimings.stage("detect"):
+            return detection.extract_faces(
                 img_path=img_path,
-                actions=actions,
-                enforce_detection=False
+                detector_backend=DEFAULT_DETECTOR_BACKEND,
+                grayscale=False,
+                enforce_detection=False,
+                align=True
             )
+    
+    @staticmethod
+    def analyze_attribute(action: str, face_objs_per_image: List[List[Dict[str, Any]]]) -> List[List[Dict[str, Any]]]:
+        """
+        Run one attribute model over already detected faces of several images
+        
+        Args:
+            action: Attribute to analyze (age, gender, emotion, race)
+            face_objs_per_image: Face objects from detect_faces, per image
             
-            # Ensure we always return a list
-            if isinstance(analysis, list):
-                return analysis
-            else:
-                return [analysis]
-                
-        except Exception as e:
-            logger.error(f"Error in face attribute analysis: {e}")
-            raise
+        Returns:
+            DeepFace.analyze attribute fields of each face, per image
+        """
+        results = []
+        for face_objs in face_objs_per_image:
+            image_results = []
+            for face_obj in face_objs:
+                # Back to a 0-255 BGR image; "skip" then uses the aligned crop as the face
+                analysis = DeepFace.analyze(
+                    img_path=face_obj["face"][:, :, ::-1] * 255,
+                    actions=[action],
+                    detector_backend="skip",
+                    enforce_detection=False,
+                    silent=True
+                )
+                image_results.append({
+                    key: value for key, value in analysis[0].items()
+                    if key not in ("region", "face_confidence")
+                })
+            results.append(image_results)
+        return results
     
     @staticmethod
-    def detect_spoofing(img_path: str) -> List[Dict[str, Any]]:
+    async def _cache_keys(images: List[Union[str, np.ndarray]], *parts: str) -> List[Tuple[str, ...]]:
+        """
+        Build the result cache keys of several images
+        
+        Uploads reuse the digest of their bytes; other images are hashed on the executor.
+        
+        Args:
+            images: Images as BGR arrays or file paths
+            *parts: Operation, model and detector identifiers
+            
+        Returns:
+            Cache key of each image
+        """
+        async def cache_key(image: Union[str, np.ndarray]) -> Tuple[str, ...]:
+            if CacheService.upload_digest(image) is not None:
+                return CacheService.make_key(image, *parts)
+            return await InferenceExecutor.run(CacheService.make_key, image, *parts, stage="cache_key")
+        
+        return list(await asyncio.gather(*(cache_key(image) for image in images)))
+    
+    @staticmethod
+    async def analyze_face_attributes_batch(
+        images: List[Union[str, np.ndarray]], 
+        actions: List[str],
+        on_result: Optional[Callable[[int, Union[List[Dict[str, Any]], Exception]], None]] = None
+    ) -> Tuple[List[Union[List[Dict[str, Any]], Exception]], Dict[str, float]]:
+        """
+        Analyze several attributes of several images, detecting faces only once
+        
+        Attribute models run one after another over all detected faces so that
+        ModelService can keep resident models within MODEL_MEMORY_BUDGET_MB.
+        
+        Args:
+            images: Images as BGR arrays or file paths
+            actions: Attributes to analyze
+            on_result: Called with (index, outcome) as soon as an image's outcome is
+                final: cache hits and images without faces or whose detection failed
+                come before the attribute models run, the others after the last one
+            
+        Returns:
+            Tuple of (for each image, its DeepFace.analyze-style face list or the
+            exception raised for it; milliseconds spent on detection and on each attribute)
+        """
+        results: List[Union[List[Dict[str, Any]], Exception, None]] = [None] * len(images)
+        cache_keys: List[Optional[str]] = [None] * len(images)
+        timings: Dict[str, float] = {}
+        detected = []
+        
+        def finish(i: int) -> None:
+            if on_result is not None:
+                on_result(i, results[i])
+        
+        if CacheService.enabled():
+            cache_keys = await FaceService._cache_keys(
+                images, "analyze", DEFAULT_DETECTOR_BACKEND, ",".join(sorted(actions))
+            )
+            for i, cache_key in enumerate(cache_keys):
+                results[i] = CacheService.get(cache_key)
+                if results[i] is not None:
+                    finish(i)
+        
+        async def detect(i: int) -> None:
+            try:
+                face_objs = await RequestTimings.for_image(i, InferenceExecutor.run(
+                    FaceService.detect_faces, images[i],
+                    model_keys=[f"face_detector/{DEFAULT_DETECTOR_BACKEND}"]
+                ))
+            except Exception as e:
+                logger.error(f"Error in face detection: {e}")
+                results[i] = e
+                finish(i)
+                return
+            results[i] = [
+                {"region": face_obj["facial_area"], "face_confidence": face_obj["confidence"]}
+                for face_obj in face_objs
+            ]
+            if face_objs:
+                detected.append((i, face_objs))
+                return
+            if cache_keys[i] is not None:
+                CacheService.put(cache_keys[i], results[i])
+            finish(i)
+        
+        pending = [i for i in range(len(images)) if results[i] is None]
+        if pending:
+            await RequestDeadline.check("face detection")
+        start = time.perf_counter()
+        await asyncio.gather(*(detect(i) for i in pending))
+        timings["detection"] = round((time.perf_counter() - start) * 1000, 3)
+        
+        if not detected:
+            return results, timings
+        # Attribute models see the faces in image order whatever order detection finished in
+        detected.sort(key=lambda item: item[0])
+        
+        for action in actions:
+            await RequestDeadline.check(f"{action} analysis")
+            start = time.perf_counter()
+            try:
+                attributes = await InferenceExecutor.run(
+                    FaceService.analyze_attribute, action, [face_objs for _, face_objs in detected],
+                    model_keys=[f"facial_attribute/{ATTRIBUTE_MODELS[action]}"]
+                )
+            except Exception as e:
+                logger.error(f"Error in face attribute analysis: {e}")
+                for i, _ in detected:
+                    results[i] = e
+                    finish(i)
+                return results, timings
+            elapsed = time.perf_counter() - start
+            timings[action] = round(elapsed * 1000, 3)
+            RequestTimings.record_shared("infer", elapsed, {i: len(face_objs) for i, face_objs in detected})
+            MetricsService.count_faces("attributes", ATTRIBUTE_MODELS[action], sum(len(a) for a in attributes))
+            
+            for (i, _), image_attributes in zip(detected, attributes):
+                for face, face_attributes in zip(results[i], image_attributes):
+                    face.update(face_attributes)
+        
+        for i, _ in detected:
+            if cache_keys[i] is not None:
+                CacheService.put(cache_keys[i], results[i])
+            finish(i)
+        
+        return results, timings
+    
+    @staticmethod
+    async def detect_spoofing(img_path: Union[str, np.ndarray]) -> List[Dict[str, Any]]:
         """
         Detect face spoofing in an image
         
         Args:
-            img_path: Path to the image
+            img_path: Image as a BGR array or file path
             
         Returns:
             List of dictionaries containing face objects with spoofing information
         """
         try:
-            face_objs = DeepFace.extract_faces(
-                img_path=img_path,
-                anti_spoofing=True
-            )
+            # Detection and the anti-spoofing model run in one DeepFace call
+            with RequestTimings.stage("infer"):
+                face_objs = await InferenceExecutor.run(
+                    DeepFace.extract_faces,
+                    img_path=img_path,
+                    anti_spoofing=True,
+                    model_keys=[f"spoofing/{ANTI_SPOOFING_MODEL}"]
+                )
+            MetricsService.count_faces("anti_spoofing", ANTI_SPOOFING_MODEL, len(face_objs))
             return face_objs
         except Exception as e:
             logger.error(f"Error in spoofing detection: {e}")
@@ -168,6 +358,23 @@ class FaceService:
             "errors": errors
         }
     
+    @staticmethod
+    def calculate_analysis_summary(results: List[Dict[str, Any]]) -> Dict[str, int]:
+        """
+        Calculate summary statistics for facial attribute analysis
+        
+        Args:
+            results: List of per-image analysis results
+            
+        Returns:
+            Dictionary with face, success and failure counts
+        """
+        return {
+            "total_faces_detected": sum(r.get("faces_detected", 0) for r in results),
+            "successful_analyses": len([r for r in results if "error" not in r]),
+            "failed_analyses": len([r for r in results if "error" in r])
+        }
+    
     @staticmethod
     def calculate_spoofing_summary(results: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
@@ -201,33 +408,178 @@ class FaceService:
         }
     
     @staticmethod
-    def extract_face_embeddings(img_path: str, model_name: str) -> List[Dict[str, Any]]:
+    def get_input_shape(model_name: str) -> Tuple[int, int]:
+        """
+        Get the input size of a recognition model
+        
+        Remembered after the first call so preprocessing never reloads an evicted model.
+        
+        Args:
+            model_name: Name of the face recognition model
+            
+        Returns:
+            Model input shape as (width, height)
+        """
+        input_shape = FaceService._input_shapes.get(model_name)
+        if input_shape is None:
+            input_shape = DeepFace.build_model(model_name=model_name, task="facial_recognition").input_shape
+            FaceService._input_shapes[model_name] = input_shape
+        return input_shape
+    
+    @staticmethod
+    def detect_and_align_faces(img_path: Union[str, np.ndarray], model_name: str) -> Tuple[np.ndarray, List[Dict[str, Any]]]:
+        """
+        Detect and align faces, preprocessed for a recognition model
+        
+        Mirrors the per-face preprocessing of DeepFace.represent without the forward pass.
+        
+        Args:
+            img_path: Image as a BGR array or file path
+            model_name: Name of the face recognition model the crops are prepared for
+            
+        Returns:
+            Tuple of (crops of shape (faces, height, width, channels), facial area
+            and confidence of each face)
+        """
+        target_size = FaceService.get_input_shape(model_name)
+        face_objs = FaceService.detect_faces(img_path)
+        
+        with RequestTimings.stage("align"):
+            crops, faces = [], []
+            for face_obj in face_objs:
+                # Faces come back RGB; recognition models expect BGR like DeepFace.represent
+                img = preprocessing.resize_image(
+                    img=face_obj["face"][:, :, ::-1],
+                    target_size=(target_size[1], target_size[0])
+                )
+                crops.append(preprocessing.normalize_input(img=img, normalization="base"))
+                faces.append({
+                    "facial_area": face_obj["facial_area"],
+                    "face_confidence": face_obj["confidence"]
+                })
+            
+            if not crops:
+                return np.empty((0, target_size[1], target_size[0], 3), dtype=np.float32), faces
+            return np.concatenate(crops).astype(np.float32, copy=False), faces
+    
+    @staticmethod
+    async def extract_face_embeddings(
+        img_path: Union[str, np.ndarray],
+        model_name: str,
+        as_arrays: bool = False
+    ) -> List[Dict[str, Any]]:
         """
         Extract face embeddings from an image
         
         Args:
-            img_path: Path to the image
+            img_path: Image as a BGR array or file path
             model_name: Name of the face recognition model to use
+            as_arrays: Return embeddings as float32 arrays instead of float lists
             
         Returns:
             List of dictionaries containing embedding vectors and facial areas
         """
-        try:
-            embeddings = DeepFace.represent(
-                img_path=img_path,
-                model_name=model_name,
-                enforce_detection=False
-            )
+        result = (await FaceService.extract_face_embeddings_batch([img_path], model_name, as_arrays))[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+    
+    @staticmethod
+    async def extract_face_embeddings_batch(
+        images: List[Union[str, np.ndarray]], 
+        model_name: str,
+        as_arrays: bool = False
+    ) -> List[Union[List[Dict[str, Any]], Exception]]:
+        """
+        Extract face embeddings from several images with one batched forward pass
+        
+        Faces of every image are detected first, then all aligned crops are
+        stacked and embedded together (cached images are skipped).
+        
+        Args:
+            images: Images as BGR arrays or file paths
+            model_name: Name of the face recognition model to use
+            as_arrays: Return embeddings as float32 arrays (for binary encodings) instead of float lists
             
-            # Ensure we always return a list
-            if isinstance(embeddings, list):
-                return embeddings
+        Returns:
+            For each image, either its list of embedding dictionaries (embedding,
+            facial_area, face_confidence) or the exception raised for it
+        """
+        results: List[Union[List[Dict[str, Any]], Exception, None]] = [None] * len(images)
+        cache_keys: List[Optional[str]] = [None] * len(images)
+        
+        if CacheService.enabled():
+            cache_keys = await FaceService._cache_keys(
+                images, "represent", model_name, DEFAULT_DETECTOR_BACKEND
+            )
+            for i, cache_key in enumerate(cache_keys):
+                cached = CacheService.get(cache_key)
+                if cached is not None:
+                    results[i] = [
+                        {**face, "embedding": face["embedding"] if as_arrays else face["embedding"].tolist()}
+                        for face in cached
+                    ]
+        
+        # Detect and align every remaining image on the executor
+        pending = [i for i in range(len(images)) if results[i] is None]
+        if pending:
+            await RequestDeadline.check("face detection")
+        if pending and model_name not in FaceService._input_shapes:
+            await InferenceExecutor.run(
+                FaceService.get_input_shape, model_name,
+                model_keys=[f"facial_recognition/{model_name}"],
+                stage="model_load"
+            )
+        detections = await asyncio.gather(*(
+            RequestTimings.for_image(i, InferenceExecutor.run(
+                FaceService.detect_and_align_faces, images[i], model_name,
+                model_keys=[f"face_detector/{DEFAULT_DETECTOR_BACKEND}"]
+            ))
+            for i in pending
+        ), return_exceptions=True)
+        
+        detected = []
+        for i, detection_result in zip(pending, detections):
+            if isinstance(detection_result, Exception):
+                logger.error(f"Error in face detection: {detection_result}")
+                results[i] = detection_result
             else:
-                return [embeddings]
-                
-        except Exception as e:
-            logger.error(f"Error in face embedding extraction: {e}")
-            raise
+                detected.append((i, *detection_result))
+        
+        if detected:
+            await RequestDeadline.check("embedding")
+            start = time.perf_counter()
+            try:
+                # One forward pass for the faces of all images (shared with concurrent requests)
+                vectors = await EmbeddingBatcher.embed(
+                    model_name, np.concatenate([crops for _, crops, _ in detected])
+                )
+                RequestTimings.record_shared(
+                    "infer", time.perf_counter() - start, {i: len(crops) for i, crops, _ in detected}
+                )
+            except Exception as e:
+                logger.error(f"Error in face embedding extraction: {e}")
+                for i, _, _ in detected:
+                    results[i] = e
+                return results
+            
+            MetricsService.count_faces("embedding", model_name, len(vectors))
+            
+            offset = 0
+            for i, crops, faces in detected:
+                image_vectors = vectors[offset:offset + len(crops)]
+                offset += len(crops)
+                if cache_keys[i] is not None:
+                    # Keep embeddings as compact float32 arrays (the models' native precision)
+                    CacheService.put(cache_keys[i], [
+                        {"embedding": vector, **face} for vector, face in zip(image_vectors, faces)
+                    ])
+                results[i] = [
+                    {"embedding": vector if as_arrays else vector.tolist(), **face}
+                    for vector, face in zip(image_vectors, faces)
+                ]
+        
+        return results
     
     @staticmethod
     def calculate_embedding_distance(embedding1: List[float], embedding2: List[float], metric: str = "cosine") -> float:
@@ -260,6 +612,155 @@ class FaceService:
             logger.error(f"Error in embedding distance calculation: {e}")
             raise
     
+    @staticmethod
+    def calculate_distance_matrices(embeddings: List[List[float]]) -> Dict[str, np.ndarray]:
+        """
+        Calculate all pairwise distance matrices for a list of embeddings in one pass
+        
+        The embeddings are stacked into a single float32 matrix and one Gram
+        matrix is shared by every metric.
+        
+        Args:
+            embeddings: Embedding vectors, all with the same dimensions
+            
+        Returns:
+            Dictionary with square cosine, euclidean and euclidean_l2 distance matrices
+        """
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        if matrix.ndim != 2:
+            raise ValueError("Embeddings must have the same dimensions")
+        
+        gram = matrix @ matrix.T
+        squared_norms = np.diag(gram).copy()
+        norms = np.sqrt(squared_norms)
+        norms[norms == 0] = 1
+        
+        cosine_similarity = np.clip(gram / np.outer(norms, norms), -1.0, 1.0)
+        euclidean = np.sqrt(np.maximum(squared_norms[:, None] + squared_norms[None, :] - 2 * gram, 0))
+        euclidean_l2 = np.sqrt(np.maximum(2 - 2 * cosine_similarity, 0))
+        
+        # Rounding noise must not leave self-distances above zero
+        np.fill_diagonal(euclidean, 0)
+        np.fill_diagonal(euclidean_l2, 0)
+        
+        return {
+            "cosine": 1 - cosine_similarity,
+            "euclidean": euclidean,
+            "euclidean_l2": euclidean_l2
+        }
+    
+    @staticmethod
+    def calculate_distance_matrix(embeddings: List[List[float]], metric: str = "cosine") -> np.ndarray:
+        """
+        Calculate the pairwise distance matrix for a list of embeddings
+        
+        Args:
+            embeddings: Embedding vectors, all with the same dimensions
+            metric: Distance metric to use (cosine, euclidean, euclidean_l2)
+            
+        Returns:
+            Square matrix where entry (i, j) is the distance between embeddings i and j
+        """
+        matrices = FaceService.calculate_distance_matrices(embeddings)
+        if metric not in matrices:
+            raise ValueError(f"Unsupported distance metric: {metric}")
+        return matrices[metric]
+    
+    @staticmethod
+    async def compare_images(
+        images: List[Union[str, np.ndarray]], 
+        model_name: str, 
+        distance_metric: str = "cosine"
+    ) -> List[Dict[str, Any]]:
+        """
+        Compare every pair of images, embedding each image only once
+        
+        Each pair is verified the way DeepFace.verify does it: the closest pair
+        of faces across both images decides the distance.
+        
+        Args:
+            images: Images as BGR arrays or file paths
+            model_name: Name of the face recognition model to use
+            distance_metric: Distance metric to use (cosine, euclidean, euclidean_l2)
+            
+        Returns:
+            List of pairwise results with image indices (index1, index2) and either
+            DeepFace.verify-style verification fields or an error message
+        """
+        start = time.perf_counter()
+        outcomes = await FaceService.extract_face_embeddings_batch(images, model_name)
+        embed_time = time.perf_counter() - start
+        
+        # Stack faces of all images, remembering which image each face belongs to
+        embeddings, facial_areas, owners = [], [], []
+        errors = {}
+        for i, faces in enumerate(outcomes):
+            if isinstance(faces, Exception):
+                errors[i] = str(faces)
+                continue
+            if not faces:
+                errors[i] = "No face detected"
+            for face in faces:
+                embeddings.append(face["embedding"])
+                facial_areas.append(face.get("facial_area", {}))
+                owners.append(i)
+        
+        threshold = verification.find_threshold(model_name, distance_metric)
+        start = time.perf_counter()
+        
+        if embeddings:
+            # One matrix for all faces, reduced to the closest face pair per image pair
+            distances = FaceService.calculate_distance_matrix(embeddings, distance_metric)
+            owners = np.asarray(owners)
+            starts = np.flatnonzero(np.r_[True, owners[1:] != owners[:-1]])
+            image_ids = owners[starts]
+            image_distances = np.minimum.reduceat(
+                np.minimum.reduceat(distances, starts, axis=0), starts, axis=1
+            )
+            verified = image_distances <= threshold
+            position = {int(image_id): k for k, image_id in enumerate(image_ids)}
+        
+        matrix_time = time.perf_counter() - start
+        MetricsService.observe_stage("distance", matrix_time, model_name)
+        comparisons = []
+        
+        for i in range(len(images)):
+            for j in range(i + 1, len(images)):
+                RequestDeadline.expire_check("pair comparison")
+                if i in errors or j in errors:
+                    comparisons.append({
+                        "index1": i,
+                        "index2": j,
+                        "error": errors.get(i) or errors.get(j),
+                        "model": model_name
+                    })
+                    continue
+                
+                faces_i = np.flatnonzero(owners == i)
+                faces_j = np.flatnonzero(owners == j)
+                block = distances[np.ix_(faces_i, faces_j)]
+                best_i, best_j = np.unravel_index(np.argmin(block), block.shape)
+                
+                comparisons.append({
+                    "index1": i,
+                    "index2": j,
+                    "verified": bool(verified[position[i], position[j]]),
+                    "distance": float(image_distances[position[i], position[j]]),
+                    "threshold": threshold,
+                    "model": model_name,
+                    "similarity_metric": distance_metric,
+                    "detector_backend": DEFAULT_DETECTOR_BACKEND,
+                    "facial_areas": {
+                        "img1": facial_areas[faces_i[best_i]],
+                        "img2": facial_areas[faces_j[best_j]]
+                    },
+                    "time": round(embed_time + matrix_time, 2)
+                })
+        
+        # Distances and pair selection cover the whole request, not one image
+        RequestTimings.record("postprocess", time.perf_counter() - start)
+        return comparisons
+    
     @staticmethod
     def calculate_embeddings_summary(results: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
@@ -281,9 +782,9 @@ class FaceService:
         embedding_dimensions = 0
         for result in results:
             if "error" not in result and result.get("embeddings"):
-                first_embedding = result["embeddings"][0]
-                if first_embedding.get("embedding"):
-                    embedding_dimensions = len(first_embedding["embedding"])
+                first_embedding = result["embeddings"][0].get("embedding")
+                if first_embedding is not None and len(first_embedding):
+                    embedding_dimensions = len(first_embedding)
                     break
         
         return {
@@ -3,15 +3,21 @@ File handling service for Face Matching API
 Contains file upload and processing business logic
 """
 
+import time
 import logging
-from typing import List, Tuple
+from typing import List, Optional, Tuple, Union
+import numpy as np
 from fastapi import UploadFile, HTTPException
 
 from utils import (
-    validate_image, save_temp_image, 
+    validate_image, decode_image, save_temp_image, cleanup_temp_files,
     validate_content_type, generate_temp_filename
 )
-from config import SUPPORTED_CONTENT_TYPE
+from config import SUPPORTED_CONTENT_TYPE, IN_MEMORY_IMAGES
+from services.cache_service import CacheService
+from services.inference_executor import InferenceExecutor
+from services.metrics_service import MetricsService
+from services.timing_service import RequestTimings
 
 logger = logging.getLogger(__name__)
 
@@ -22,21 +28,24 @@ class FileService:
     async def process_uploaded_files(
         files: List[UploadFile], 
         file_prefix: str
-    ) -> List[str]:
+    ) -> List[Union[np.ndarray, str]]:
         """
-        Process uploaded files and save them temporarily
+        Process uploaded files into images ready for DeepFace
+        
+        Images are decoded in memory into BGR arrays. Temporary files are
+        only written when IN_MEMORY_IMAGES is disabled.
         
         Args:
             files: List of uploaded files
-            file_prefix: Prefix for temporary filenames
+            file_prefix: Prefix for temporary filenames (fallback mode only)
             
         Returns:
-            List of temporary file paths
+            List of decoded image arrays, or temporary file paths in fallback mode
             
         Raises:
             HTTPException: If file validation fails
         """
-        temp_files = []
+        images = []
         
         try:
             for i, file in enumerate(files):
@@ -48,29 +57,94 @@ class FileService:
                     )
                 
                 # Read file content
-                content = await file.read()
+                with MetricsService.time_stage("upload_read"):
+                    content = await file.read()
                 
-                # Validate image content
-                if not validate_image(content):
-                    raise HTTPException(
-                        status_code=400, 
-                        detail=f"File {file.filename} is not a valid image"
-                    )
-                
-                # Save to temporary file
-                temp_path = save_temp_image(
-                    content, 
-                    generate_temp_filename(file_prefix, i, file.filename)
-                )
-                temp_files.append(temp_path)
+                if IN_MEMORY_IMAGES:
+                    # Validate and decode in one pass, off the event loop
+                    image = await FileService.decode_upload(content, file.filename, i)
+                    images.append(image)
+                else:
+                    # Validate image content (DeepFace decodes the saved file later)
+                    with MetricsService.time_stage("validate"), RequestTimings.stage("decode", i):
+                        valid = validate_image(content)
+                    if not valid:
+                        raise HTTPException(
+                            status_code=400, 
+                            detail=f"File {file.filename} is not a valid image"
+                        )
+                    
+                    # Fallback: save to temporary file
+                    with MetricsService.time_stage("temp_write"):
+                        temp_path = save_temp_image(
+                            content, 
+                            generate_temp_filename(file_prefix, i, file.filename)
+                        )
+                    images.append(temp_path)
                 
         except Exception as e:
             # If an error occurs, we should clean up any files that were already created
-            from utils import cleanup_temp_files
-            cleanup_temp_files(temp_files)
+            FileService.cleanup_images(images)
             raise e
             
-        return temp_files
+        return images
+    
+    @staticmethod
+    def _decode_keyed(content: bytes, filename: str, image_index: Optional[int]) -> np.ndarray:
+        """Decode an upload on an executor thread, timing only the decode itself"""
+        start = time.perf_counter()
+        image = decode_image(content)
+        decode_time = time.perf_counter() - start
+        RequestTimings.record("decode", decode_time, image_index)
+        logger.debug(
+            f"Decoded {filename} ({image.shape[1]}x{image.shape[0]}, "
+            f"{len(content) / 1024:.1f} KB) in {decode_time * 1000:.1f} ms"
+        )
+        # Key result cache entries by the uploaded bytes rather than the pixels
+        CacheService.register_upload(image, content)
+        return image
+    
+    @staticmethod
+    async def decode_upload(content: bytes, filename: str, image_index: Optional[int] = None) -> np.ndarray:
+        """
+        Decode a single upload into the array used for inference
+        
+        The decode time is recorded as the "decode" stage (metrics and request
+        timings) from the executor thread, so executor queueing is not counted.
+        
+        Args:
+            content: Bytes content of the uploaded file
+            filename: Original filename, used in errors and logs
+            image_index: Index of the image in the request, for request timings
+            
+        Returns:
+            Decoded BGR image array
+            
+        Raises:
+            HTTPException: If the content is not a valid image
+        """
+        try:
+            return await InferenceExecutor.run(
+                FileService._decode_keyed, content, filename, image_index, stage="decode"
+            )
+        except ValueError:
+            raise HTTPException(
+                status_code=400, 
+                detail=f"File {filename} is not a valid image"
+            )
+    
+    @staticmethod
+    def cleanup_images(images: List[Union[np.ndarray, str]]) -> None:
+        """
+        Release processed images, removing any temporary files
+        
+        Args:
+            images: Images returned by process_uploaded_files
+        """
+        temp_paths = [image for image in images if isinstance(image, str)]
+        if temp_paths:
+            with MetricsService.time_stage("temp_cleanup"):
+                cleanup_temp_files(temp_paths)
     
     @staticmethod
     def validate_file_types(files: List[UploadFile]) -> List[str]:
@@ -0,0 +1,449 @@
+"""
+Gallery service for Face Matching API
+Keeps enrolled identity embeddings in memory for 1:N identification
+"""
+
+import time
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from config import GALLERY_INDEX, EMBEDDING_STORE_DIR, EMBEDDING_STORE_DTYPE
+from services.embedding_index import EmbeddingIndex, create_index
+from services.embedding_store import EmbeddingStore
+
+logger = logging.getLogger(__name__)
+
+# Candidate rows inspected per requested identity before falling back to a full sort
+_CANDIDATES_PER_IDENTITY = 8
+
+def l2_normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """
+    L2-normalize each row of a matrix as float32
+
+    Args:
+        vectors: Matrix with one embedding per row
+
+    Returns:
+        Float32 matrix whose rows have unit length (zero rows are left as is)
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+class ModelGallery:
+    """Enrolled embeddings for a single face recognition model"""
+
+    def __init__(self, model_name: str, index_type: str = GALLERY_INDEX):
+        self.model_name = model_name
+        self.index_type = index_type
+        self._lock = threading.Lock()
+        self._index: Optional[EmbeddingIndex] = None
+        # Identity label and source filename of each embedding id (label -1 once removed)
+        self._labels = np.empty(0, dtype=np.int32)
+        self._filenames: List[str] = []
+        self._next_id = 0
+        self._identities: List[str] = []
+        self._identity_index: Dict[str, int] = {}
+        self._identity_counts: Dict[int, int] = {}
+
+    @property
+    def dimensions(self) -> int:
+        """Embedding dimensions of this gallery (0 before the first enrollment)"""
+        return self._index.dimensions if self._index is not None else 0
+
+    def add(self, identity: str, embeddings: np.ndarray, filenames: List[str]) -> int:
+        """
+        Enroll embeddings for an identity
+
+        Args:
+            identity: Identity label
+            embeddings: Matrix with one embedding per row
+            filenames: Source filename of each embedding
+
+        Returns:
+            Number of embeddings stored for the identity after enrollment
+        """
+        vectors = l2_normalize_rows(np.atleast_2d(embeddings))
+        count = vectors.shape[0]
+
+        with self._lock:
+            if self._index is None:
+                self._index = create_index(self.index_type, vectors.shape[1])
+            elif vectors.shape[1] != self.dimensions:
+                raise ValueError(
+                    f"{self.model_name} gallery expects {self.dimensions}-d embeddings, "
+                    f"got {vectors.shape[1]}-d"
+                )
+
+            label = self._identity_index.get(identity)
+            if label is None:
+                label = len(self._identities)
+                self._identities.append(identity)
+                self._identity_index[identity] = label
+
+            ids = np.arange(self._next_id, self._next_id + count, dtype=np.int64)
+            if self._next_id + count > self._labels.shape[0]:
+                # Grow capacity geometrically so enrollment is amortized O(1) per row
+                grown = np.full(max(self._next_id + count, 2 * self._labels.shape[0], 1024), -1, dtype=np.int32)
+                grown[:self._next_id] = self._labels[:self._next_id]
+                self._labels = grown
+            self._labels[ids] = label
+            self._filenames.extend(filenames)
+            self._next_id += count
+
+            self._index.add(ids, vectors)
+            self._identity_counts[label] = self._identity_counts.get(label, 0) + count
+            return self._identity_counts[label]
+
+    def load(self, vectors: np.ndarray, identities: List[str], filenames: List[str], live: np.ndarray) -> int:
+        """
+        Populate an empty gallery from embedding store rows
+
+        Args:
+            vectors: Memory-mapped L2-normalized embeddings, one per row
+            identities: Identity label of each row
+            filenames: Source filename of each row
+            live: Boolean mask of rows that were not removed
+
+        Returns:
+            Number of live embeddings loaded
+        """
+        rows = len(identities)
+        with self._lock:
+            if self._next_id:
+                raise ValueError(f"{self.model_name} gallery is not empty")
+            self._index = create_index(self.index_type, vectors.shape[1])
+
+            names, labels = np.unique(np.asarray(identities, dtype=object)[live], return_inverse=True)
+            self._identities = names.tolist()
+            self._identity_index = {name: label for label, name in enumerate(self._identities)}
+            self._identity_counts = dict(enumerate(np.bincount(labels, minlength=len(names)).tolist()))
+
+            self._labels = np.full(max(rows, 1024), -1, dtype=np.int32)
+            self._labels[:rows][live] = labels
+            self._filenames = list(filenames)
+            self._next_id = rows
+
+        # Store row numbers double as embedding ids
+        self._index.add_mapped(np.arange(rows, dtype=np.int64), vectors, live)
+        return int(np.count_nonzero(live))
+
+    def remove(self, identity: str, before: Optional[int] = None) -> int:
+        """
+        Remove every embedding of an identity
+
+        Args:
+            identity: Identity label
+            before: Only remove embeddings with smaller ids (store rows written before the removal)
+
+        Returns:
+            Number of embeddings removed
+        """
+        with self._lock:
+            label = self._identity_index.get(identity)
+            if label is None:
+                return 0
+
+            end = self._next_id if before is None else min(before, self._next_id)
+            ids = np.flatnonzero(self._labels[:end] == label).astype(np.int64)
+            removed = self._index.remove(ids)
+            self._labels[ids] = -1
+            remaining = self._identity_counts.get(label, 0) - len(ids)
+            if remaining > 0:
+                self._identity_counts[label] = remaining
+            else:
+                self._identity_counts.pop(label, None)
+                self._identity_index.pop(identity, None)
+            return removed
+
+    def count(self, identity: str) -> int:
+        """Number of embeddings enrolled for an identity"""
+        with self._lock:
+            label = self._identity_index.get(identity)
+            return self._identity_counts.get(label, 0) if label is not None else 0
+
+    def search(self, queries: np.ndarray, top_k: int) -> List[List[Dict[str, Any]]]:
+        """
+        Find the closest identities for each query embedding
+
+        Args:
+            queries: Matrix with one query embedding per row
+            top_k: Maximum number of identities to return per query
+
+        Returns:
+            For each query, up to top_k matches ordered by cosine distance, one per identity
+        """
+        queries = l2_normalize_rows(np.atleast_2d(queries))
+        with self._lock:
+            index = self._index
+            identity_count = len(self._identity_index)
+        if index is None or len(index) == 0:
+            return [[] for _ in range(queries.shape[0])]
+        if queries.shape[1] != index.dimensions:
+            raise ValueError(
+                f"{self.model_name} gallery expects {index.dimensions}-d embeddings, "
+                f"got {queries.shape[1]}-d"
+            )
+
+        top_k = min(top_k, identity_count)
+        candidates = min(len(index), top_k * _CANDIDATES_PER_IDENTITY)
+        ids, similarities = index.search(queries, candidates)
+
+        results = []
+        for row in range(queries.shape[0]):
+            matches = self._top_identities(ids[row], similarities[row], top_k)
+            if len(matches) < top_k and candidates < len(index):
+                # Many embeddings of the same identities crowded the candidates out
+                full_ids, full_similarities = index.search(queries[row:row + 1], len(index))
+                matches = self._top_identities(full_ids[0], full_similarities[0], top_k)
+            results.append(matches)
+        return results
+
+    def _top_identities(self, ids: np.ndarray, similarities: np.ndarray, top_k: int) -> List[Dict[str, Any]]:
+        """Keep the best-scoring embedding of each identity, up to top_k identities"""
+        # Labels are only grown by reallocation or tombstoned with -1, so this read is safe
+        labels = self._labels
+        matches, seen = [], set()
+
+        # float32 rounding can push unit-vector similarities just past +-1
+        similarities = np.clip(similarities, -1.0, 1.0)
+        for vector_id, similarity in zip(ids.tolist(), similarities.tolist()):
+            if vector_id < 0:
+                break
+            label = int(labels[vector_id])
+            if label < 0 or label in seen:
+                continue
+            seen.add(label)
+            matches.append({
+                "identity": self._identities[label],
+                "distance": 1.0 - similarity,
+                "similarity": similarity,
+                "filename": self._filenames[vector_id]
+            })
+            if len(matches) == top_k:
+                break
+
+        return matches
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Report gallery size and index details"""
+        with self._lock:
+            return {
+                "model": self.model_name,
+                "identities": len(self._identity_index),
+                "embeddings": len(self._index) if self._index is not None else 0,
+                "embedding_dimensions": self.dimensions,
+                "index": self._index.get_stats() if self._index is not None else None
+            }
+
+class GalleryService:
+    """
+    Service class managing per-model identity galleries
+
+    With an embedding store, the store is the source of truth: enrollments and
+    removals are written to it and applied to the in-memory galleries by
+    reading the store back, so every pre-fork worker (and restarted server)
+    ends up with the same galleries and embedding ids equal to store rows.
+    """
+
+    _lock = threading.Lock()
+    # Serializes reading the stores and applying their changes to the galleries
+    _sync_lock = threading.Lock()
+    _galleries: Dict[str, ModelGallery] = {}
+    _stores: Dict[str, EmbeddingStore] = {}
+
+    @classmethod
+    def get_gallery(cls, model_name: str) -> ModelGallery:
+        """
+        Get the gallery of a model, creating it on first use
+
+        Args:
+            model_name: Name of the face recognition model
+
+        Returns:
+            ModelGallery holding that model's embeddings
+        """
+        with cls._lock:
+            gallery = cls._galleries.get(model_name)
+            if gallery is None:
+                gallery = ModelGallery(model_name)
+                cls._galleries[model_name] = gallery
+            return gallery
+
+    @classmethod
+    def _get_store(cls, model_name: str, dimensions: int) -> Optional[EmbeddingStore]:
+        """Get the embedding store of a model (None when persistence is disabled)"""
+        if not EMBEDDING_STORE_DIR:
+            return None
+        with cls._lock:
+            store = cls._stores.get(model_name)
+            if store is None:
+                store = EmbeddingStore.open(EMBEDDING_STORE_DIR, model_name, dimensions, EMBEDDING_STORE_DTYPE)
+                cls._stores[model_name] = store
+            return store
+
+    @classmethod
+    def _find_stores(cls, model_name: Optional[str] = None) -> List[EmbeddingStore]:
+        """Stores of every model (or one), including those created by other processes since startup"""
+        if not EMBEDDING_STORE_DIR:
+            return []
+        with cls._lock:
+            known = model_name is not None and model_name in cls._stores
+        if not known:
+            for store in EmbeddingStore.list_stores(EMBEDDING_STORE_DIR):
+                with cls._lock:
+                    cls._stores.setdefault(store.model_name, store)
+        with cls._lock:
+            return [store for name, store in cls._stores.items() if model_name in (None, name)]
+
+    @classmethod
+    def _sync(cls, store: EmbeddingStore) -> Dict[str, int]:
+        """
+        Apply the enrollments and removals committed to a store since this process last read it
+
+        Args:
+            store: Embedding store of one model
+
+        Returns:
+            Number of embeddings removed per identity
+        """
+        removed: Dict[str, int] = {}
+        with cls._sync_lock:
+            vectors, identities, filenames, tombstones, first_row = store.tail()
+            if not identities and not tombstones:
+                return removed
+
+            gallery = cls.get_gallery(store.model_name)
+            applied = 0
+            # Rows written before each removal are added first, so it applies to exactly those rows
+            for identity, before_row in tombstones + [(None, first_row + len(identities))]:
+                end = min(max(before_row - first_row, applied), len(identities))
+                while applied < end:
+                    # Consecutive rows of one identity come from one enrollment
+                    run = applied + 1
+                    while run < end and identities[run] == identities[applied]:
+                        run += 1
+                    gallery.add(identities[applied], vectors[applied:run], filenames[applied:run])
+                    applied = run
+                if identity is not None:
+                    removed[identity] = removed.get(identity, 0) + gallery.remove(identity, before_row)
+        return removed
+
+    @classmethod
+    def load_store(cls) -> None:
+        """Memory-map every persisted model gallery from EMBEDDING_STORE_DIR"""
+        if not EMBEDDING_STORE_DIR:
+            return
+
+        for store in EmbeddingStore.list_stores(EMBEDDING_STORE_DIR):
+            start = time.perf_counter()
+            try:
+                vectors, identities, filenames, live = store.load()
+                loaded = cls.get_gallery(store.model_name).load(vectors, identities, filenames, live)
+                with cls._lock:
+                    cls._stores[store.model_name] = store
+                logger.info(
+                    f"Loaded {loaded} embedding(s) into {store.model_name} gallery "
+                    f"in {time.perf_counter() - start:.2f}s"
+                )
+            except Exception as e:
+                logger.error(f"Failed to load {store.model_name} embedding store: {e}")
+
+    @classmethod
+    def enroll(cls, model_name: str, identity: str, embeddings: List[List[float]], filenames: List[str]) -> int:
+        """
+        Enroll identity embeddings produced by FaceService.extract_face_embeddings
+
+        Args:
+            model_name: Model that produced the embeddings
+            identity: Identity label
+            embeddings: Embedding vectors to enroll
+            filenames: Source filename of each embedding
+
+        Returns:
+            Number of embeddings stored for the identity
+        """
+        vectors = l2_normalize_rows(np.atleast_2d(np.asarray(embeddings)))
+
+        store = cls._get_store(model_name, vectors.shape[1])
+        if store is None:
+            stored = cls.get_gallery(model_name).add(identity, vectors, filenames)
+        else:
+            # Persist before exposing the embeddings so an acknowledged enrollment survives a restart
+            store.append(identity, vectors, filenames)
+            cls._sync(store)
+            stored = cls.get_gallery(model_name).count(identity)
+        logger.info(f"Enrolled {len(embeddings)} embedding(s) for {identity} in {model_name} gallery")
+        return stored
+
+    @classmethod
+    def remove_identity(cls, identity: str, model_name: Optional[str] = None) -> int:
+        """
+        Remove an identity from one model gallery or from all of them
+
+        Args:
+            identity: Identity label
+            model_name: Model gallery to remove from (all galleries if None)
+
+        Returns:
+            Number of embeddings removed
+        """
+        if EMBEDDING_STORE_DIR:
+            total = 0
+            for store in cls._find_stores(model_name):
+                cls._sync(store)
+                if cls.get_gallery(store.model_name).count(identity):
+                    store.remove(identity)
+                    total += cls._sync(store).get(identity, 0)
+            return total
+
+        with cls._lock:
+            galleries = [
+                gallery for name, gallery in cls._galleries.items()
+                if model_name is None or name == model_name
+            ]
+
+        return sum(gallery.remove(identity) for gallery in galleries)
+
+    @classmethod
+    def identify(cls, model_name: str, embeddings: List[List[float]], top_k: int) -> List[List[Dict[str, Any]]]:
+        """
+        Find the closest enrolled identities for query embeddings
+
+        Args:
+            model_name: Model that produced the query embeddings
+            embeddings: Query embedding vectors
+            top_k: Maximum number of identities per query
+
+        Returns:
+            For each query embedding, matches ordered by cosine distance
+        """
+        # Pick up enrollments made by other workers
+        for store in cls._find_stores(model_name):
+            cls._sync(store)
+        return cls.get_gallery(model_name).search(np.asarray(embeddings), top_k)
+
+    @classmethod
+    def get_stats(cls) -> List[Dict[str, Any]]:
+        """
+        Report the size of every model gallery
+
+        Returns:
+            List of per-model gallery statistics
+        """
+        for store in cls._find_stores():
+            cls._sync(store)
+        with cls._lock:
+            galleries = list(cls._galleries.values())
+            stores = dict(cls._stores)
+
+        stats = []
+        for gallery in galleries:
+            gallery_stats = gallery.get_stats()
+            store = stores.get(gallery.model_name)
+            gallery_stats["store"] = store.get_stats() if store is not None else None
+            stats.append(gallery_stats)
+        return stats
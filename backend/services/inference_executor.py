@@ -0,0 +1,189 @@
+"""
+Inference executor for Face Matching API
+Runs blocking DeepFace inference on a shared, bounded thread pool
+"""
+
+import time
+import asyncio
+import functools
+import contextvars
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from config import INFERENCE_WORKERS, MODEL_CONCURRENCY
+from services.model_service import ModelService
+from services.metrics_service import MetricsService
+
+logger = logging.getLogger(__name__)
+
+# Pipeline stage recorded in metrics for calls using a model of each task
+_TASK_STAGES = {
+    "face_detector": "detection",
+    "facial_recognition": "embedding",
+    "facial_attribute": "attributes",
+    "spoofing": "anti_spoofing"
+}
+
+class InferenceExecutor:
+    """Shared thread pool keeping model inference off the event loop"""
+
+    _lock = threading.Lock()
+    _executor: Optional[ThreadPoolExecutor] = None
+    _model_slots: Dict[str, asyncio.Semaphore] = {}
+    _slots_loop: Optional[asyncio.AbstractEventLoop] = None
+    _queued = 0
+
+    @classmethod
+    def get_executor(cls) -> ThreadPoolExecutor:
+        """
+        Get the shared inference thread pool, creating it on first use
+
+        Returns:
+            ThreadPoolExecutor bounded to INFERENCE_WORKERS threads
+        """
+        with cls._lock:
+            if cls._executor is None:
+                cls._executor = ThreadPoolExecutor(
+                    max_workers=INFERENCE_WORKERS,
+                    thread_name_prefix="inference"
+                )
+                logger.info(f"Started inference executor with {INFERENCE_WORKERS} workers")
+            return cls._executor
+
+    @classmethod
+    def _model_slot(cls, model_key: str) -> asyncio.Semaphore:
+        """Get the semaphore limiting concurrent use of a single model"""
+        loop = asyncio.get_running_loop()
+        if cls._slots_loop is not loop:
+            # Semaphores belong to one event loop; a new loop starts with fresh slots
+            cls._slots_loop, cls._model_slots = loop, {}
+        slot = cls._model_slots.get(model_key)
+        if slot is None:
+            slot = cls._model_slots[model_key] = asyncio.Semaphore(MODEL_CONCURRENCY)
+        return slot
+
+    @classmethod
+    async def _acquire_slots(cls, model_keys: Sequence[str]) -> List[asyncio.Semaphore]:
+        """Wait on the event loop for a slot of every model, so waiting calls hold no executor thread"""
+        acquired = []
+        try:
+            # Acquire in sorted order so callers sharing models cannot deadlock
+            for model_key in sorted(set(model_keys)):
+                slot = cls._model_slot(model_key)
+                await slot.acquire()
+                acquired.append(slot)
+        except BaseException:
+            for slot in acquired:
+                slot.release()
+            raise
+        return acquired
+
+    @staticmethod
+    async def _reserve_memory(model_keys: Sequence[str]) -> None:
+        """Reserve model memory on the default executor, as it may wait for other calls to finish"""
+        if not model_keys:
+            return
+        future = asyncio.get_running_loop().run_in_executor(None, ModelService.acquire_models, model_keys)
+        try:
+            await asyncio.shield(future)
+        except asyncio.CancelledError:
+            # The reservation still completes; hand it back once it does
+            def release(done: asyncio.Future) -> None:
+                if not done.cancelled() and done.exception() is None:
+                    ModelService.release_models(model_keys)
+            future.add_done_callback(release)
+            raise
+
+    @classmethod
+    def _run_reserved(
+        cls, model_keys: Sequence[str], stage: str, submitted: float,
+        func: Callable[..., Any], args: tuple, kwargs: dict
+    ) -> Any:
+        """Run a callable whose model slots and memory are already held"""
+        with cls._lock:
+            cls._queued -= 1
+        model = model_keys[0].split("/", 1)[-1] if model_keys else ""
+        start = time.perf_counter()
+        MetricsService.observe_executor_wait(stage, start - submitted)
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            MetricsService.count_stage_error(stage, model)
+            raise
+        finally:
+            MetricsService.observe_stage(stage, time.perf_counter() - start, model)
+
+    @classmethod
+    async def run(
+        cls, func: Callable[..., Any], *args: Any,
+        model_keys: Sequence[str] = (), stage: Optional[str] = None, **kwargs: Any
+    ) -> Any:
+        """
+        Run a blocking callable on the inference executor
+
+        Model slots and memory are acquired before the call is submitted, so
+        executor threads only pick up calls that can run straight away.
+
+        Args:
+            func: Blocking callable to run
+            *args: Positional arguments for the callable
+            model_keys: Model identifiers ("task/name") the callable uses
+            stage: Pipeline stage for metrics (default: derived from the first model's task)
+            **kwargs: Keyword arguments for the callable
+
+        Returns:
+            The callable's return value
+        """
+        if stage is None:
+            stage = _TASK_STAGES.get(model_keys[0].split("/", 1)[0], "other") if model_keys else "other"
+        model_keys = tuple(model_keys)
+        submitted = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        with cls._lock:
+            cls._queued += 1
+
+        slots: List[asyncio.Semaphore] = []
+        try:
+            slots = await cls._acquire_slots(model_keys)
+            # Evicted models are reloaded by DeepFace once their memory is reserved
+            await cls._reserve_memory(model_keys)
+            # Run in the caller's context so request-scoped state (timings) reaches the thread
+            context = contextvars.copy_context()
+            future = cls.get_executor().submit(
+                context.run,
+                functools.partial(cls._run_reserved, model_keys, stage, submitted, func, args, kwargs)
+            )
+        except BaseException:
+            with cls._lock:
+                cls._queued -= 1
+            for slot in slots:
+                slot.release()
+            raise
+
+        def release(done: Future) -> None:
+            # Runs when the call finishes, even if its caller was cancelled meanwhile
+            if done.cancelled():
+                with cls._lock:
+                    cls._queued -= 1
+            ModelService.release_models(model_keys)
+            if not loop.is_closed():
+                for slot in slots:
+                    loop.call_soon_threadsafe(slot.release)
+
+        future.add_done_callback(release)
+        return await asyncio.wrap_future(future)
+
+    @classmethod
+    def get_queue_depth(cls) -> int:
+        """Number of calls waiting for an executor thread"""
+        return cls._queued
+
+    @classmethod
+    def shutdown(cls) -> None:
+        """Shut down the inference thread pool, waiting for running jobs"""
+        with cls._lock:
+            executor, cls._executor = cls._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
@@ -0,0 +1,566 @@
+"""
+Job service for Face Matching API
+Bulk jobs over ZIP archives or server directories, run by local worker processes
+"""
+
+import os
+import json
+import fcntl
+import time
+import uuid
+import shutil
+import asyncio
+import logging
+import zipfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from typing import IO, Any, Dict, Iterator, List, Optional
+
+from fastapi import HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
+
+from config import (
+    JOBS_DIR, JOB_TASKS, JOB_WORKERS, SERVER_WORKERS, JOB_CHUNK_SIZE, JOB_MAX_IMAGES, JOB_MAX_ATTEMPTS,
+    JOB_INPUT_DIRS, SUPPORTED_IMAGE_TYPES
+)
+from services.job_worker import CHUNKS_DIR, chunk_path, write_json_atomic, init_worker, process_chunk
+
+logger = logging.getLogger(__name__)
+
+JOB_FILE = "job.json"
+IMAGES_FILE = "images.json"
+ARCHIVE_FILE = "input.zip"
+LOCK_FILE = ".lock"
+OWNERS_DIR = ".owners"
+
+# Statuses of jobs that still have chunks to process
+ACTIVE_STATUSES = ["queued", "running"]
+
+class JobService:
+    """
+    Creates bulk jobs and schedules their chunks on a process pool
+
+    Every job lives in its own directory under JOBS_DIR: the job definition,
+    the image list, the uploaded archive and one set of output files per
+    chunk. Progress is rebuilt from the chunk summaries, so jobs that were
+    queued or running when the server stopped resume on the next start.
+
+    Each job records the pid of the process running it, which holds a lock
+    file under JOBS_DIR/.owners for its lifetime. The kernel drops that lock
+    when the process dies, so a starting process takes over the active jobs
+    of owners that are gone, whether the whole server or one pre-fork worker
+    was restarted.
+    """
+
+    _executor: Optional[ProcessPoolExecutor] = None
+    _owner_lock: Optional[IO] = None
+    _jobs: Dict[str, Dict[str, Any]] = {}
+    _tasks: Dict[str, asyncio.Task] = {}
+
+    @classmethod
+    def _get_executor(cls) -> ProcessPoolExecutor:
+        """Create the worker pool on first use (spawned, never forked from the TensorFlow process)"""
+        if cls._executor is None:
+            cls._executor = ProcessPoolExecutor(
+                max_workers=JOB_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_worker
+            )
+        return cls._executor
+
+    @classmethod
+    def _reset_executor(cls) -> None:
+        """Drop a pool whose worker died so the next chunk starts a fresh one"""
+        if cls._executor is not None:
+            cls._executor.shutdown(wait=False, cancel_futures=True)
+            cls._executor = None
+
+    @staticmethod
+    def _job_dir(job_id: str) -> str:
+        return os.path.join(JOBS_DIR, job_id)
+
+    @staticmethod
+    def _owner_path(pid: int) -> str:
+        return os.path.join(JOBS_DIR, OWNERS_DIR, f"{pid}.lock")
+
+    @staticmethod
+    @contextmanager
+    def _locked() -> Iterator[None]:
+        """Serialize job claims across processes with an advisory file lock"""
+        os.makedirs(os.path.join(JOBS_DIR, OWNERS_DIR), exist_ok=True)
+        with open(os.path.join(JOBS_DIR, LOCK_FILE), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @classmethod
+    def _hold_owner_lock(cls) -> None:
+        """Lock this process's owner file until it exits (call under _locked)"""
+        if cls._owner_lock is None:
+            lock_file = open(cls._owner_path(os.getpid()), "a")
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            cls._owner_lock = lock_file
+
+    @classmethod
+    def _owner_alive(cls, pid: Optional[int]) -> bool:
+        """Whether another live process owns jobs under this pid (call under _locked)"""
+        if pid is None or pid == os.getpid():
+            # Nothing runs here yet, so a job owned by this pid belongs to a dead namesake
+            return False
+        path = cls._owner_path(pid)
+        try:
+            with open(path, "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                os.remove(path)
+                return False
+        except BlockingIOError:
+            return True
+
+    @classmethod
+    def _save(cls, job: Dict[str, Any]) -> None:
+        definition = {key: value for key, value in job.items() if key != "progress"}
+        write_json_atomic(os.path.join(cls._job_dir(job["id"]), JOB_FILE), definition)
+
+    @classmethod
+    def _set_status(cls, job: Dict[str, Any], status: str, error: Optional[str] = None) -> None:
+        job["status"] = status
+        job["error"] = error
+        if status not in ACTIVE_STATUSES:
+            job["finished_at"] = time.time()
+        cls._save(job)
+
+    @staticmethod
+    def _is_image(name: str) -> bool:
+        return os.path.splitext(name)[1].lower() in SUPPORTED_IMAGE_TYPES
+
+    @classmethod
+    def _list_archive(cls, archive_path: str) -> List[str]:
+        """List image members of a ZIP archive"""
+        try:
+            with zipfile.ZipFile(archive_path) as archive:
+                return sorted(
+                    info.filename for info in archive.infolist()
+                    if not info.is_dir() and not info.filename.startswith("__MACOSX/") and cls._is_image(info.filename)
+                )
+        except zipfile.BadZipFile:
+            raise HTTPException(status_code=400, detail="Archive is not a valid ZIP file")
+
+    @classmethod
+    def _list_directory(cls, directory: str, manifest: Optional[List[str]]) -> List[str]:
+        """List images of a directory, or validate a manifest of paths relative to it"""
+        if manifest is None:
+            names = []
+            for root, _, filenames in os.walk(directory):
+                names.extend(
+                    os.path.relpath(os.path.join(root, filename), directory)
+                    for filename in filenames if cls._is_image(filename)
+                )
+            return sorted(names)
+
+        names = []
+        for line in manifest:
+            name = line.strip()
+            if not name:
+                continue
+            path = os.path.realpath(os.path.join(directory, name))
+            if os.path.commonpath([path, directory]) != directory:
+                raise HTTPException(status_code=400, detail=f"Manifest path {name} is outside the job directory")
+            if not os.path.isfile(path):
+                raise HTTPException(status_code=400, detail=f"Manifest path {name} does not exist")
+            names.append(os.path.relpath(path, directory))
+        return names
+
+    @staticmethod
+    def _resolve_input_dir(directory: str) -> str:
+        """Resolve a job directory, which must lie within one of JOB_INPUT_DIRS"""
+        if not JOB_INPUT_DIRS:
+            raise HTTPException(status_code=400, detail="Directory jobs are disabled (set JOB_INPUT_DIRS)")
+        path = os.path.realpath(directory)
+        for root in JOB_INPUT_DIRS:
+            root = os.path.realpath(root)
+            if os.path.commonpath([path, root]) == root:
+                if not os.path.isdir(path):
+                    raise HTTPException(status_code=400, detail=f"Directory {directory} does not exist")
+                return path
+        raise HTTPException(status_code=400, detail=f"Directory {directory} is outside JOB_INPUT_DIRS")
+
+    @classmethod
+    async def create_job(
+        cls,
+        tasks: List[str],
+        model: str,
+        actions: List[str],
+        archive: Optional[UploadFile] = None,
+        directory: Optional[str] = None,
+        manifest: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Create a job from a ZIP archive or a server directory and queue it
+
+        Args:
+            tasks: Outputs to produce (subset of JOB_TASKS)
+            model: Face recognition model for embeddings
+            actions: Attributes to analyze
+            archive: Uploaded ZIP archive of images
+            directory: Server directory of images (within JOB_INPUT_DIRS)
+            manifest: Image paths relative to the directory (default: every image in it)
+
+        Returns:
+            Job status, see get_job
+        """
+        job_id = uuid.uuid4().hex
+        job_dir = cls._job_dir(job_id)
+        os.makedirs(os.path.join(job_dir, CHUNKS_DIR))
+
+        try:
+            if archive is not None:
+                archive_path = os.path.abspath(os.path.join(job_dir, ARCHIVE_FILE))
+                # The upload is already spooled by the server; copy it without loading it in memory
+                def save_archive() -> None:
+                    with open(archive_path, "wb") as f:
+                        shutil.copyfileobj(archive.file, f, 1024 * 1024)
+                await run_in_threadpool(save_archive)
+                source = {"type": "zip", "path": archive_path, "filename": archive.filename}
+                names = await run_in_threadpool(cls._list_archive, archive_path)
+            else:
+                path = cls._resolve_input_dir(directory)
+                source = {"type": "directory", "path": path}
+                names = await run_in_threadpool(cls._list_directory, path, manifest)
+
+            if not names:
+                raise HTTPException(status_code=400, detail="No supported images found")
+            if len(names) > JOB_MAX_IMAGES:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Job has {len(names)} images, the maximum is {JOB_MAX_IMAGES}"
+                )
+
+            write_json_atomic(os.path.join(job_dir, IMAGES_FILE), names)
+            job = {
+                "id": job_id,
+                "status": "queued",
+                "error": None,
+                "source": source,
+                "tasks": tasks,
+                "model": model,
+                "actions": actions,
+                "total_images": len(names),
+                "chunk_size": JOB_CHUNK_SIZE,
+                "chunks": -(-len(names) // JOB_CHUNK_SIZE),
+                "created_at": time.time(),
+                "finished_at": None,
+                "owner": os.getpid()
+            }
+            with cls._locked():
+                cls._hold_owner_lock()
+            cls._save(job)
+        except Exception:
+            shutil.rmtree(job_dir, ignore_errors=True)
+            raise
+
+        job["progress"] = {"chunks": {}, "started_at": None, "started_images": 0}
+        cls._jobs[job_id] = job
+        cls._tasks[job_id] = asyncio.get_running_loop().create_task(cls._run_job(job, names))
+        logger.info(f"Queued job {job_id}: {len(names)} image(s), tasks {tasks}")
+        return cls.get_job(job_id)
+
+    @classmethod
+    async def _run_job(cls, job: Dict[str, Any], names: List[str]) -> None:
+        """Submit the job's unfinished chunks to the worker pool and track their completion"""
+        loop = asyncio.get_running_loop()
+        job_dir = cls._job_dir(job["id"])
+        progress = job["progress"]
+        definition = {key: job[key] for key in ("source", "tasks", "model", "actions", "chunk_size")}
+        pending = [index for index in range(job["chunks"]) if index not in progress["chunks"]]
+        attempts: Dict[int, int] = {}
+        in_flight: Dict[asyncio.Future, int] = {}
+
+        def submit(index: int) -> None:
+            start = index * job["chunk_size"]
+            future = loop.run_in_executor(
+                cls._get_executor(), process_chunk,
+                job_dir, definition, index, names[start:start + job["chunk_size"]]
+            )
+            in_flight[future] = index
+            attempts[index] = attempts.get(index, 0) + 1
+
+        try:
+            cls._set_status(job, "running")
+            progress["started_at"] = time.time()
+            progress["started_images"] = sum(summary["images"] for summary in progress["chunks"].values())
+
+            while pending or in_flight:
+                # Keep every worker busy plus one chunk queued behind each
+                while pending and len(in_flight) < 2 * JOB_WORKERS:
+                    submit(pending.pop(0))
+
+                done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    index = in_flight.pop(future)
+                    try:
+                        progress["chunks"][index] = future.result()
+                    except Exception as e:
+                        if isinstance(e, BrokenProcessPool):
+                            cls._reset_executor()
+                        if attempts[index] >= JOB_MAX_ATTEMPTS:
+                            raise RuntimeError(f"Chunk {index} failed after {attempts[index]} attempt(s): {e}") from e
+                        logger.warning(f"Retrying chunk {index} of job {job['id']}: {e}")
+                        pending.insert(0, index)
+
+            cls._set_status(job, "completed")
+            logger.info(f"Job {job['id']} completed")
+
+        except asyncio.CancelledError:
+            for future in in_flight:
+                future.cancel()
+            raise
+
+        except Exception as e:
+            for future in in_flight:
+                future.cancel()
+            logger.error(f"Job {job['id']} failed: {e}")
+            cls._set_status(job, "failed", str(e))
+
+        finally:
+            cls._tasks.pop(job["id"], None)
+
+    @classmethod
+    def _load(cls, job_id: str) -> Dict[str, Any]:
+        """Read a job definition and the summaries of its finished chunks from JOBS_DIR"""
+        job_dir = cls._job_dir(job_id)
+        with open(os.path.join(job_dir, JOB_FILE)) as f:
+            job = json.load(f)
+        chunks = {}
+        for index in range(job["chunks"]):
+            path = chunk_path(job_dir, index, "json")
+            if os.path.exists(path):
+                with open(path) as f:
+                    chunks[index] = json.load(f)
+        job["progress"] = {"chunks": chunks, "started_at": None, "started_images": 0}
+        return job
+
+    @staticmethod
+    def _list_job_ids() -> List[str]:
+        """Job directories under JOBS_DIR, without the lock and owner files"""
+        if not os.path.isdir(JOBS_DIR):
+            return []
+        return sorted(name for name in os.listdir(JOBS_DIR) if not name.startswith("."))
+
+    @classmethod
+    def resume(cls) -> None:
+        """Load jobs from JOBS_DIR and take over queued or running jobs whose owner is gone"""
+        if not os.path.isdir(JOBS_DIR):
+            return
+
+        loop = asyncio.get_running_loop()
+        with cls._locked():
+            cls._hold_owner_lock()
+            for job_id in cls._list_job_ids():
+                try:
+                    job = cls._load(job_id)
+                    if job["status"] not in ACTIVE_STATUSES:
+                        cls._jobs[job_id] = job
+                        continue
+                    if cls._owner_alive(job.get("owner")):
+                        # Still running in another pre-fork worker
+                        continue
+
+                    with open(os.path.join(cls._job_dir(job_id), IMAGES_FILE)) as f:
+                        names = json.load(f)
+                    previous = job.get("owner")
+                    job["owner"] = os.getpid()
+                    cls._save(job)
+                    cls._jobs[job_id] = job
+                    cls._tasks[job_id] = loop.create_task(cls._run_job(job, names))
+                    done = len(job["progress"]["chunks"])
+                    logger.info(
+                        f"Resuming job {job_id} of process {previous}: "
+                        f"{done}/{job['chunks']} chunk(s) already done"
+                    )
+                except Exception as e:
+                    logger.error(f"Failed to load job {job_id}: {e}")
+
+    @classmethod
+    def _find(cls, job_id: str) -> Dict[str, Any]:
+        job = cls._jobs.get(job_id)
+        if job is None:
+            # Jobs created by another pre-fork worker are only on disk here
+            if SERVER_WORKERS > 1 and job_id.isalnum():
+                try:
+                    return cls._load(job_id)
+                except (OSError, ValueError, KeyError):
+                    pass
+            raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+        return job
+
+    @classmethod
+    def get_job(cls, job_id: str) -> Dict[str, Any]:
+        """
+        Get the status and progress of a job
+
+        Args:
+            job_id: Job identifier
+
+        Returns:
+            Job definition with image, face and failure counts, rate and ETA
+        """
+        return cls._status(cls._find(job_id))
+
+    @staticmethod
+    def _status(job: Dict[str, Any]) -> Dict[str, Any]:
+        progress = job["progress"]
+        summaries = progress["chunks"].values()
+        processed = sum(summary["images"] for summary in summaries)
+
+        images_per_second = None
+        eta_seconds = None
+        if job["status"] == "running" and progress["started_at"] is not None:
+            elapsed = time.time() - progress["started_at"]
+            done_since_start = processed - progress["started_images"]
+            if done_since_start > 0 and elapsed > 0:
+                images_per_second = round(done_since_start / elapsed, 2)
+                eta_seconds = round((job["total_images"] - processed) / images_per_second, 1)
+
+        return {
+            "id": job["id"],
+            "status": job["status"],
+            "error": job["error"],
+            "source": job["source"]["type"],
+            "tasks": job["tasks"],
+            "model": job["model"],
+            "actions": job["actions"],
+            "total_images": job["total_images"],
+            "processed_images": processed,
+            "failed_images": sum(summary["failed"] for summary in summaries),
+            "faces": sum(summary["faces"] for summary in summaries),
+            "chunks": job["chunks"],
+            "completed_chunks": len(progress["chunks"]),
+            "progress": round(100 * processed / max(job["total_images"], 1), 1),
+            "images_per_second": images_per_second,
+            "eta_seconds": eta_seconds,
+            "created_at": job["created_at"],
+            "finished_at": job["finished_at"]
+        }
+
+    @classmethod
+    def list_jobs(cls) -> List[Dict[str, Any]]:
+        """List every job, newest first"""
+        jobs = dict(cls._jobs)
+        if SERVER_WORKERS > 1:
+            for job_id in cls._list_job_ids():
+                if job_id not in jobs:
+                    try:
+                        jobs[job_id] = cls._load(job_id)
+                    except (OSError, ValueError, KeyError):
+                        pass
+        ordered = sorted(jobs.values(), key=lambda job: job["created_at"], reverse=True)
+        return [cls._status(job) for job in ordered]
+
+    @classmethod
+    def get_results(cls, job_id: str, offset: int, limit: int) -> Dict[str, Any]:
+        """
+        Read per-image records of finished chunks, including those of running jobs
+
+        Args:
+            job_id: Job identifier
+            offset: Index of the first image
+            limit: Maximum number of images
+
+        Returns:
+            Records in image order and whether every image in the range is done
+        """
+        job = cls._find(job_id)
+        job_dir = cls._job_dir(job_id)
+        chunk_size = job["chunk_size"]
+        end = min(offset + limit, job["total_images"])
+        records = []
+        complete = True
+
+        for index in range(offset // chunk_size, -(-end // chunk_size)):
+            if index not in job["progress"]["chunks"]:
+                complete = False
+                continue
+            first = index * chunk_size
+            with open(chunk_path(job_dir, index, "jsonl")) as f:
+                for position, line in enumerate(f):
+                    if offset <= first + position < end:
+                        records.append(json.loads(line))
+
+        return {
+            "id": job_id,
+            "status": job["status"],
+            "offset": offset,
+            "limit": limit,
+            "complete": complete,
+            "results": records
+        }
+
+    @classmethod
+    def get_output_path(cls, job_id: str, filename: str) -> str:
+        """
+        Resolve a chunk output file for download
+
+        Args:
+            job_id: Job identifier
+            filename: Chunk file name, e.g. 00000.npz or 00000.jsonl
+
+        Returns:
+            Path of the finished output file
+        """
+        job = cls._find(job_id)
+        stem, extension = os.path.splitext(filename)
+        if not stem.isdigit() or len(stem) != 5 or extension not in (".npz", ".jsonl"):
+            raise HTTPException(status_code=404, detail=f"Output {filename} not found")
+        if int(stem) not in job["progress"]["chunks"] or (extension == ".npz" and "embeddings" not in job["tasks"]):
+            raise HTTPException(status_code=404, detail=f"Output {filename} not found or not finished")
+        return chunk_path(cls._job_dir(job_id), int(stem), extension[1:])
+
+    @classmethod
+    async def delete_job(cls, job_id: str) -> None:
+        """
+        Cancel a job if it is still running and remove its files
+
+        Args:
+            job_id: Job identifier
+        """
+        job = cls._find(job_id)
+        if job_id not in cls._jobs and job["status"] in ACTIVE_STATUSES:
+            raise HTTPException(status_code=409, detail=f"Job {job_id} is running in another worker")
+        task = cls._tasks.get(job_id)
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        cls._jobs.pop(job_id, None)
+        await run_in_threadpool(shutil.rmtree, cls._job_dir(job_id), True)
+        logger.info(f"Deleted job {job_id}")
+
+    @classmethod
+    def shutdown(cls) -> None:
+        """Stop scheduling; unfinished jobs stay queued and resume on the next start"""
+        for task in list(cls._tasks.values()):
+            task.cancel()
+        cls._reset_executor()
+        if cls._owner_lock is not None:
+            cls._owner_lock.close()
+            cls._owner_lock = None
+
+    @classmethod
+    def get_stats(cls) -> Dict[str, Any]:
+        """
+        Report worker settings and job counts by status
+
+        Returns:
+            Dictionary with job statistics
+        """
+        statuses: Dict[str, int] = {}
+        for job in cls._jobs.values():
+            statuses[job["status"]] = statuses.get(job["status"], 0) + 1
+        return {
+            "workers": JOB_WORKERS,
+            "active_jobs": len(cls._tasks),
+            "jobs": statuses
+        }
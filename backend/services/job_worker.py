@@ -0,0 +1,199 @@
+"""
+Job worker module for Face Matching API
+Processes chunks of bulk job images inside local worker processes
+"""
+
+import os
+import json
+import zipfile
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import (
+    JOB_WORKER_NICE, JOB_MAX_IMAGE_MB, JOB_EMBEDDING_DTYPE, EMBEDDING_BATCH_MAX_SIZE,
+    setup_logging
+)
+from utils import decode_image
+from services.batching_service import forward_batch
+from services.face_service import FaceService, DeepFace
+
+logger = logging.getLogger(__name__)
+
+CHUNKS_DIR = "chunks"
+
+# Archives opened by this worker process, reused across chunks
+_archives: Dict[str, zipfile.ZipFile] = {}
+
+def chunk_path(job_dir: str, chunk_index: int, extension: str) -> str:
+    """Path of a chunk output file ("json" summary, "jsonl" records or "npz" embeddings)"""
+    return os.path.join(job_dir, CHUNKS_DIR, f"{chunk_index:05d}.{extension}")
+
+def write_json_atomic(path: str, data: Any) -> None:
+    """Write JSON so readers never see a partial file"""
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(temp_path, path)
+
+def init_worker() -> None:
+    """Lower the worker's priority below the API process and configure logging"""
+    setup_logging()
+    try:
+        os.nice(JOB_WORKER_NICE)
+    except OSError as e:
+        logger.warning(f"Could not lower job worker priority: {e}")
+
+def _read_image(source: Dict[str, str], name: str) -> np.ndarray:
+    """Read and decode one image of a ZIP archive or directory source"""
+    max_bytes = JOB_MAX_IMAGE_MB * 1024 * 1024
+    if source["type"] == "zip":
+        archive = _archives.get(source["path"])
+        if archive is None:
+            archive = zipfile.ZipFile(source["path"])
+            _archives[source["path"]] = archive
+        if archive.getinfo(name).file_size > max_bytes:
+            raise ValueError(f"Image is larger than {JOB_MAX_IMAGE_MB:g} MB")
+        content = archive.read(name)
+    else:
+        path = os.path.join(source["path"], name)
+        if os.path.getsize(path) > max_bytes:
+            raise ValueError(f"Image is larger than {JOB_MAX_IMAGE_MB:g} MB")
+        with open(path, "rb") as f:
+            content = f.read()
+    return decode_image(content)
+
+def _region(facial_area: Dict[str, Any]) -> Dict[str, int]:
+    return {key: int(facial_area.get(key, 0)) for key in ("x", "y", "w", "h")}
+
+def _embed(images: List[Optional[np.ndarray]], records: List[Dict[str, Any]], model_name: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Embed every face of the chunk with batched forward passes"""
+    crops, rows = [], []
+    for k, image in enumerate(images):
+        if image is None:
+            continue
+        try:
+            image_crops, faces = FaceService.detect_and_align_faces(image, model_name)
+            records[k]["embeddings"] = [
+                {"face_index": j, "row": len(rows) + j, "region": _region(face["facial_area"])}
+                for j, face in enumerate(faces)
+            ]
+            rows.extend((records[k]["image_index"], j) for j in range(len(faces)))
+            crops.append(image_crops)
+        except Exception as e:
+            records[k].setdefault("errors", {})["embeddings"] = str(e)
+
+    dtype = np.dtype(JOB_EMBEDDING_DTYPE)
+    if not rows:
+        return np.empty((0, 0), dtype=dtype), np.empty((0, 2), dtype=np.int32)
+
+    crops = np.concatenate(crops)
+    embeddings = np.concatenate([
+        forward_batch(model_name, crops[start:start + EMBEDDING_BATCH_MAX_SIZE])
+        for start in range(0, len(crops), EMBEDDING_BATCH_MAX_SIZE)
+    ])
+    return embeddings.astype(dtype), np.asarray(rows, dtype=np.int32)
+
+def _analyze(images: List[Optional[np.ndarray]], records: List[Dict[str, Any]], actions: List[str]) -> None:
+    """Add the dominant attribute predictions of every face to the records"""
+    for k, image in enumerate(images):
+        if image is None:
+            continue
+        try:
+            face_objs = FaceService.detect_faces(image)
+            faces = [
+                {"face_index": j, "region": _region(face_obj["facial_area"])}
+                for j, face_obj in enumerate(face_objs)
+            ]
+            for action in actions:
+                for face, analysis in zip(faces, FaceService.analyze_attribute(action, [face_objs])[0]):
+                    if action == "age":
+                        face["age"] = analysis.get("age")
+                        continue
+                    scores = analysis.get(action, {})
+                    prediction = max(scores.items(), key=lambda x: x[1]) if scores else (None, None)
+                    face[action] = prediction[0]
+                    face[f"{action}_confidence"] = round(float(prediction[1]), 2) if scores else None
+            records[k]["attributes"] = faces
+        except Exception as e:
+            records[k].setdefault("errors", {})["attributes"] = str(e)
+
+def _check_spoofing(images: List[Optional[np.ndarray]], records: List[Dict[str, Any]]) -> None:
+    """Add the anti-spoofing verdict of every face to the records"""
+    for k, image in enumerate(images):
+        if image is None:
+            continue
+        try:
+            face_objs = DeepFace.extract_faces(img_path=image, anti_spoofing=True)
+            records[k]["spoofing"] = [
+                {
+                    "face_index": j,
+                    "region": _region(face_obj.get("facial_area", {})),
+                    "is_real": face_obj.get("is_real"),
+                    "antispoofing_score": face_obj.get("antispoofing_score")
+                }
+                for j, face_obj in enumerate(face_objs)
+            ]
+        except ValueError as e:
+            if "Spoof detected" in str(e):
+                records[k]["spoofing"] = []
+                records[k]["spoof_detected"] = True
+            records[k].setdefault("errors", {})["spoofing"] = str(e)
+        except Exception as e:
+            records[k].setdefault("errors", {})["spoofing"] = str(e)
+
+def process_chunk(job_dir: str, job: Dict[str, Any], chunk_index: int, names: List[str]) -> Dict[str, int]:
+    """
+    Process one chunk of a job and write its outputs
+
+    Per-image failures are recorded in the chunk records; an exception means
+    the chunk must be retried. The summary file is written last and marks the
+    chunk as done, so a crash at any point only redoes this chunk.
+
+    Args:
+        job_dir: Directory of the job
+        job: Job definition (source, tasks, model, actions)
+        chunk_index: Index of the chunk within the job
+        names: Image names of the chunk (archive members or paths relative to the directory)
+
+    Returns:
+        Chunk summary with image, face and failure counts
+    """
+    start = chunk_index * job["chunk_size"]
+    records: List[Dict[str, Any]] = []
+    images: List[Optional[np.ndarray]] = []
+    for k, name in enumerate(names):
+        records.append({"image_index": start + k, "name": name})
+        try:
+            images.append(_read_image(job["source"], name))
+        except Exception as e:
+            records[k]["errors"] = {"decode": str(e)}
+            images.append(None)
+
+    if "embeddings" in job["tasks"]:
+        embeddings, rows = _embed(images, records, job["model"])
+        temp_path = chunk_path(job_dir, chunk_index, "tmp.npz")
+        np.savez(temp_path, embeddings=embeddings, image_index=rows[:, 0], face_index=rows[:, 1])
+        os.replace(temp_path, chunk_path(job_dir, chunk_index, "npz"))
+    if "attributes" in job["tasks"]:
+        _analyze(images, records, job["actions"])
+    if "spoofing" in job["tasks"]:
+        _check_spoofing(images, records)
+
+    temp_path = chunk_path(job_dir, chunk_index, "jsonl.tmp")
+    with open(temp_path, "w") as f:
+        for record in records:
+            f.write(json.dumps(record, separators=(",", ":")) + "\n")
+    os.replace(temp_path, chunk_path(job_dir, chunk_index, "jsonl"))
+
+    summary = {
+        "images": len(records),
+        "failed": sum(1 for record in records if "errors" in record),
+        "faces": sum(
+            max((len(record.get(task, [])) for task in job["tasks"]), default=0)
+            for record in records
+        )
+    }
+    write_json_atomic(chunk_path(job_dir, chunk_index, "json"), summary)
+    return summary
@@ -0,0 +1,238 @@
+"""
+Metrics service for Face Matching API
+Prometheus text-format latency histograms and counters, cheap enough to leave on
+"""
+
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Sequence, Tuple
+
+from config import METRICS_ENABLED, METRICS_LATENCY_BUCKETS
+
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4"  # Starlette appends the charset
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Histogram:
+    """Fixed-bucket histogram; an observation is one bisect and one locked increment"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str], buckets: Sequence[float] = METRICS_LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # Per label set: [per-bucket counts (last one is +Inf), sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = [[0] * (len(self.buckets) + 1), 0.0]
+                self._series[labels] = series
+            series[0][index] += 1
+            series[1] += value
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            snapshot = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, counts, total in sorted(snapshot):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {total!r}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+class Counter:
+    """Monotonic counter per label set"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            snapshot = sorted(self._values.items())
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        lines.extend(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}" for labels, value in snapshot)
+        return lines
+
+class MetricsService:
+    """
+    Process-wide request, stage and face metrics
+
+    Services record what they measure through the classmethods below; values
+    owned by other services (cache, queues, resident models) are read at
+    scrape time by the /metrics endpoint and rendered with format_metric.
+    """
+
+    _request_duration = Histogram(
+        "face_api_request_duration_seconds",
+        "Request latency by endpoint and status code, including streamed bodies",
+        ("endpoint", "status")
+    )
+    _stage_duration = Histogram(
+        "face_api_stage_duration_seconds",
+        "Time spent in each pipeline stage, by model where one is involved",
+        ("stage", "model")
+    )
+    _executor_wait = Histogram(
+        "face_api_executor_wait_seconds",
+        "Time inference calls waited for an executor thread, model slot and model memory",
+        ("stage",)
+    )
+    _request_errors = Counter(
+        "face_api_request_errors_total",
+        "Responses with a 4xx or 5xx status by endpoint and status code",
+        ("endpoint", "status")
+    )
+    _stage_errors = Counter(
+        "face_api_stage_errors_total",
+        "Exceptions raised by inference calls by stage and model",
+        ("stage", "model")
+    )
+    _faces = Counter(
+        "face_api_faces_processed_total",
+        "Faces processed by task and model",
+        ("task", "model")
+    )
+
+    @classmethod
+    def observe_request(cls, endpoint: str, status: int, seconds: float) -> None:
+        """Record a finished request"""
+        if not METRICS_ENABLED:
+            return
+        cls._request_duration.observe(seconds, endpoint, str(status))
+        if status >= 400:
+            cls._request_errors.inc(endpoint, str(status))
+
+    @classmethod
+    def observe_stage(cls, stage: str, seconds: float, model: str = "") -> None:
+        """Record the duration of one pipeline stage"""
+        if METRICS_ENABLED:
+            cls._stage_duration.observe(seconds, stage, model)
+
+    @classmethod
+    @contextmanager
+    def time_stage(cls, stage: str, model: str = "") -> Iterator[None]:
+        """Time a block of code as a pipeline stage"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            cls.observe_stage(stage, time.perf_counter() - start, model)
+
+    @classmethod
+    def observe_executor_wait(cls, stage: str, seconds: float) -> None:
+        """Record how long an inference call queued before running"""
+        if METRICS_ENABLED:
+            cls._executor_wait.observe(seconds, stage)
+
+    @classmethod
+    def count_stage_error(cls, stage: str, model: str = "") -> None:
+        """Count an inference call that raised"""
+        if METRICS_ENABLED:
+            cls._stage_errors.inc(stage, model)
+
+    @classmethod
+    def count_faces(cls, task: str, model: str, faces: int) -> None:
+        """Count faces processed by a task"""
+        if METRICS_ENABLED and faces:
+            cls._faces.inc(task, model, amount=faces)
+
+    @staticmethod
+    def format_metric(name: str, metric_type: str, documentation: str, samples: Iterable[Tuple[Dict[str, str], float]]) -> List[str]:
+        """
+        Render a metric whose values are read at scrape time
+
+        Args:
+            name: Metric name
+            metric_type: "gauge" or "counter"
+            documentation: HELP text
+            samples: (labels, value) pairs
+
+        Returns:
+            Prometheus text-format lines
+        """
+        lines = [f"# HELP {name} {documentation}", f"# TYPE {name} {metric_type}"]
+        for labels, value in samples:
+            lines.append(f"{name}{_labels(list(labels), list(labels.values()))} {_number(value)}")
+        return lines
+
+    @classmethod
+    def render(cls, extra_lines: List[str]) -> str:
+        """
+        Render every recorded metric plus scrape-time metrics in Prometheus text format
+
+        Args:
+            extra_lines: Lines produced with format_metric
+
+        Returns:
+            Exposition text
+        """
+        lines: List[str] = []
+        for metric in (cls._request_duration, cls._stage_duration, cls._executor_wait,
+                       cls._request_errors, cls._stage_errors, cls._faces):
+            lines.extend(metric.collect())
+        lines.extend(extra_lines)
+        return "\n".join(lines) + "\n"
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing every request until its last body byte is sent
+
+    Requests are labelled with the matched route template so that path
+    parameters (job ids, identities) do not create new series.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            endpoint = getattr(route, "path", None) or "unmatched"
+            MetricsService.observe_request(endpoint, status, time.perf_counter() - start)
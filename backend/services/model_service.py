@@ -0,0 +1,423 @@
+"""
+Model management service for Face Matching API
+Contains model preloading, warm-up and readiness tracking logic
+"""
+
+import gc
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Callable, List, Optional, Sequence
+
+import numpy as np
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+
+from config import (
+    PRELOAD_MODELS, PRELOAD_ATTRIBUTE_ACTIONS, PRELOAD_DETECTOR,
+    PRELOAD_ANTI_SPOOFING, ATTRIBUTE_MODELS, DEFAULT_DETECTOR_BACKEND,
+    ANTI_SPOOFING_MODEL, WARMUP_IMAGE_SIZE,
+    MODEL_SIZES_MB, DEFAULT_MODEL_SIZE_MB, MODEL_MEMORY_BUDGET_MB
+)
+from lazy_imports import LazyModule, ImportProfiler
+
+logger = logging.getLogger(__name__)
+
+DeepFace = LazyModule("deepface.DeepFace")
+modeling = LazyModule("deepface.modules.modeling")
+
+class ModelService:
+    """Service class for model preloading and readiness reporting"""
+
+    _lock = threading.Lock()
+    _models: Dict[str, Dict[str, Any]] = {}
+    _state = "pending"
+    # Model registry: size, load and eviction counts per "task/name", and LRU order
+    _memory = threading.Condition()
+    _registry: Dict[str, Dict[str, Any]] = {}
+    _last_used: "OrderedDict[str, None]" = OrderedDict()
+    # Import of DeepFace and its backends: pending, importing, ready or failed
+    _imports_lock = threading.Lock()
+    _imports_state = "pending"
+    _imports_error: Optional[str] = None
+
+    @staticmethod
+    def _dummy_image() -> np.ndarray:
+        """
+        Build a blank BGR image used to trigger graph building
+
+        Returns:
+            Zero-filled uint8 image array
+        """
+        return np.zeros((WARMUP_IMAGE_SIZE, WARMUP_IMAGE_SIZE, 3), dtype=np.uint8)
+
+    @classmethod
+    def _record(cls, key: str, task: str, name: str, status: str, warmup_time: float, error: str = None) -> None:
+        """Store the warm-up outcome for a single model"""
+        entry = {
+            "name": name,
+            "task": task,
+            "status": status,
+            "warmup_time": round(warmup_time, 3)
+        }
+        if error:
+            entry["error"] = error
+        with cls._lock:
+            cls._models[key] = entry
+
+    @classmethod
+    def warmup_model(cls, task: str, name: str, warmup: Callable[[np.ndarray], Any]) -> bool:
+        """
+        Build a model and run a dummy inference through it
+
+        Args:
+            task: DeepFace task of the model (facial_recognition, face_detector, ...)
+            name: Model name within the task
+            warmup: Callable running a dummy inference on the given image
+
+        Returns:
+            bool: True if the model is resident and warm, False otherwise
+        """
+        key = f"{task}/{name}"
+        cls._record(key, task, name, "loading", 0.0)
+        start = time.perf_counter()
+
+        cls.acquire_models([key])
+        try:
+            DeepFace.build_model(model_name=name, task=task)
+            warmup(cls._dummy_image())
+            elapsed = time.perf_counter() - start
+            cls._record(key, task, name, "ready", elapsed)
+            logger.info(f"Warmed up {key} in {elapsed:.2f}s")
+            return True
+        except Exception as e:
+            elapsed = time.perf_counter() - start
+            cls._record(key, task, name, "failed", elapsed, str(e))
+            logger.error(f"Failed to warm up {key}: {e}")
+            return False
+        finally:
+            cls.release_models([key])
+
+    @classmethod
+    def import_inference_stack(cls) -> bool:
+        """
+        Import DeepFace and its backends once, timing the imports as the "inference" phase
+
+        Returns:
+            bool: True if the inference stack was imported
+        """
+        with cls._imports_lock:
+            if cls._imports_state == "pending":
+                cls._imports_state = "importing"
+                try:
+                    with ImportProfiler.profile("inference"):
+                        LazyModule.load_all()
+                    cls._imports_state = "ready"
+                except Exception as e:
+                    cls._imports_state = "failed"
+                    cls._imports_error = str(e)
+                    logger.error(f"Failed to import the inference stack: {e}")
+            return cls._imports_state == "ready"
+
+    @classmethod
+    async def require_inference_stack(cls) -> None:
+        """
+        Route dependency of inference endpoints: wait for the imports off the event loop
+
+        Raises:
+            HTTPException: If the inference stack failed to import
+        """
+        if cls._imports_state == "ready":
+            return
+        if not await run_in_threadpool(cls.import_inference_stack):
+            raise HTTPException(status_code=503, detail=f"Inference stack unavailable: {cls._imports_error}")
+
+    @classmethod
+    def preload_models(cls) -> None:
+        """Import the inference stack, then build and warm up every model selected in the preload settings"""
+        with cls._lock:
+            cls._state = "importing"
+
+        if not cls.import_inference_stack():
+            with cls._lock:
+                cls._state = "failed"
+            return
+
+        with cls._lock:
+            cls._state = "warming"
+
+        start = time.perf_counter()
+        warmed: List[bool] = []
+
+        if PRELOAD_DETECTOR:
+            warmed.append(cls.warmup_model(
+                "face_detector", DEFAULT_DETECTOR_BACKEND,
+                lambda img: DeepFace.extract_faces(
+                    img_path=img,
+                    detector_backend=DEFAULT_DETECTOR_BACKEND,
+                    enforce_detection=False
+                )
+            ))
+
+        for model_name in PRELOAD_MODELS:
+            warmed.append(cls.warmup_model(
+                "facial_recognition", model_name,
+                lambda img, model_name=model_name: DeepFace.represent(
+                    img_path=img,
+                    model_name=model_name,
+                    detector_backend="skip",
+                    enforce_detection=False
+                )
+            ))
+
+        for action in PRELOAD_ATTRIBUTE_ACTIONS:
+            warmed.append(cls.warmup_model(
+                "facial_attribute", ATTRIBUTE_MODELS[action],
+                lambda img, action=action: DeepFace.analyze(
+                    img_path=img,
+                    actions=[action],
+                    detector_backend="skip",
+                    enforce_detection=False,
+                    silent=True
+                )
+            ))
+
+        if PRELOAD_ANTI_SPOOFING:
+            warmed.append(cls.warmup_model(
+                "spoofing", ANTI_SPOOFING_MODEL,
+                lambda img: DeepFace.extract_faces(
+                    img_path=img,
+                    detector_backend="skip",
+                    enforce_detection=False,
+                    anti_spoofing=True
+                )
+            ))
+
+        # A model that failed to warm up would fail (or cold-start) requests, so the server is not ready
+        failed = warmed.count(False)
+        with cls._lock:
+            cls._state = "failed" if failed else "ready"
+
+        if failed:
+            logger.error(f"Model preloading finished in {time.perf_counter() - start:.2f}s with {failed} failed model(s)")
+        else:
+            logger.info(f"Model preloading finished in {time.perf_counter() - start:.2f}s")
+
+    @staticmethod
+    def _resident_keys() -> List[str]:
+        """List "task/name" keys of the models in DeepFace's model cache"""
+        if not modeling.loaded:
+            # Nothing is resident before the inference stack is imported
+            return []
+        cached_models = getattr(modeling, "cached_models", {})
+        return [
+            f"{task}/{name}"
+            for task, models in list(cached_models.items())
+            for name in list(models)
+        ]
+
+    @classmethod
+    def _model_size(cls, key: str) -> float:
+        """Resident cost of a model in MB: measured once loaded, estimated before"""
+        stats = cls._registry.get(key)
+        if stats and stats["size_mb"]:
+            return stats["size_mb"]
+        return MODEL_SIZES_MB.get(key, DEFAULT_MODEL_SIZE_MB)
+
+    @classmethod
+    def _measure(cls, key: str) -> None:
+        """Record the size of a freshly loaded model from its parameter count"""
+        task, name = key.split("/", 1)
+        model = getattr(modeling, "cached_models", {}).get(task, {}).get(name)
+        if model is None:
+            return
+        size_mb = MODEL_SIZES_MB.get(key, DEFAULT_MODEL_SIZE_MB)
+        try:
+            # Keras weights are float32; models without them keep the estimate
+            size_mb = model.model.count_params() * 4 / (1024 * 1024)
+        except Exception:
+            pass
+        cls._registry[key]["size_mb"] = round(size_mb, 2)
+
+    @classmethod
+    def _stats_entry(cls, key: str) -> Dict[str, Any]:
+        """Get the registry entry of a model, creating it on first use"""
+        stats = cls._registry.get(key)
+        if stats is None:
+            stats = {"size_mb": 0.0, "loads": 0, "evictions": 0, "in_use": 0}
+            cls._registry[key] = stats
+        return stats
+
+    @classmethod
+    def release_model(cls, task: str, name: str) -> bool:
+        """
+        Drop a model from DeepFace's model cache so its memory can be reclaimed
+
+        Callers already holding the model keep a working reference; the next
+        DeepFace.build_model call loads it again.
+
+        Args:
+            task: DeepFace task of the model
+            name: Model name within the task
+
+        Returns:
+            bool: True if the model was resident
+        """
+        cached = getattr(modeling, "cached_models", {}).get(task, {})
+        if cached.pop(name, None) is None:
+            return False
+
+        gc.collect()
+        key = f"{task}/{name}"
+        with cls._lock:
+            if key in cls._models:
+                cls._models[key]["status"] = "released"
+        logger.info(f"Released {key}")
+        return True
+
+    @classmethod
+    def acquire_models(cls, model_keys: Sequence[str]) -> None:
+        """
+        Reserve memory for the models a call is about to use and pin them
+
+        Idle resident models are evicted least recently used first until the
+        models fit MODEL_MEMORY_BUDGET_MB. When the memory is held by models
+        other calls are using, this waits for them to finish. A set of models
+        larger than the whole budget still runs once nothing else is in use.
+
+        Args:
+            model_keys: Models ("task/name") the call will use
+        """
+        keys = set(model_keys)
+        if not keys:
+            return
+
+        with cls._memory:
+            while True:
+                resident = set(cls._resident_keys())
+                used = sum(cls._model_size(key) for key in resident)
+                needed = sum(cls._model_size(key) for key in keys - resident)
+
+                if used + needed > MODEL_MEMORY_BUDGET_MB:
+                    # Resident models never used through the registry go first, then LRU
+                    idle = [key for key in resident if key not in cls._last_used]
+                    idle += [key for key in cls._last_used if key in resident]
+                    for key in idle:
+                        if used + needed <= MODEL_MEMORY_BUDGET_MB:
+                            break
+                        if key in keys or cls._stats_entry(key)["in_use"]:
+                            continue
+                        if cls.release_model(*key.split("/", 1)):
+                            used -= cls._model_size(key)
+                            cls._stats_entry(key)["evictions"] += 1
+
+                busy = any(
+                    stats["in_use"] for key, stats in cls._registry.items() if key not in keys
+                )
+                # Calls whose models are all resident never wait
+                if needed == 0 or used + needed <= MODEL_MEMORY_BUDGET_MB or not busy:
+                    if needed and used + needed > MODEL_MEMORY_BUDGET_MB:
+                        logger.warning(
+                            f"Loading {sorted(keys - resident)} exceeds the model memory budget "
+                            f"({used + needed:.0f}/{MODEL_MEMORY_BUDGET_MB:.0f} MB)"
+                        )
+                    break
+                cls._memory.wait()
+
+            for key in keys:
+                stats = cls._stats_entry(key)
+                stats["in_use"] += 1
+                if key not in resident:
+                    stats["loads"] += 1
+                    # Re-measured after the load
+                    stats["size_mb"] = 0.0
+                cls._last_used.pop(key, None)
+                cls._last_used[key] = None
+
+    @classmethod
+    def release_models(cls, model_keys: Sequence[str]) -> None:
+        """
+        Unpin models after a call, recording the size of newly loaded ones
+
+        Args:
+            model_keys: Models ("task/name") passed to acquire_models
+        """
+        if not model_keys:
+            return
+
+        with cls._memory:
+            for key in set(model_keys):
+                stats = cls._stats_entry(key)
+                stats["in_use"] -= 1
+                if not stats["size_mb"]:
+                    cls._measure(key)
+                    with cls._lock:
+                        if cls._models.get(key, {}).get("status") == "released":
+                            cls._models[key]["status"] = "ready"
+            cls._memory.notify_all()
+
+    @classmethod
+    def get_registry_stats(cls) -> Dict[str, Any]:
+        """
+        Report resident models and the memory budget
+
+        Returns:
+            Dictionary with budget, resident total and per-model size, load and eviction counts
+        """
+        with cls._memory:
+            resident = set(cls._resident_keys())
+            models = [
+                {
+                    "key": key,
+                    "resident": key in resident,
+                    "size_mb": round(cls._model_size(key), 2),
+                    "in_use": stats["in_use"],
+                    "loads": stats["loads"],
+                    "evictions": stats["evictions"]
+                }
+                for key, stats in cls._registry.items()
+            ]
+            models += [
+                {"key": key, "resident": True, "size_mb": round(cls._model_size(key), 2),
+                 "in_use": 0, "loads": 0, "evictions": 0}
+                for key in sorted(resident - set(cls._registry))
+            ]
+            return {
+                "budget_mb": MODEL_MEMORY_BUDGET_MB,
+                "resident_mb": round(sum(cls._model_size(key) for key in resident), 2),
+                "evictions": sum(stats["evictions"] for stats in cls._registry.values()),
+                "models": models
+            }
+
+    @classmethod
+    def start_preloading(cls) -> threading.Thread:
+        """
+        Import the inference stack and preload models in a background thread so
+        control endpoints are available immediately
+
+        Returns:
+            The started preloading thread
+        """
+        thread = threading.Thread(target=cls.preload_models, name="model-preload", daemon=True)
+        thread.start()
+        return thread
+
+    @classmethod
+    def get_readiness(cls) -> Dict[str, Any]:
+        """
+        Report preloading state and the warm-up result of each model
+
+        Returns:
+            Dictionary with readiness flag, state and per-model details
+        """
+        with cls._lock:
+            models: List[Dict[str, Any]] = [dict(entry) for entry in cls._models.values()]
+            state = cls._state
+
+        return {
+            "ready": state == "ready",
+            "state": state,
+            "imports": cls._imports_state,
+            "models": models
+        }
@@ -0,0 +1,283 @@
+"""
+Pre-fork server for Face Matching API
+Imports the inference stack once in a parent process, then forks workers that share it
+"""
+
+import gc
+import os
+import time
+import ctypes
+import signal
+import socket
+import logging
+import threading
+from multiprocessing.sharedctypes import RawArray
+from typing import Any, Dict, Optional
+
+import psutil
+import uvicorn
+
+from config import EMBEDDING_STORE_DIR, SERVER_SHUTDOWN_TIMEOUT_SECONDS, WORKER_RESTART_DELAY_SECONDS
+from services.model_service import ModelService
+
+logger = logging.getLogger(__name__)
+
+class _WorkerSlot(ctypes.Structure):
+    """Per-worker counters in memory shared by the parent and every worker"""
+
+    _fields_ = [
+        ("pid", ctypes.c_int),
+        ("restarts", ctypes.c_int),
+        ("active", ctypes.c_int),
+        ("requests", ctypes.c_uint64),
+        ("started_at", ctypes.c_double)
+    ]
+
+def _memory_mb(pid: int) -> Optional[Dict[str, float]]:
+    """Resident, unique and proportional set size of a process in MB"""
+    try:
+        info = psutil.Process(pid).memory_full_info()
+    except (psutil.Error, OSError):
+        return None
+    return {
+        "rss_mb": round(info.rss / (1024 * 1024), 2),
+        # Memory only this process uses; shared model pages are not counted
+        "uss_mb": round(getattr(info, "uss", info.rss) / (1024 * 1024), 2),
+        # Shared pages split between their users; the sum over processes is the real footprint
+        "pss_mb": round(getattr(info, "pss", info.rss) / (1024 * 1024), 2)
+    }
+
+class PreforkServer:
+    """
+    Multi-process server sharing the imported inference stack copy-on-write
+
+    The parent imports DeepFace and TensorFlow, binds the listening socket and
+    forks the workers, which inherit the imported modules and only copy the
+    pages they write to. Models are built and warmed by each worker after the
+    fork: TensorFlow's thread pools do not survive fork, so a model built in
+    the parent hangs on its first batched call in a worker. Each worker runs
+    its own uvicorn server on the shared socket with its own event loop,
+    executor, admission limits, cache and models. Galleries stay consistent
+    through the embedding store, which every worker reads back before using them. The parent restarts workers that die and stops them
+    all on SIGTERM or SIGINT. Request counts live in a shared array so any
+    worker can report every worker's load and memory.
+    """
+
+    _slots = None
+    _index: Optional[int] = None
+    _parent_pid: Optional[int] = None
+    _children: Dict[int, int] = {}
+    _stopping = False
+
+    @classmethod
+    def worker_index(cls) -> Optional[int]:
+        """Index of this worker, None outside a pre-fork worker"""
+        return cls._index
+
+    @classmethod
+    def server_pid(cls) -> int:
+        """Pid of the pre-fork parent, or of this process in a single-process server"""
+        return cls._parent_pid or os.getpid()
+
+    @classmethod
+    def _slot(cls) -> Optional[_WorkerSlot]:
+        if cls._index is None:
+            return None
+        return cls._slots[cls._index]
+
+    @classmethod
+    def _handle_stop(cls, signum, frame) -> None:
+        cls._stopping = True
+
+    @classmethod
+    def _start_worker(cls, index: int, sock: socket.socket, config: uvicorn.Config) -> None:
+        """Fork a worker; the child serves until uvicorn exits and never returns"""
+        slot = cls._slots[index]
+        slot.active = 0
+        slot.requests = 0
+        slot.started_at = time.time()
+
+        pid = os.fork()
+        if pid:
+            slot.pid = pid
+            cls._children[pid] = index
+            logger.info(f"Started worker {index} (pid {pid})")
+            return
+
+        # Child: uvicorn installs its own SIGTERM/SIGINT handlers for a graceful shutdown
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        cls._index = index
+        cls._children = {}
+        slot.pid = os.getpid()
+        code = 0
+        try:
+            uvicorn.Server(config).run(sockets=[sock])
+        except SystemExit as e:
+            code = e.code if isinstance(e.code, int) else 1
+        except BaseException:
+            logger.exception(f"Worker {index} crashed")
+            code = 1
+        finally:
+            logging.shutdown()
+            os._exit(code)
+
+    @classmethod
+    def _stop_workers(cls) -> None:
+        """Ask every worker to finish its requests, killing those that take too long"""
+        for pid in list(cls._children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+        deadline = time.monotonic() + SERVER_SHUTDOWN_TIMEOUT_SECONDS
+        while cls._children and time.monotonic() < deadline:
+            pid, _ = os.waitpid(-1, os.WNOHANG)
+            if pid:
+                cls._slots[cls._children.pop(pid)].pid = 0
+            else:
+                time.sleep(0.1)
+
+        for pid in list(cls._children):
+            logger.warning(f"Killing worker {cls._children[pid]} (pid {pid}) after {SERVER_SHUTDOWN_TIMEOUT_SECONDS:g}s")
+            try:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+            cls._slots[cls._children.pop(pid)].pid = 0
+
+    @classmethod
+    def run(cls, app: Any, host: str, port: int, workers: int, log_level: str = "info") -> None:
+        """
+        Import the inference stack, fork the workers and supervise them until stopped
+
+        Args:
+            app: ASGI application served by every worker
+            host: Address to bind
+            port: Port to bind
+            workers: Number of worker processes
+            log_level: uvicorn log level of the workers
+
+        Raises:
+            RuntimeError: Without EMBEDDING_STORE_DIR, through which the workers share galleries
+        """
+        if not EMBEDDING_STORE_DIR:
+            raise RuntimeError(
+                "Pre-fork workers need EMBEDDING_STORE_DIR: galleries are shared through the embedding store"
+            )
+
+        # Import (but do not build models) here so the workers share the module pages;
+        # each worker preloads its models in its lifespan
+        ModelService.import_inference_stack()
+
+        extra_threads = [thread.name for thread in threading.enumerate() if thread is not threading.main_thread()]
+        if extra_threads:
+            logger.warning(f"Threads running before fork are not copied into workers: {extra_threads}")
+
+        sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((host, port))
+        sock.listen(2048)
+        sock.set_inheritable(True)
+
+        config = uvicorn.Config(app, host=host, port=port, log_level=log_level)
+        cls._slots = RawArray(_WorkerSlot, workers)
+        cls._parent_pid = os.getpid()
+        cls._stopping = False
+        signal.signal(signal.SIGTERM, cls._handle_stop)
+        signal.signal(signal.SIGINT, cls._handle_stop)
+
+        # Collect now and move every surviving object out of the collector's reach;
+        # collections in a worker would otherwise write to (and copy) the shared pages
+        gc.collect()
+        gc.freeze()
+
+        rss = psutil.Process().memory_info().rss / (1024 * 1024)
+        logger.info(f"Forking {workers} workers from pid {cls._parent_pid} ({rss:.0f} MB resident) on {host}:{port}")
+        for index in range(workers):
+            cls._start_worker(index, sock, config)
+
+        try:
+            while not cls._stopping:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+                if not pid:
+                    time.sleep(0.2)
+                    continue
+                index = cls._children.pop(pid, None)
+                if index is None:
+                    continue
+                cls._slots[index].pid = 0
+                if cls._stopping:
+                    break
+                logger.error(
+                    f"Worker {index} (pid {pid}) exited with status {os.waitstatus_to_exitcode(status)}, "
+                    f"restarting in {WORKER_RESTART_DELAY_SECONDS:g}s"
+                )
+                time.sleep(WORKER_RESTART_DELAY_SECONDS)
+                if not cls._stopping:
+                    cls._slots[index].restarts += 1
+                    cls._start_worker(index, sock, config)
+        finally:
+            logger.info("Stopping workers")
+            cls._stop_workers()
+            sock.close()
+
+    @classmethod
+    def get_stats(cls) -> Optional[Dict[str, Any]]:
+        """
+        Report every worker's request counts and memory
+
+        Returns:
+            Dictionary with parent and per-worker memory, request counts and
+            restarts, or None outside a pre-fork server
+        """
+        if cls._slots is None:
+            return None
+
+        now = time.time()
+        parent = {"pid": cls._parent_pid, **(_memory_mb(cls._parent_pid) or {})}
+        workers = []
+        for index, slot in enumerate(cls._slots):
+            entry = {
+                "index": index,
+                "pid": slot.pid or None,
+                "alive": bool(slot.pid),
+                "requests": slot.requests,
+                "active_requests": slot.active,
+                "restarts": slot.restarts,
+                "uptime_seconds": round(now - slot.started_at, 1) if slot.pid else None
+            }
+            if slot.pid:
+                entry.update(_memory_mb(slot.pid) or {})
+            workers.append(entry)
+
+        processes = [parent] + [entry for entry in workers if entry["alive"]]
+        return {
+            "worker_index": cls._index,
+            "parent": parent,
+            "workers": workers,
+            # Naive sum counting shared pages once per process, and the real footprint
+            "total_rss_mb": round(sum(process.get("rss_mb", 0) for process in processes), 2),
+            "total_pss_mb": round(sum(process.get("pss_mb", 0) for process in processes), 2)
+        }
+
+class WorkerStatsMiddleware:
+    """ASGI middleware counting the requests of the current pre-fork worker"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        slot = PreforkServer._slot()
+        if scope["type"] != "http" or slot is None:
+            await self.app(scope, receive, send)
+            return
+
+        slot.active += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            slot.active -= 1
+            slot.requests += 1
@@ -0,0 +1,107 @@
+"""
+Profiler service for Face Matching API
+In-process sampling profiler producing folded stacks for flame graphs
+"""
+
+import os
+import sys
+import time
+import asyncio
+import logging
+import threading
+from collections import Counter
+from typing import Tuple
+
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+# Leaf frames of threads waiting for work or on a lock rather than running Python code
+_IDLE_LEAVES = {
+    ("selectors.py", "select"),
+    ("thread.py", "_worker"),
+    ("threading.py", "wait"),
+    ("queue.py", "get")
+}
+
+class SamplingProfiler:
+    """
+    Wall-clock sampler of the Python stacks of every thread
+
+    A background thread reads sys._current_frames() at a fixed interval for
+    the requested duration, so live traffic can be profiled without a restart
+    or an external tool. Stacks are aggregated in the folded format
+    ("thread;outer;...;inner count") read by flamegraph.pl, speedscope and
+    most flame graph viewers. Only one profile runs at a time.
+    """
+
+    _lock = threading.Lock()
+    _running = False
+
+    @staticmethod
+    def _frame_label(frame) -> str:
+        code = frame.f_code
+        label = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+        # Semicolons separate frames in the folded format
+        return label.replace(";", ":")
+
+    @classmethod
+    def _sample(cls, seconds: float, interval: float, include_idle: bool) -> Tuple[Counter, int]:
+        """Collect stacks until the duration has passed (runs on its own thread)"""
+        own_ident = threading.get_ident()
+        stacks: Counter = Counter()
+        samples = 0
+        deadline = time.perf_counter() + seconds
+
+        while time.perf_counter() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                code = frame.f_code
+                if not include_idle and (os.path.basename(code.co_filename), code.co_name) in _IDLE_LEAVES:
+                    continue
+                frames = []
+                while frame is not None:
+                    frames.append(cls._frame_label(frame))
+                    frame = frame.f_back
+                frames.append(names.get(ident, f"thread-{ident}").replace(";", ":"))
+                stacks[";".join(reversed(frames))] += 1
+            samples += 1
+            time.sleep(interval)
+
+        return stacks, samples
+
+    @classmethod
+    async def profile(cls, seconds: float, interval_ms: float, include_idle: bool = False) -> Tuple[str, int]:
+        """
+        Sample every thread for a while and return the folded stacks
+
+        Args:
+            seconds: Duration of the profile
+            interval_ms: Time between samples in milliseconds
+            include_idle: Keep stacks of threads waiting for work (event loop, idle executor threads)
+
+        Returns:
+            Tuple of (folded stacks, one "stack count" line per distinct stack; number of samples taken)
+
+        Raises:
+            HTTPException: If a profile is already running
+        """
+        with cls._lock:
+            if cls._running:
+                raise HTTPException(status_code=409, detail="A profile is already running")
+            cls._running = True
+
+        logger.info(f"Profiling for {seconds:g}s every {interval_ms:g}ms")
+        try:
+            loop = asyncio.get_running_loop()
+            stacks, samples = await loop.run_in_executor(
+                None, cls._sample, seconds, interval_ms / 1000, include_idle
+            )
+        finally:
+            with cls._lock:
+                cls._running = False
+
+        folded = "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+        return folded, samples
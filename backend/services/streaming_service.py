@@ -0,0 +1,87 @@
+"""
+Streaming service for Face Matching API
+Newline-delimited JSON responses that emit per-image results as they complete
+"""
+
+import json
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Awaitable, Dict, List, Tuple, Union
+
+import numpy as np
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+from config import NDJSON_MEDIA_TYPE
+from services.file_service import FileService
+from services.timing_service import RequestTimings
+
+logger = logging.getLogger(__name__)
+
+class NDJSONStream:
+    """
+    Helpers for the opt-in streaming mode of the batch endpoints
+
+    A stream is one {"type": "result", ...} line per image, in completion
+    order, followed by one {"type": "summary", ...} line. Errors raised after
+    the first line can no longer change the status code, so they end the
+    stream with a {"type": "error", ...} line instead.
+    """
+
+    @staticmethod
+    async def as_completed(awaitables: List[Awaitable[Any]]) -> AsyncIterator[Tuple[int, Any]]:
+        """
+        Run awaitables concurrently and yield their outcomes as they finish
+
+        Args:
+            awaitables: One awaitable per image
+
+        Yields:
+            Tuples of (index, result or raised exception)
+        """
+        async def indexed(index: int, awaitable: Awaitable[Any]) -> Tuple[int, Any]:
+            try:
+                # Stages of single-image calls are timed under the image's request index
+                return index, await RequestTimings.for_image(index, awaitable)
+            except HTTPException:
+                # Deadline and disconnect errors end the whole stream
+                raise
+            except Exception as e:
+                return index, e
+
+        tasks = [asyncio.ensure_future(indexed(i, awaitable)) for i, awaitable in enumerate(awaitables)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # Stop unfinished work when the client goes away or an error ends the stream
+            for task in tasks:
+                task.cancel()
+
+    @staticmethod
+    def response(lines: AsyncIterator[Dict[str, Any]], images: List[Union[np.ndarray, str]]) -> StreamingResponse:
+        """
+        Build a streaming response that owns the request's images
+
+        Args:
+            lines: Async iterator of JSON-serializable lines
+            images: Images returned by FileService.process_uploaded_files,
+                released once the stream ends
+
+        Returns:
+            StreamingResponse with the NDJSON media type
+        """
+        async def body() -> AsyncIterator[bytes]:
+            try:
+                async for line in lines:
+                    yield (json.dumps(line) + "\n").encode()
+            except HTTPException as e:
+                yield (json.dumps({"type": "error", "status_code": e.status_code, "detail": e.detail}) + "\n").encode()
+            except Exception as e:
+                logger.error(f"Unexpected error while streaming results: {e}")
+                yield (json.dumps({"type": "error", "status_code": 500, "detail": f"Internal server error: {str(e)}"}) + "\n").encode()
+            finally:
+                await lines.aclose()
+                FileService.cleanup_images(images)
+
+        return StreamingResponse(body(), media_type=NDJSON_MEDIA_TYPE)
@@ -0,0 +1,179 @@
+"""
+Timing service for Face Matching API
+Opt-in per-request stage timings, broken down per image
+"""
+
+import time
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Awaitable, Dict, Iterator, Optional, TypeVar
+
+from fastapi import Request
+
+from config import TIMINGS_HEADER
+
+T = TypeVar("T")
+
+# Per-image stages, in pipeline order
+IMAGE_STAGES = ("decode", "detect", "align", "infer", "postprocess")
+
+class RequestTimings:
+    """
+    Stage timings of a request that sent TIMINGS_HEADER
+
+    Stages are recorded per image: decode, detect, align, infer and postprocess.
+    Work shared by several images (a batched forward pass, an attribute model
+    over all detected faces) is split between them by face count, and work on
+    the whole request (pairwise distances, gallery search) is only counted in
+    the stage totals. Recording outside a timed request does nothing.
+    """
+
+    _current: ContextVar[Optional["RequestTimings"]] = ContextVar("request_timings", default=None)
+    # Request index of the image being processed by single-image calls
+    _image: ContextVar[Optional[int]] = ContextVar("request_timings_image", default=None)
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+        self._stages: Dict[str, float] = {}
+        self._images: Dict[int, Dict[str, float]] = {}
+
+    @classmethod
+    async def track(cls, request: Request) -> AsyncIterator[None]:
+        """FastAPI dependency collecting timings when the request asks for them"""
+        if request.headers.get(TIMINGS_HEADER, "").lower() not in ("1", "true", "yes"):
+            yield
+            return
+
+        token = cls._current.set(cls())
+        try:
+            yield
+        finally:
+            cls._current.reset(token)
+
+    @classmethod
+    def active(cls) -> bool:
+        """Whether the current request collects timings"""
+        return cls._current.get() is not None
+
+    @classmethod
+    def _resolve(cls, image_index: Optional[int]) -> Optional[int]:
+        # Single-image calls made per image keep the request index of their image
+        scoped = cls._image.get()
+        return scoped if scoped is not None else image_index
+
+    def _add(self, stage: str, seconds: float, image_index: Optional[int]) -> None:
+        with self._lock:
+            self._stages[stage] = self._stages.get(stage, 0.0) + seconds
+            if image_index is not None:
+                image = self._images.setdefault(image_index, {})
+                image[stage] = image.get(stage, 0.0) + seconds
+
+    @classmethod
+    def record(cls, stage: str, seconds: float, image_index: Optional[int] = None) -> None:
+        """
+        Record time spent in a stage
+
+        Args:
+            stage: Stage name (one of IMAGE_STAGES for per-image work)
+            seconds: Elapsed time
+            image_index: Image the work was for (default: the image in scope, if any)
+        """
+        timings = cls._current.get()
+        if timings is not None:
+            timings._add(stage, seconds, cls._resolve(image_index))
+
+    @classmethod
+    def record_shared(cls, stage: str, seconds: float, faces: Dict[int, int]) -> None:
+        """
+        Record work shared by several images, split by their face counts
+
+        Args:
+            stage: Stage name
+            seconds: Elapsed time of the shared work
+            faces: Number of faces each image contributed, by image index
+        """
+        timings = cls._current.get()
+        if timings is None:
+            return
+        total = sum(faces.values())
+        for image_index, count in faces.items():
+            share = seconds * count / total if total else seconds / len(faces)
+            timings._add(stage, share, cls._resolve(image_index))
+
+    @classmethod
+    @contextmanager
+    def stage(cls, stage: str, image_index: Optional[int] = None) -> Iterator[None]:
+        """Time a block of code as a stage of the current request"""
+        if cls._current.get() is None:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            cls.record(stage, time.perf_counter() - start, image_index)
+
+    @classmethod
+    async def for_image(cls, image_index: int, awaitable: Awaitable[T]) -> T:
+        """
+        Await work on a single image, recording its stages under that image
+
+        Args:
+            image_index: Index of the image in the request
+            awaitable: Work on that image
+
+        Returns:
+            The awaitable's result
+        """
+        token = cls._image.set(cls._resolve(image_index))
+        try:
+            return await awaitable
+        finally:
+            cls._image.reset(token)
+
+    @classmethod
+    def report(cls) -> Optional[Dict[str, Any]]:
+        """
+        Report the timings collected so far, in milliseconds
+
+        Returns:
+            Dictionary with total, per-stage and per-image times, or None when
+            the request did not ask for timings
+        """
+        timings = cls._current.get()
+        if timings is None:
+            return None
+
+        with timings._lock:
+            stages = dict(timings._stages)
+            images = {index: dict(image) for index, image in timings._images.items()}
+
+        return {
+            "total_ms": round((time.perf_counter() - timings.started) * 1000, 3),
+            "stages_ms": {stage: round(seconds * 1000, 3) for stage, seconds in stages.items()},
+            "images": [
+                {
+                    "image_index": index,
+                    **{stage: round(image[stage] * 1000, 3) for stage in IMAGE_STAGES if stage in image}
+                }
+                for index, image in sorted(images.items())
+            ]
+        }
+
+    @classmethod
+    def attach(cls, response: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Add a timings object to a response when the request asked for one
+
+        Args:
+            response: Response body (or final stream line)
+
+        Returns:
+            The same dictionary
+        """
+        timings = cls.report()
+        if timings is not None:
+            response["timings"] = timings
+        return response
@@ -0,0 +1,14 @@
+"""
+Test configuration for Face Matching API
+Runs the API modules against the stub DeepFace backend, without TensorFlow or model weights
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import stub_deepface
+
+# Installed before any test imports the services so they bind to the stub
+stub_deepface.install()
@@ -0,0 +1,128 @@
+"""
+Tests for admission control
+FIFO queueing for capacity, and fast 503s when the queue is full or the wait times
+out, sent before the upload is read
+"""
+
+import asyncio
+from collections import deque
+
+import pytest
+from fastapi import Depends, FastAPI, File, HTTPException, UploadFile
+
+from services import admission_service
+from services.admission_service import AdmissionController, AdmissionMiddleware
+
+@pytest.fixture(autouse=True)
+def controller(monkeypatch):
+    """Capacity of 2 units, a queue of 2 requests and a short queue timeout"""
+    monkeypatch.setattr(admission_service, "ADMISSION_CAPACITY", 2.0)
+    monkeypatch.setattr(admission_service, "ADMISSION_MAX_QUEUE", 2)
+    monkeypatch.setattr(admission_service, "ADMISSION_QUEUE_TIMEOUT_SECONDS", 0.2)
+    monkeypatch.setattr(AdmissionController, "_in_use", 0.0)
+    monkeypatch.setattr(AdmissionController, "_waiters", deque())
+    monkeypatch.setattr(AdmissionController, "_seconds_per_unit", 1.0)
+    monkeypatch.setattr(AdmissionController, "_stats", {})
+
+def test_queued_requests_are_admitted_in_order():
+    admitted = []
+
+    async def request(name, weight):
+        await AdmissionController.acquire("identify", weight)
+        admitted.append(name)
+
+    async def scenario():
+        await request("first", 2)
+        waiting = [asyncio.ensure_future(request(name, 1)) for name in ("second", "third")]
+        await asyncio.sleep(0.01)
+        assert admitted == ["first"]
+        assert AdmissionController.get_stats()["queue_depth"] == 2
+
+        AdmissionController.release(2)
+        await asyncio.gather(*waiting)
+
+    asyncio.run(scenario())
+    assert admitted == ["first", "second", "third"]
+    stats = AdmissionController.get_stats()
+    assert stats["in_use"] == 2
+    assert stats["endpoints"][0]["queued"] == 2
+
+def test_full_queue_and_queue_timeout_get_503():
+    async def scenario():
+        await AdmissionController.acquire("identify", 2)
+        waiting = [asyncio.ensure_future(AdmissionController.acquire("identify", 1)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+
+        # Beyond ADMISSION_MAX_QUEUE: rejected without waiting
+        with pytest.raises(HTTPException) as rejected:
+            await asyncio.wait_for(AdmissionController.acquire("identify", 1), 0.05)
+        assert rejected.value.status_code == 503
+        assert int(rejected.value.headers["Retry-After"]) >= 1
+
+        # Queued requests give up after ADMISSION_QUEUE_TIMEOUT_SECONDS
+        for outcome in await asyncio.gather(*waiting, return_exceptions=True):
+            assert isinstance(outcome, HTTPException) and outcome.status_code == 503
+
+    asyncio.run(scenario())
+    stats = AdmissionController.get_stats()
+    assert stats["endpoints"][0]["rejected"] == 1
+    assert stats["endpoints"][0]["timed_out"] == 2
+    assert stats["queue_depth"] == 0
+
+def test_cancelled_waiter_does_not_hold_capacity():
+    async def scenario():
+        await AdmissionController.acquire("identify", 2)
+        waiting = asyncio.ensure_future(AdmissionController.acquire("identify", 1))
+        await asyncio.sleep(0.01)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+
+        AdmissionController.release(2)
+        await asyncio.wait_for(AdmissionController.acquire("identify", 2), 0.05)
+
+    asyncio.run(scenario())
+    assert AdmissionController.get_stats()["in_use"] == 2
+
+def test_estimated_weight_is_capped_at_the_file_limit():
+    assert AdmissionController.estimate_weight("identify", str(50 * 1024 * 1024)) == 1
+    assert AdmissionController.estimate_weight("analyze-attributes", "100") == 2
+    assert AdmissionController.estimate_weight("compare-faces", None) == 4
+
+def test_rejected_request_gets_503_before_its_body_is_read(monkeypatch):
+    monkeypatch.setattr(admission_service, "ADMISSION_MAX_QUEUE", 0)
+    app = FastAPI()
+
+    @app.post("/identify", dependencies=[Depends(AdmissionController.limit("identify"))])
+    async def identify(file: UploadFile = File(...)):
+        return {"filename": file.filename}
+
+    asgi = AdmissionMiddleware(app)
+    body_reads = []
+    messages = []
+
+    async def receive():
+        body_reads.append(True)
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": "/identify", "raw_path": b"/identify", "root_path": "",
+        "query_string": b"", "server": ("test", 80), "client": ("test", 1), "app": app,
+        "headers": [
+            (b"content-type", b"multipart/form-data; boundary=x"),
+            (b"content-length", str(8 * 1024 * 1024).encode())
+        ]
+    }
+
+    async def scenario():
+        await AdmissionController.acquire("identify", 2)
+        await asgi(scope, receive, send)
+
+    asyncio.run(scenario())
+    assert messages[0]["status"] == 503
+    assert b"retry-after" in [name.lower() for name, _ in messages[0]["headers"]]
+    assert not body_reads
@@ -0,0 +1,50 @@
+"""
+Tests for the embedding micro-batcher
+Forward passes over stacked crops
+"""
+
+import numpy as np
+import pytest
+
+from benchmarks import stub_deepface
+from services.batching_service import forward_batch
+
+class _CountingNetwork:
+    """Wraps a recognition network, counting calls and the rows passed to each"""
+
+    def __init__(self, network):
+        self.network = network
+        self.calls = []
+
+    def __call__(self, crops, training=False):
+        self.calls.append(len(crops))
+        return self.network(crops, training=training)
+
+@pytest.fixture
+def counting_model():
+    """Swap the network of a built stub model for a counting one"""
+    swapped = []
+
+    def wrap(model_name: str):
+        model = stub_deepface.build_model_for_task("facial_recognition", model_name)
+        network = _CountingNetwork(model.model)
+        swapped.append((model, model.model))
+        model.model = network
+        return model, network
+
+    yield wrap
+    for model, network in swapped:
+        model.model = network
+
+@pytest.mark.parametrize("model_name", ["Facenet", "VGG-Face"])
+def test_one_model_call_per_batch(counting_model, model_name):
+    model, network = counting_model(model_name)
+    height, width = stub_deepface.INPUT_SHAPES[model_name]
+    crops = np.random.default_rng(0).random((5, height, width, 3), dtype=np.float32)
+
+    embeddings = forward_batch(model_name, crops)
+    assert network.calls == [5]
+
+    # Same rows as the model's own single-crop forward, including VGG-Face's L2 normalization
+    expected = np.asarray([model.forward(crop[None]) for crop in crops], dtype=np.float32)
+    np.testing.assert_allclose(embeddings, expected, rtol=1e-5, atol=1e-6)
@@ -0,0 +1,42 @@
+"""
+Tests for the result cache
+Keys from the uploaded bytes, and values shared read-only instead of copied
+"""
+
+import gc
+from collections import OrderedDict
+
+import numpy as np
+import pytest
+
+from services.cache_service import CacheService
+
+@pytest.fixture(autouse=True)
+def cache(monkeypatch):
+    """Empty cache with a 1 MB budget"""
+    monkeypatch.setattr(CacheService, "_entries", OrderedDict())
+    monkeypatch.setattr(CacheService, "_total_bytes", 0)
+    monkeypatch.setattr(CacheService, "_max_bytes", 1024 * 1024)
+    monkeypatch.setattr(CacheService, "_upload_digests", {})
+
+def test_uploads_are_keyed_by_their_bytes():
+    first, second = np.zeros((4, 4, 3), np.uint8), np.ones((4, 4, 3), np.uint8)
+    CacheService.register_upload(first, b"same upload")
+    CacheService.register_upload(second, b"same upload")
+
+    # Decoded pixels are not hashed once the upload digest is known
+    assert CacheService.make_key(first, "represent") == CacheService.make_key(second, "represent")
+    assert CacheService.make_key(first, "represent") != CacheService.make_key(first.copy(), "represent")
+
+    del first
+    gc.collect()
+    assert len(CacheService._upload_digests) == 1
+
+def test_cached_values_are_shared_and_read_only():
+    vector = np.arange(4, dtype=np.float32)
+    value = [{"embedding": vector, "facial_area": {"x": 1}}]
+    CacheService.put(("key",), value)
+
+    assert CacheService.get(("key",)) is value
+    with pytest.raises(ValueError):
+        vector[0] = 1
@@ -0,0 +1,73 @@
+"""
+Tests for embedding response encodings
+Accept header negotiation, and the .npy matrix with the face counts mapping its rows back to images
+"""
+
+import io
+
+import numpy as np
+import pytest
+from fastapi import HTTPException
+
+from services import embedding_codec
+from services.embedding_codec import EMBEDDING_FACES_HEADER, EmbeddingCodec, EmbeddingFormat
+
+@pytest.mark.parametrize("accept, expected", [
+    (None, EmbeddingFormat()),
+    ("*/*", EmbeddingFormat()),
+    ("application/json", EmbeddingFormat()),
+    ("application/json; encoding=base64; dtype=float16", EmbeddingFormat("json", "base64", "float16")),
+    ("application/x-npy", EmbeddingFormat("npy", "npy")),
+    ("application/json;q=0.5, application/x-npy", EmbeddingFormat("npy", "npy")),
+    ("application/x-npy;q=0.4, application/json;q=0.9", EmbeddingFormat()),
+    ("application/x-npy;q=0, text/html", EmbeddingFormat()),
+    ('application/json; encoding="BASE64"', EmbeddingFormat("json", "base64")),
+])
+def test_negotiate_picks_best_supported_format(accept, expected):
+    assert EmbeddingCodec.negotiate(accept) == expected
+
+def test_negotiate_msgpack_depends_on_the_package(monkeypatch):
+    monkeypatch.setattr(embedding_codec, "msgpack", object())
+    assert EmbeddingCodec.negotiate("application/vnd.msgpack") == EmbeddingFormat("msgpack", "binary")
+
+    monkeypatch.setattr(embedding_codec, "msgpack", None)
+    with pytest.raises(HTTPException) as error:
+        EmbeddingCodec.negotiate("application/msgpack")
+    assert error.value.status_code == 406
+
+@pytest.mark.parametrize("accept", [
+    "application/json; dtype=float64",
+    "application/json; encoding=hex",
+    "application/x-npy; dtype=int8",
+])
+def test_negotiate_rejects_unknown_encodings_and_dtypes(accept):
+    with pytest.raises(HTTPException) as error:
+        EmbeddingCodec.negotiate(accept)
+    assert error.value.status_code == 406
+
+def _result(image_index: int, faces: int) -> dict:
+    return {
+        "image_index": image_index,
+        "embeddings": [
+            {"face_index": j, "embedding": np.full(4, 10 * image_index + j, dtype=np.float32)}
+            for j in range(faces)
+        ] or None
+    }
+
+def test_npy_rows_follow_image_then_face_order():
+    content = {"results": [_result(2, 1), _result(0, 2), _result(1, 0)]}
+
+    response = EmbeddingCodec.render(content, EmbeddingFormat("npy", "npy", "float16"))
+
+    matrix = np.load(io.BytesIO(response.body))
+    assert matrix.dtype == np.float16
+    assert matrix[:, 0].tolist() == [0, 1, 20]
+    assert response.headers[EMBEDDING_FACES_HEADER] == "2,0,1"
+
+def test_npy_header_does_not_grow_with_faces():
+    content = {"results": [_result(0, 500), _result(1, 300)]}
+
+    response = EmbeddingCodec.render(content, EmbeddingFormat("npy", "npy"))
+
+    assert np.load(io.BytesIO(response.body)).shape == (800, 4)
+    assert response.headers[EMBEDDING_FACES_HEADER] == "500,300"
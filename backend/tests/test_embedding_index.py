@@ -0,0 +1,90 @@
+"""
+Tests for nearest-neighbour indexes
+Approximate indexes against exact search, and IVF training in the background
+"""
+
+import threading
+
+import numpy as np
+import pytest
+
+from services.embedding_index import ExactIndex, IVFIndex, create_index, hnswlib
+
+DIMENSIONS = 16
+
+def _vectors(count: int, seed: int) -> np.ndarray:
+    vectors = np.random.default_rng(seed).standard_normal((count, DIMENSIONS)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def test_ivf_trains_without_blocking_adds_and_searches(monkeypatch):
+    started, release = threading.Event(), threading.Event()
+    train = IVFIndex._train
+
+    def held_train(self, ids, vectors):
+        started.set()
+        release.wait(5)
+        train(self, ids, vectors)
+
+    monkeypatch.setattr(IVFIndex, "_train", held_train)
+    index = IVFIndex(DIMENSIONS, nlist=4, nprobe=4, min_train_size=64)
+    first, second = _vectors(64, 1), _vectors(16, 2)
+
+    index.add(np.arange(64), first)
+    assert started.wait(5)
+
+    # Training is in progress: the index still answers from its untrained list
+    index.add(np.arange(64, 80), second)
+    ids, _ = index.search(second[:1], 1)
+    assert ids[0][0] == 64
+    assert not index.trained
+    assert not index.wait_until_trained(timeout=0.01)
+
+    release.set()
+    assert index.wait_until_trained(timeout=5)
+    assert index.trained
+    assert len(index) == 80
+
+    # Vectors added during training were distributed into the new lists
+    ids, _ = index.search(np.concatenate([first, second]), 1)
+    assert ids[:, 0].tolist() == list(range(80))
+
+def _exact(ids: np.ndarray, vectors: np.ndarray) -> ExactIndex:
+    index = ExactIndex(DIMENSIONS)
+    index.add(ids, vectors)
+    return index
+
+def test_ivf_probing_every_list_matches_exact_search():
+    vectors, queries = _vectors(400, 3), _vectors(20, 4)
+    ids = np.arange(1000, 1400)
+    index = IVFIndex(DIMENSIONS, nlist=8, nprobe=8, min_train_size=100)
+    index.add(ids, vectors)
+    assert index.wait_until_trained(timeout=5)
+
+    exact_ids, exact_sims = _exact(ids, vectors).search(queries, 10)
+    ivf_ids, ivf_sims = index.search(queries, 10)
+    assert index.trained
+    np.testing.assert_array_equal(ivf_ids, exact_ids)
+    np.testing.assert_allclose(ivf_sims, exact_sims, rtol=1e-6)
+
+def test_untrained_ivf_and_removals_match_exact_search():
+    vectors, queries = _vectors(50, 5), _vectors(5, 6)
+    ids = np.arange(50)
+    index = IVFIndex(DIMENSIONS, nlist=4, nprobe=1, min_train_size=1000)
+    index.add(ids, vectors)
+    exact = _exact(ids, vectors)
+
+    removed = ids[::3]
+    assert index.remove(removed) == exact.remove(removed) == len(removed)
+
+    # Below min_train_size every vector is scanned, whatever nprobe is
+    np.testing.assert_array_equal(index.search(queries, 5)[0], exact.search(queries, 5)[0])
+    assert not np.isin(index.search(queries, 50)[0], removed).any()
+
+@pytest.mark.skipif(hnswlib is None, reason="hnswlib is not installed")
+def test_hnsw_finds_exact_neighbours_of_indexed_vectors():
+    vectors = _vectors(200, 7)
+    index = create_index("hnsw", DIMENSIONS)
+    index.add(np.arange(200), vectors)
+
+    ids, _ = index.search(vectors[:20], 1)
+    assert ids[:, 0].tolist() == list(range(20))
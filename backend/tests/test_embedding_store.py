@@ -0,0 +1,80 @@
+"""
+Tests for the append-only embedding store
+Crash recovery between the vectors and metadata writes
+"""
+
+import os
+
+import numpy as np
+
+from services.embedding_store import EmbeddingStore, METADATA_FILE, VECTORS_FILE
+
+DIMENSIONS = 8
+
+def _vector(seed: int) -> np.ndarray:
+    vector = np.random.default_rng(seed).standard_normal(DIMENSIONS).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+def _loaded(directory: str) -> dict:
+    """Live vectors by identity, as a restarted API would load them"""
+    vectors, identities, _, alive = EmbeddingStore.open(directory, "Facenet", DIMENSIONS).load()
+    return {identity: np.asarray(vectors[i]) for i, identity in enumerate(identities) if alive[i]}
+
+def test_append_and_load(tmp_path):
+    store = EmbeddingStore.open(str(tmp_path), "Facenet", DIMENSIONS)
+    store.append("alice", _vector(1)[None], ["a.jpg"])
+    store.append("bob", np.stack([_vector(2), _vector(3)]), ["b1.jpg", "b2.jpg"])
+    store.remove("alice")
+
+    vectors, identities, filenames, alive = store.load()
+    assert identities == ["alice", "bob", "bob"]
+    assert filenames == ["a.jpg", "b1.jpg", "b2.jpg"]
+    assert alive.tolist() == [False, True, True]
+    np.testing.assert_allclose(vectors[2], _vector(3))
+
+def test_crash_after_vectors_before_metadata(tmp_path):
+    store = EmbeddingStore.open(str(tmp_path), "Facenet", DIMENSIONS)
+    store.append("alice", _vector(1)[None], ["a.jpg"])
+
+    # bob's vector reached the disk, his metadata line did not
+    with open(os.path.join(store.directory, VECTORS_FILE), "ab") as f:
+        f.write(_vector(2).tobytes())
+
+    reopened = EmbeddingStore.open(str(tmp_path), "Facenet", DIMENSIONS)
+    reopened.append("carol", _vector(3)[None], ["c.jpg"])
+
+    loaded = _loaded(str(tmp_path))
+    assert sorted(loaded) == ["alice", "carol"]
+    np.testing.assert_allclose(loaded["carol"], _vector(3))
+    np.testing.assert_allclose(loaded["alice"], _vector(1))
+
+def test_crash_mid_metadata_line(tmp_path):
+    store = EmbeddingStore.open(str(tmp_path), "Facenet", DIMENSIONS)
+    store.append("alice", _vector(1)[None], ["a.jpg"])
+
+    # bob's vector is complete, his metadata line is torn
+    with open(os.path.join(store.directory, VECTORS_FILE), "ab") as f:
+        f.write(_vector(2).tobytes())
+    with open(os.path.join(store.directory, METADATA_FILE), "a") as f:
+        f.write('{"identity": "bo')
+
+    reopened = EmbeddingStore.open(str(tmp_path), "Facenet", DIMENSIONS)
+    reopened.append("carol", _vector(3)[None], ["c.jpg"])
+    reopened.append("dave", _vector(4)[None], ["d.jpg"])
+
+    loaded = _loaded(str(tmp_path))
+    assert sorted(loaded) == ["alice", "carol", "dave"]
+    np.testing.assert_allclose(loaded["carol"], _vector(3))
+    np.testing.assert_allclose(loaded["dave"], _vector(4))
+
+def test_partial_vector_row_is_dropped(tmp_path):
+    store = EmbeddingStore.open(str(tmp_path), "Facenet", DIMENSIONS)
+    store.append("alice", _vector(1)[None], ["a.jpg"])
+    with open(os.path.join(store.directory, VECTORS_FILE), "ab") as f:
+        f.write(_vector(2).tobytes()[:5])
+
+    store.append("bob", _vector(2)[None], ["b.jpg"])
+
+    loaded = _loaded(str(tmp_path))
+    np.testing.assert_allclose(loaded["bob"], _vector(2))
+    assert store.get_stats()["rows"] == 2
@@ -0,0 +1,59 @@
+"""
+Tests for facial attribute analysis
+Streamed results come from one detection and attribute pass over every image
+"""
+
+import json
+
+import cv2
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from endpoints.face_analysis import router
+from services.cache_service import CacheService
+from services.face_service import FaceService
+
+@pytest.fixture
+def client(monkeypatch):
+    """The analysis route with the result cache off"""
+    monkeypatch.setattr(CacheService, "_max_bytes", 0)
+    app = FastAPI()
+    app.include_router(router)
+    return TestClient(app)
+
+def _jpeg(seed: int) -> bytes:
+    image = np.random.default_rng(seed).integers(0, 255, (64, 64, 3), dtype=np.uint8)
+    return cv2.imencode(".jpg", image)[1].tobytes()
+
+def test_stream_runs_each_attribute_model_once_over_all_faces(client, monkeypatch):
+    calls = []
+    analyze_attribute = FaceService.analyze_attribute
+    detect = FaceService.detect_faces
+
+    def counted(action, face_objs_per_image):
+        calls.append((action, len(face_objs_per_image)))
+        return analyze_attribute(action, face_objs_per_image)
+
+    def detect_faces(img_path):
+        if img_path.shape[0] != 64:
+            raise ValueError("not an image")
+        return detect(img_path)
+
+    monkeypatch.setattr(FaceService, "analyze_attribute", staticmethod(counted))
+    monkeypatch.setattr(FaceService, "detect_faces", staticmethod(detect_faces))
+    small = cv2.imencode(".jpg", np.zeros((32, 32, 3), np.uint8))[1].tobytes()
+    files = [("files", (f"{i}.jpg", _jpeg(i), "image/jpeg")) for i in range(3)]
+    files.append(("files", ("small.jpg", small, "image/jpeg")))
+
+    with client.stream("POST", "/analyze-attributes", files=files, data={"actions": "age,gender", "stream": "true"}) as response:
+        lines = [json.loads(line) for line in response.iter_lines() if line]
+
+    assert calls == [("age", 3), ("gender", 3)]
+    # The failed detection is final before the attribute models run
+    assert lines[0]["image_index"] == 3 and "error" in lines[0]
+    assert sorted(line["image_index"] for line in lines[1:4]) == [0, 1, 2]
+    assert all("age" in line["faces"][0] and "gender" in line["faces"][0] for line in lines[1:4])
+    assert lines[4]["type"] == "summary"
+    assert set(lines[4]["attribute_timings_ms"]) == {"detection", "age", "gender"}
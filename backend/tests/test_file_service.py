@@ -0,0 +1,45 @@
+"""
+Tests for upload handling
+Decode time excludes the wait for an executor thread
+"""
+
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+import pytest
+
+from services.file_service import FileService
+from services.inference_executor import InferenceExecutor
+from services.timing_service import RequestTimings
+
+@pytest.fixture
+def single_thread(monkeypatch):
+    """One inference thread, so a second call queues behind the first"""
+    pool = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(InferenceExecutor, "_executor", pool)
+    yield pool
+    pool.shutdown(wait=True)
+
+def test_decode_time_excludes_executor_queueing(single_thread, caplog):
+    _, encoded = cv2.imencode(".png", np.zeros((40, 30, 3), np.uint8))
+
+    async def scenario():
+        RequestTimings._current.set(RequestTimings())
+        busy = asyncio.ensure_future(InferenceExecutor.run(time.sleep, 0.2))
+        await asyncio.sleep(0.01)
+        image = await FileService.decode_upload(encoded.tobytes(), "a.png", 3)
+        await busy
+        return image, RequestTimings.report()
+
+    with caplog.at_level(logging.INFO, logger="services.file_service"):
+        image, timings = asyncio.run(scenario())
+
+    assert image.shape == (40, 30, 3)
+    assert timings["images"][0]["image_index"] == 3
+    assert timings["images"][0]["decode"] < 100
+    # Per-image decode logs are debug output
+    assert not caplog.records
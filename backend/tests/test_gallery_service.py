@@ -0,0 +1,74 @@
+"""
+Tests for identity galleries
+Enrollments and removals made by other pre-fork workers through the shared store
+"""
+
+import numpy as np
+import pytest
+
+from services import gallery_service
+from services.embedding_store import EmbeddingStore
+from services.gallery_service import GalleryService, ModelGallery
+
+DIMENSIONS = 16
+
+def _vector(seed: int) -> np.ndarray:
+    return np.random.default_rng(seed).standard_normal(DIMENSIONS).astype(np.float32)
+
+@pytest.fixture
+def store_dir(tmp_path, monkeypatch):
+    """Fresh galleries persisted under a temporary store directory"""
+    monkeypatch.setattr(gallery_service, "EMBEDDING_STORE_DIR", str(tmp_path))
+    monkeypatch.setattr(GalleryService, "_galleries", {})
+    monkeypatch.setattr(GalleryService, "_stores", {})
+    return str(tmp_path)
+
+def _identities(matches):
+    return [match["identity"] for match in matches]
+
+def test_enrollments_of_other_workers_are_searched(store_dir):
+    GalleryService.enroll("Facenet", "alice", [_vector(1)], ["a.jpg"])
+
+    # Another worker enrolls through its own store instance
+    other = EmbeddingStore.open(store_dir, "Facenet", DIMENSIONS)
+    other.append("bob", gallery_service.l2_normalize_rows(_vector(2)[None]), ["b.jpg"])
+
+    matches = GalleryService.identify("Facenet", [_vector(2)], top_k=1)[0]
+    assert _identities(matches) == ["bob"]
+    assert matches[0]["filename"] == "b.jpg"
+    assert GalleryService.enroll("Facenet", "alice", [_vector(3)], ["a2.jpg"]) == 2
+
+def test_removals_of_other_workers_apply_to_earlier_rows_only(store_dir):
+    GalleryService.enroll("Facenet", "alice", [_vector(1)], ["a.jpg"])
+    GalleryService.identify("Facenet", [_vector(1)], top_k=1)
+
+    other = EmbeddingStore.open(store_dir, "Facenet", DIMENSIONS)
+    other.remove("alice")
+    other.append("alice", gallery_service.l2_normalize_rows(_vector(4)[None]), ["a-new.jpg"])
+
+    matches = GalleryService.identify("Facenet", [_vector(4)], top_k=5)[0]
+    assert [(m["identity"], m["filename"]) for m in matches] == [("alice", "a-new.jpg")]
+
+def test_remove_identity_through_store(store_dir):
+    GalleryService.enroll("Facenet", "alice", [_vector(1), _vector(2)], ["a1.jpg", "a2.jpg"])
+    GalleryService.enroll("Facenet", "bob", [_vector(3)], ["b.jpg"])
+
+    assert GalleryService.remove_identity("alice") == 2
+    assert GalleryService.remove_identity("alice") == 0
+    assert _identities(GalleryService.identify("Facenet", [_vector(1)], top_k=5)[0]) == ["bob"]
+
+    # A restarted worker loads the same gallery from the store
+    GalleryService._galleries = {}
+    GalleryService._stores = {}
+    GalleryService.load_store()
+    assert _identities(GalleryService.identify("Facenet", [_vector(1)], top_k=5)[0]) == ["bob"]
+    assert GalleryService.get_stats()[0]["identities"] == 1
+
+def test_similarity_is_clipped_to_cosine_range():
+    gallery = ModelGallery("Facenet", "exact")
+    gallery.add("alice", gallery_service.l2_normalize_rows(_vector(1)[None]), ["a.jpg"])
+
+    # float32 rounding of a self-match
+    matches = gallery._top_identities(np.array([0]), np.array([1.0000001], dtype=np.float32), top_k=1)
+    assert matches[0]["similarity"] == 1.0
+    assert matches[0]["distance"] == 0.0
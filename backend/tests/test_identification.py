@@ -0,0 +1,47 @@
+"""
+Tests for identification endpoints
+Images without a face are reported instead of being enrolled or searched
+"""
+
+import cv2
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from endpoints.identification import router
+from services import gallery_service
+from services.gallery_service import GalleryService
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """The identification routes over fresh galleries in a temporary store directory"""
+    monkeypatch.setattr(gallery_service, "EMBEDDING_STORE_DIR", str(tmp_path))
+    monkeypatch.setattr(GalleryService, "_galleries", {})
+    monkeypatch.setattr(GalleryService, "_stores", {})
+    app = FastAPI()
+    app.include_router(router)
+    return TestClient(app)
+
+def _jpeg(image: np.ndarray) -> bytes:
+    return cv2.imencode(".jpg", image)[1].tobytes()
+
+def test_image_without_a_face_is_not_enrolled_or_identified(client):
+    face = _jpeg(np.random.default_rng(1).integers(0, 255, (64, 64, 3), dtype=np.uint8))
+    blank = _jpeg(np.full((64, 64, 3), 128, np.uint8))
+
+    enrolled = client.post("/gallery/enroll", data={"identity": "alice"}, files=[
+        ("files", ("face.jpg", face, "image/jpeg")),
+        ("files", ("blank.jpg", blank, "image/jpeg"))
+    ])
+    assert enrolled.status_code == 200
+    assert enrolled.json()["enrolled_embeddings"] == 1
+    results = enrolled.json()["results"]
+    assert results[0]["enrolled"]
+    assert results[1]["enrolled"] is False
+    assert results[1]["error"] == "No face detected"
+
+    identified = client.post("/identify", files={"file": ("blank.jpg", blank, "image/jpeg")})
+    assert identified.status_code == 200
+    assert identified.json()["faces"] == []
+    assert identified.json()["error"] == "No face detected"
@@ -0,0 +1,69 @@
+"""
+Tests for the inference executor
+Calls waiting for a busy model must not hold executor threads other models need
+"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from services.inference_executor import InferenceExecutor
+from services.model_service import ModelService
+
+@pytest.fixture
+def executor(monkeypatch):
+    """Two inference threads, one concurrent call per model"""
+    pool = ThreadPoolExecutor(max_workers=2)
+    monkeypatch.setattr(InferenceExecutor, "_executor", pool)
+    monkeypatch.setattr(InferenceExecutor, "_model_slots", {})
+    monkeypatch.setattr(InferenceExecutor, "_slots_loop", None)
+    monkeypatch.setattr(ModelService, "_registry", {})
+    monkeypatch.setattr(ModelService, "_last_used", {})
+    yield pool
+    pool.shutdown(wait=True)
+
+def test_call_waiting_for_busy_model_does_not_block_others(executor):
+    release = threading.Event()
+    order = []
+
+    def call(name, wait=False):
+        if wait:
+            release.wait(5)
+        order.append(name)
+
+    async def scenario():
+        slow = asyncio.ensure_future(InferenceExecutor.run(call, "a1", True, model_keys=["test/a"]))
+        queued = asyncio.ensure_future(InferenceExecutor.run(call, "a2", model_keys=["test/a"]))
+        await asyncio.sleep(0.05)
+
+        # a2 waits for model a on the event loop, leaving the second thread to b
+        await asyncio.wait_for(InferenceExecutor.run(call, "b", model_keys=["test/b"]), 5)
+        assert order == ["b"]
+        assert InferenceExecutor.get_queue_depth() == 1
+
+        release.set()
+        await asyncio.gather(slow, queued)
+
+    asyncio.run(scenario())
+    assert order == ["b", "a1", "a2"]
+    assert InferenceExecutor.get_queue_depth() == 0
+    assert all(stats["in_use"] == 0 for stats in ModelService._registry.values())
+
+def test_cancelled_call_releases_its_model(executor):
+    release = threading.Event()
+
+    async def scenario():
+        slow = asyncio.ensure_future(InferenceExecutor.run(release.wait, 5, model_keys=["test/a"]))
+        queued = asyncio.ensure_future(InferenceExecutor.run(lambda: None, model_keys=["test/a"]))
+        await asyncio.sleep(0.05)
+        queued.cancel()
+        release.set()
+        await slow
+        # The slot and memory of both calls are back
+        await asyncio.wait_for(InferenceExecutor.run(lambda: None, model_keys=["test/a"]), 5)
+
+    asyncio.run(scenario())
+    assert InferenceExecutor.get_queue_depth() == 0
+    assert ModelService._registry["test/a"]["in_use"] == 0
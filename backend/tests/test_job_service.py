@@ -0,0 +1,110 @@
+"""
+Tests for bulk jobs
+Jobs interrupted by a restart resume with only their unfinished chunks, and
+are taken over only when the process that owned them is gone
+"""
+
+import asyncio
+import fcntl
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from services import job_service
+from services.job_service import JobService
+from services.job_worker import CHUNKS_DIR, chunk_path, write_json_atomic
+
+NAMES = [f"{i}.jpg" for i in range(5)]
+
+@pytest.fixture
+def jobs_dir(tmp_path, monkeypatch):
+    """Jobs under a temporary directory, with chunks run on threads by a fake worker"""
+    processed = []
+    lock = threading.Lock()
+
+    def process_chunk(job_dir, job, chunk_index, names):
+        with lock:
+            processed.append(chunk_index)
+            if processed.count(chunk_index) == 1 and chunk_index == 2:
+                raise OSError("worker crashed")
+        summary = {"images": len(names), "failed": 0, "faces": len(names)}
+        write_json_atomic(chunk_path(job_dir, chunk_index, "json"), summary)
+        return summary
+
+    pool = ThreadPoolExecutor(max_workers=2)
+    monkeypatch.setattr(job_service, "JOBS_DIR", str(tmp_path))
+    monkeypatch.setattr(job_service, "process_chunk", process_chunk)
+    monkeypatch.setattr(JobService, "_executor", pool)
+    monkeypatch.setattr(JobService, "_jobs", {})
+    monkeypatch.setattr(JobService, "_tasks", {})
+    monkeypatch.setattr(JobService, "_owner_lock", None)
+    yield tmp_path, processed
+    JobService.shutdown()
+    pool.shutdown(wait=True)
+
+def _write_job(jobs_dir, job_id: str, status: str, done_chunks, owner=None) -> None:
+    """Lay out a job as a server that stopped mid-way leaves it"""
+    job_dir = os.path.join(jobs_dir, job_id)
+    os.makedirs(os.path.join(job_dir, CHUNKS_DIR))
+    write_json_atomic(os.path.join(job_dir, job_service.IMAGES_FILE), NAMES)
+    write_json_atomic(os.path.join(job_dir, job_service.JOB_FILE), {
+        "id": job_id, "status": status, "error": None,
+        "source": {"type": "directory", "path": "/images"},
+        "tasks": ["embeddings"], "model": "Facenet", "actions": [],
+        "total_images": len(NAMES), "chunk_size": 2, "chunks": 3,
+        "created_at": 0.0, "finished_at": None, "owner": owner
+    })
+    for index in done_chunks:
+        write_json_atomic(chunk_path(job_dir, index, "json"), {"images": 2, "failed": 0, "faces": 2})
+
+def test_resume_runs_only_unfinished_chunks_of_active_jobs(jobs_dir):
+    directory, processed = jobs_dir
+    _write_job(directory, "running", "running", done_chunks=[0])
+    _write_job(directory, "finished", "completed", done_chunks=[0, 1, 2])
+
+    async def scenario():
+        JobService.resume()
+        assert set(JobService._tasks) == {"running"}
+        await asyncio.gather(*JobService._tasks.values())
+
+    asyncio.run(scenario())
+
+    # Chunk 0 was done before the restart; chunk 2 failed once and was retried
+    assert sorted(processed) == [1, 2, 2]
+    status = JobService.get_job("running")
+    assert status["status"] == "completed"
+    assert status["processed_images"] == len(NAMES)
+    assert status["completed_chunks"] == 3
+    with open(os.path.join(directory, "running", job_service.JOB_FILE)) as f:
+        assert json.load(f)["status"] == "completed"
+    assert JobService.get_job("finished")["status"] == "completed"
+
+def test_resume_takes_over_only_jobs_of_dead_owners(jobs_dir):
+    directory, processed = jobs_dir
+    live_pid, dead_pid = 1000001, 1000002
+    _write_job(directory, "live", "running", done_chunks=[0, 1], owner=live_pid)
+    _write_job(directory, "orphan", "running", done_chunks=[0, 1], owner=dead_pid)
+
+    # Another worker holds its owner lock; the dead worker's lock file was left behind
+    os.makedirs(os.path.join(directory, job_service.OWNERS_DIR))
+    open(JobService._owner_path(dead_pid), "a").close()
+    with open(JobService._owner_path(live_pid), "a") as live_lock:
+        fcntl.flock(live_lock, fcntl.LOCK_EX)
+
+        async def scenario():
+            JobService.resume()
+            assert set(JobService._tasks) == {"orphan"}
+            await asyncio.gather(*JobService._tasks.values())
+
+        asyncio.run(scenario())
+
+    assert processed == [2, 2]
+    assert "live" not in JobService._jobs
+    assert not os.path.exists(JobService._owner_path(dead_pid))
+    with open(os.path.join(directory, "orphan", job_service.JOB_FILE)) as f:
+        orphan = json.load(f)
+    assert orphan["owner"] == os.getpid()
+    assert orphan["status"] == "completed"
@@ -0,0 +1,45 @@
+"""
+Tests for model preloading
+Readiness after warm-ups that succeed or fail
+"""
+
+import sys
+
+import pytest
+
+from services import model_service
+from services.model_service import ModelService
+
+@pytest.fixture
+def preload(monkeypatch):
+    """Preload only the given recognition models, into a fresh registry"""
+    monkeypatch.setattr(ModelService, "_models", {})
+    monkeypatch.setattr(ModelService, "_state", "pending")
+    monkeypatch.setattr(model_service, "PRELOAD_DETECTOR", False)
+    monkeypatch.setattr(model_service, "PRELOAD_ATTRIBUTE_ACTIONS", [])
+    monkeypatch.setattr(model_service, "PRELOAD_ANTI_SPOOFING", False)
+
+    def run(models):
+        monkeypatch.setattr(model_service, "PRELOAD_MODELS", models)
+        ModelService.preload_models()
+        return ModelService.get_readiness()
+    return run
+
+def test_ready_after_warmup(preload):
+    readiness = preload(["Facenet"])
+    assert readiness["ready"] and readiness["state"] == "ready"
+    assert [model["status"] for model in readiness["models"]] == ["ready"]
+
+def test_not_ready_when_a_model_fails(preload, monkeypatch):
+    deepface_api = sys.modules["deepface.DeepFace"]
+    represent = deepface_api.represent
+
+    def failing_represent(img_path, model_name, **kwargs):
+        if model_name == "ArcFace":
+            raise ValueError("weights not found")
+        return represent(img_path, model_name=model_name, **kwargs)
+
+    monkeypatch.setattr(deepface_api, "represent", failing_represent)
+    readiness = preload(["Facenet", "ArcFace"])
+    assert not readiness["ready"] and readiness["state"] == "failed"
+    assert {model["name"]: model["status"] for model in readiness["models"]} == {"Facenet": "ready", "ArcFace": "failed"}
@@ -4,11 +4,14 @@ Contains file handling, validation, and common helper functions
 """
 
 import os
+import uuid
 import tempfile
 import logging
 from typing import List
-from PIL import Image
+from PIL import Image, ImageOps
 import io
+import cv2
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
@@ -29,6 +32,38 @@ def validate_image(file_content: bytes) -> bool:
     except Exception:
         return False
 
+def decode_image(file_content: bytes) -> np.ndarray:
+    """
+    Validate and decode image bytes into a BGR array in a single pass
+    
+    Decoding doubles as validation, so the bytes are never parsed twice.
+    EXIF orientation is applied so rotated phone photos reach the detector upright.
+    
+    Args:
+        file_content: Bytes content of the uploaded file
+        
+    Returns:
+        np.ndarray: Decoded image in BGR channel order, as DeepFace expects
+        
+    Raises:
+        ValueError: If the content cannot be decoded as an image
+    """
+    buffer = np.frombuffer(file_content, dtype=np.uint8)
+    # IMREAD_COLOR applies the EXIF orientation tag while decoding
+    image = cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+    
+    if image is None:
+        # OpenCV cannot decode some supported formats (e.g. GIF), fall back to PIL
+        try:
+            with Image.open(io.BytesIO(file_content)) as pil_image:
+                pil_image = ImageOps.exif_transpose(pil_image)
+                rgb = np.asarray(pil_image.convert("RGB"))
+            image = cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)
+        except Exception as e:
+            raise ValueError(f"Could not decode image: {e}") from e
+    
+    return image
+
 def save_temp_image(file_content: bytes, filename: str) -> str:
     """
     Save uploaded image to temporary file
@@ -99,7 +134,7 @@ def validate_content_type(content_type: str, supported_type: str) -> bool:
 
 def generate_temp_filename(prefix: str, index: int, original_filename: str) -> str:
     """
-    Generate a temporary filename with prefix and index
+    Generate a unique temporary filename with prefix and index
     
     Args:
         prefix: Prefix for the temporary file
@@ -107,9 +142,10 @@ def generate_temp_filename(prefix: str, index: int, original_filename: str) -> s
         original_filename: Original filename from upload
         
     Returns:
-        str: Generated temporary filename
+        str: Generated temporary filename, unique across concurrent requests
     """
-    return f"{prefix}_{index}_{original_filename}"
+    safe_name = os.path.basename(original_filename or "upload")
+    return f"{prefix}_{uuid.uuid4().hex}_{index}_{safe_name}"
 
 def calculate_confidence_level(score: float) -> str:
     """